@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Measure time and peak memory of every stage of the plotting pipeline.
+
+Synthetic particle files are generated once in a working directory, and
+reused by the next runs. For every number of particles, the following stages
+are measured separately:
+
+- ``read``: parsing of the columns needed by the default projections;
+- ``plot_all_distributions``: binning and drawing of the distributions;
+- ``plot_all_acceptances``: binning and drawing of the acceptances;
+- ``_save_single_hist``: export of a single histogram in CSV;
+- ``save_figure``: rendering of the figure to PNG.
+
+Time is the median over ``--repeat`` runs. Peak memory is measured in an
+additional run, with :mod:`tracemalloc`, which tracks numpy buffers; it is the
+peak of memory allocated during the stage, on top of what existed before.
+
+Usage::
+
+    python benchmarks/pipeline.py -n 1e4 1e5 1e6 --format dst \
+        --json pipeline.json --baseline previous.json --max-ratio 1.3
+
+The script exits with a non-zero status if the median time of any stage is
+more than ``--max-ratio`` times the one in ``--baseline``, so that it can be
+used to catch regressions between releases.
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any
+
+from dst_util.backend import select_backend
+from dst_util.dst_helper import (
+    _save_single_hist,
+    needed_columns,
+    read,
+    save_figure,
+)
+from dst_util.synthetic import write_particles
+
+#: Projections of every benchmark, as the default ones of the CLIs.
+PLOT_SINGLE_KWARGS = {
+    ("x(mm)", "x'(mrad)"): {"xlim": (-40.0, 40.0), "ylim": (-25.0, 25.0)},
+    ("y(mm)", "y'(mrad)"): {"xlim": (-40.0, 40.0), "ylim": (-25.0, 25.0)},
+    ("Phase(deg)", "Energy(MeV)"): {
+        "xlim": (-15, 15),
+        "ylim": (98, 100.5),
+        "range": "as_plot_limits",
+    },
+    ("x(mm)", "y(mm)"): {"xlim": (-40.0, 40.0), "ylim": (-40.0, 40.0)},
+}
+
+
+def synthetic_file(workdir: Path, n_particles: int, fmt: str) -> Path:
+    """Give a synthetic file of ``n_particles``, writing it if needed."""
+    filepath = workdir / f"synthetic_{n_particles}.{fmt}"
+    if not filepath.is_file():
+        workdir.mkdir(parents=True, exist_ok=True)
+        write_particles(filepath, n_particles, seed=n_particles)
+    return filepath
+
+
+def stages(
+    filepath: Path, bins: int, workers: int = 1
+) -> dict[str, Callable[[], Any]]:
+    """Give the stages to measure, in order; they depend on each other."""
+    import matplotlib.pyplot as plt
+
+    from dst_util.acceptance import plot_all_acceptances
+    from dst_util.distribution import plot_all_distributions
+
+    state: dict[str, Any] = {}
+    out = filepath.parent / "out"
+    out.mkdir(exist_ok=True)
+
+    def read_stage() -> None:
+        state["data"] = read(filepath, needed_columns(PLOT_SINGLE_KWARGS))
+
+    def distributions_stage() -> None:
+        plt.close("all")
+        state["fig"], axes = plt.subplots(nrows=2, ncols=2)
+        state["hist"] = plot_all_distributions(
+            state["data"], PLOT_SINGLE_KWARGS, axes, bins, workers=workers
+        )
+
+    def acceptances_stage() -> None:
+        _, axes = plt.subplots(nrows=2, ncols=2)
+        plot_all_acceptances(
+            state["data"], PLOT_SINGLE_KWARGS, axes, bins, workers=workers
+        )
+
+    def save_hist_stage() -> None:
+        _save_single_hist(out / "hist.csv", *state["hist"][0])
+
+    def save_figure_stage() -> None:
+        save_figure(state["fig"], out / "figure")
+        plt.close("all")
+
+    return {
+        "read": read_stage,
+        "plot_all_distributions": distributions_stage,
+        "plot_all_acceptances": acceptances_stage,
+        "_save_single_hist": save_hist_stage,
+        "save_figure": save_figure_stage,
+    }
+
+
+def measure(
+    filepath: Path, bins: int, repeat: int, workers: int = 1
+) -> dict[str, Any]:
+    """Time every stage ``repeat`` times, then measure its peak memory."""
+    timings: dict[str, list[float]] = {}
+    # Library functions report what they do; keep the benchmark output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            for name, stage in stages(filepath, bins, workers).items():
+                start = time.perf_counter()
+                stage()
+                timings.setdefault(name, []).append(
+                    time.perf_counter() - start
+                )
+
+        peaks = {}
+        tracemalloc.start()
+        for name, stage in stages(filepath, bins, workers).items():
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            stage()
+            peaks[name] = tracemalloc.get_traced_memory()[1] - before
+        tracemalloc.stop()
+
+    return {
+        name: _summary(timings[name]) | {"peak_bytes": peaks[name]}
+        for name in timings
+    }
+
+
+def main() -> int:
+    """Run all benchmarks, print and optionally save the results."""
+    parser = argparse.ArgumentParser("pipeline")
+    parser.add_argument(
+        "-n",
+        "--n-particles",
+        type=lambda n: int(float(n)),
+        nargs="+",
+        default=[10**4, 10**5, 10**6],
+        help="Number of particles of every synthetic file.",
+    )
+    parser.add_argument("--format", choices=("txt", "dst"), default="dst")
+    parser.add_argument("-b", "--bins", type=int, default=500)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of threads binning the particles.",
+    )
+    parser.add_argument(
+        "--workdir", type=Path, default=Path("benchmarks") / "data"
+    )
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--max-ratio", type=float, default=1.3)
+    args = parser.parse_args()
+    select_backend(interactive=False)
+
+    results = {
+        "environment": _environment(),
+        "settings": {
+            "format": args.format,
+            "bins": args.bins,
+            "workers": args.workers,
+        },
+        "results": {},
+    }
+    for n_particles in args.n_particles:
+        filepath = synthetic_file(args.workdir, n_particles, args.format)
+        measured = measure(filepath, args.bins, args.repeat, args.workers)
+        results["results"][str(n_particles)] = measured
+        for name, summary in measured.items():
+            print(
+                f"{n_particles:>10} {name:<24} median "
+                f"{summary['median']:.3f}s peak "
+                f"{summary['peak_bytes'] / 1e6:.1f}MB"
+            )
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["settings"] != results["settings"]:
+        print(f"Settings differ from {args.baseline}, nothing compared.")
+        return 1
+    baseline = baseline["results"]
+    too_slow = [
+        (n_particles, name, summary["median"] / previous["median"])
+        for n_particles, measured in results["results"].items()
+        for name, summary in measured.items()
+        if (previous := baseline.get(n_particles, {}).get(name))
+        and summary["median"] > args.max_ratio * previous["median"]
+    ]
+    for n_particles, name, ratio in too_slow:
+        print(
+            f"Regression: {name} with {n_particles} particles is {ratio:.2f}"
+            f" times slower than in {args.baseline}"
+        )
+    return 1 if too_slow else 0
+
+
+def _summary(timings: list[float]) -> dict[str, float]:
+    """Reduce timings to a few statistics."""
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "repeat": len(timings),
+    }
+
+
+def _environment() -> dict[str, str]:
+    """Describe what the results depend on."""
+    environment = {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+    }
+    for package in ("DST-util", "numpy", "pandas", "matplotlib"):
+        try:
+            environment[package] = version(package)
+        except PackageNotFoundError:
+            environment[package] = "unknown"
+    return environment
+
+
+if __name__ == "__main__":
+    sys.exit(main())
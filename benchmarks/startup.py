@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Measure the startup time of the command-line entry points.
+
+Every entry point is run several times with ``--help`` and with invalid
+arguments, which must both return before any heavy module is imported.
+
+Usage::
+
+    python benchmarks/startup.py --repeat 20 --json startup.json \
+        --max-seconds 0.3
+
+The script exits with a non-zero status if the median time of any case is
+above ``--max-seconds``, so that it can be used to catch regressions.
+
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+#: Module of every entry point, and arguments of every case.
+CASES = {
+    "plot_distribution --help": ("dst_util.cli.plot_distribution", ["--help"]),
+    "plot_distribution <bad args>": ("dst_util.cli.plot_distribution", []),
+    "plot_acceptance --help": ("dst_util.cli.plot_acceptance", ["--help"]),
+    "plot_acceptance <bad args>": ("dst_util.cli.plot_acceptance", []),
+}
+
+
+def time_case(module: str, args: list[str], repeat: int) -> list[float]:
+    """Time ``repeat`` runs of ``python -m module *args``."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", module, *args],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def baseline(repeat: int) -> list[float]:
+    """Time bare interpreter startups, for reference."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], check=True)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main() -> int:
+    """Run all cases, print and optionally save the results."""
+    parser = argparse.ArgumentParser("startup")
+    parser.add_argument("-n", "--repeat", type=int, default=10)
+    parser.add_argument("--json", type=Path, default=None)
+    parser.add_argument("--max-seconds", type=float, default=None)
+    args = parser.parse_args()
+
+    results = {"python": _summary(baseline(args.repeat))}
+    for name, (module, cli_args) in CASES.items():
+        results[name] = _summary(time_case(module, cli_args, args.repeat))
+
+    for name, summary in results.items():
+        print(
+            f"{name:<32} median {summary['median']:.3f}s "
+            f"min {summary['min']:.3f}s"
+        )
+    if args.json is not None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.max_seconds is None:
+        return 0
+    too_slow = [
+        name
+        for name, summary in results.items()
+        if name != "python" and summary["median"] > args.max_seconds
+    ]
+    for name in too_slow:
+        print(f"Regression: {name} is above {args.max_seconds}s")
+    return 1 if too_slow else 0
+
+
+def _summary(timings: list[float]) -> dict[str, float]:
+    """Reduce timings to a few statistics."""
+    return {
+        "median": statistics.median(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "repeat": len(timings),
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 """Define several functions to plot and format acceptance files."""
 
-from typing import Any, Literal
+from collections.abc import Collection
+from typing import Any
 
 import matplotlib.pyplot as plt
 import numpy as np
@@ -8,61 +9,137 @@ import pandas as pd
 from matplotlib.axes import Axes
 from matplotlib.colors import Colormap, ListedColormap
 
+from dst_util.bunch import ParticleBunch
+from dst_util.compute import Histogram, compute_acceptances
+from dst_util.constants import RenderMode
+from dst_util.render import add_raster_layer, histogram_to_rgba
+
 
 def plot_all_acceptances(
-    data: pd.DataFrame,
+    data: pd.DataFrame | ParticleBunch,
     plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
     axes: Any,
     bins: int,
     invert_acceptance_colors: bool = False,
-) -> Any:
-    """Plot all the desired acceptances."""
+    render: RenderMode = "mesh",
+    workers: int = 1,
+) -> list[Histogram]:
+    """Plot all the desired acceptances.
+
+    All histograms are computed in a single pass over the columns by
+    :func:`.compute_acceptances`, on ``workers`` threads. They are then
+    plotted in the calling thread.
+
+    """
+    acceptance_data = compute_acceptances(
+        data, plot_single_kwargs, bins, workers=workers
+    )
+    plot_all_acceptance_histograms(
+        acceptance_data,
+        plot_single_kwargs,
+        axes,
+        invert_acceptance_colors=invert_acceptance_colors,
+        render=render,
+    )
+    return acceptance_data
+
+
+def plot_all_acceptance_histograms(
+    acceptance_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    axes: Any,
+    invert_acceptance_colors: bool = False,
+    render: RenderMode = "mesh",
+) -> None:
+    """Plot acceptances which histograms were already computed.
+
+    With ``render="raster"``, every map is drawn as a single image.
+
+    """
     cmap = ListedColormap(["black", "white"])
     if invert_acceptance_colors:
         cmap = ListedColormap(["white", "black"])
-    hist_data = [
-        _plot_single_acceptance(
-            axis, data, columns, bins=bins, cmap=cmap, **kwargs
+    for axis, hist, columns, kwargs in zip(
+        axes.flatten(),
+        acceptance_data,
+        plot_single_kwargs.keys(),
+        plot_single_kwargs.values(),
+        strict=True,
+    ):
+        _render_single_acceptance(
+            axis, *hist, columns, cmap=cmap, render=render, **kwargs
         )
-        for axis, columns, kwargs in zip(
-            axes.flatten(),
-            plot_single_kwargs.keys(),
-            plot_single_kwargs.values(),
-            strict=True,
+
+
+def plot_all_acceptance_probabilities(
+    probabilities: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    axes: Any,
+    levels: Collection[float] = (0.5, 0.9, 0.99),
+    render: RenderMode = "mesh",
+) -> None:
+    """Plot acceptance probabilities of several runs, with their contours.
+
+    Probabilities are computed by :class:`.AcceptanceAccumulator`; cells
+    accepted by all runs are white, cells never accepted are black.
+
+    """
+    from dst_util.multirun import probability_contours
+
+    cmap = plt.colormaps["gray"]
+    for axis, hist, columns, kwargs in zip(
+        axes.flatten(),
+        probabilities,
+        plot_single_kwargs.keys(),
+        plot_single_kwargs.values(),
+        strict=True,
+    ):
+        _render_single_acceptance(
+            axis, *hist, columns, cmap=cmap, render=render, **kwargs
         )
-    ]
-    return hist_data
+        for i, (level, lines) in enumerate(
+            probability_contours(*hist, levels=levels).items()
+        ):
+            color = plt.colormaps["autumn"](i / max(1, len(levels) - 1))
+            for j, line in enumerate(lines):
+                axis.plot(
+                    line[:, 0],
+                    line[:, 1],
+                    color=color,
+                    lw=0.8,
+                    label=f"P = {level:g}" if j == 0 else None,
+                )
+        if axis.get_legend_handles_labels()[0]:
+            axis.legend(loc="upper right", fontsize="x-small")
 
 
-def _plot_single_acceptance(
+def _render_single_acceptance(
     axis: Axes,
-    data: pd.DataFrame,
+    accepted_h: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
     columns: tuple[str, str],
-    bins: int = 500,
     cmap: Colormap = ListedColormap(["black", "white"]),
     grid: bool = True,
-    cmin: float | None = 1.0,
     xlim: tuple[float, float] | None = None,
     ylim: tuple[float, float] | None = None,
-    range: (
-        tuple[tuple[float, float], tuple[float, float]]
-        | Literal["as_plot_limits"]
-        | None
-    ) = None,
+    render: RenderMode = "mesh",
     **kwargs,
-) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Plot the acceptance in phase-spaces specified by ``columns``."""
-    x = data[columns[0]]
-    y = data[columns[1]]
-
-    if range == "as_plot_limits":
-        assert xlim is not None
-        assert ylim is not None
-        range = (xlim, ylim)
-    h, xedges, yedges = np.histogram2d(x, y, bins=bins, range=range)
-    accepted_h = np.where(h > 0, 1, 0)
-
-    axis.pcolormesh(xedges, yedges, accepted_h.T, cmap=cmap, edgecolors="face")
+) -> None:
+    """Plot an acceptance map which was already computed."""
+    if render == "raster":
+        rgba = histogram_to_rgba(accepted_h, cmap, vmin=0.0, vmax=1.0)
+        add_raster_layer(axis, rgba, xedges, yedges)
+    else:
+        axis.pcolormesh(
+            xedges,
+            yedges,
+            accepted_h.T,
+            cmap=cmap,
+            vmin=0.0,
+            vmax=1.0,
+            edgecolors="face",
+        )
     title = " - ".join(columns)
     axis.set_title(title)
     if grid:
@@ -71,4 +148,3 @@ def _plot_single_acceptance(
         axis.set_xlim(xlim)
     if ylim:
         axis.set_ylim(ylim)
-    return accepted_h, xedges, yedges
@@ -0,0 +1,209 @@
+"""Define a single-file archive of the histograms of many runs.
+
+An error study saved with :func:`.save_all_distributions` leaves one text file
+per projection and per run; tens of thousands of small files are slow to list,
+load and compare. The archive is a zip file instead, in which every histogram
+of every run is stored as::
+
+    <run>/<kind>/<projection>/counts.npy
+    <run>/<kind>/<projection>/xedges.npy
+    <run>/<kind>/<projection>/yedges.npy
+    <run>/<kind>/<projection>/meta.json
+
+Every member is compressed on its own. The central directory of the zip file
+is the index: one histogram is read by seeking to its members and
+decompressing them, whatever the number of runs. ``meta.json`` holds the
+columns, number of bins and metadata of the :class:`.Histogram`, such as its
+source file, beam statistics or smoothing bandwidth.
+
+Runs are appended to an existing archive without rewriting it. The archive is
+only valid once closed, as the central directory is written last.
+
+"""
+
+import json
+import zipfile
+from collections.abc import Collection
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+
+from dst_util.compute import Histogram
+
+#: Name of the member describing a histogram.
+META_FILENAME = "meta.json"
+#: Arrays stored for every histogram.
+ARRAYS = ("counts", "xedges", "yedges")
+
+
+class HistogramArchive:
+    """Store and retrieve the histograms of many runs in one file."""
+
+    def __init__(
+        self, filepath: Path, mode: Literal["r", "a", "w"] = "r"
+    ) -> None:
+        """Open the archive.
+
+        Parameters
+        ----------
+        filepath :
+            Path to the zip file.
+        mode :
+            ``"r"`` to read, ``"a"`` to add runs to an existing archive or
+            create it, ``"w"`` to replace it.
+
+        """
+        self.filepath = filepath
+        self._zip = zipfile.ZipFile(
+            filepath, mode, compression=zipfile.ZIP_DEFLATED
+        )
+        #: Name of the projections of every run and kind, in order of storage
+        self.index: dict[str, dict[str, list[str]]] = {}
+        for name in self._zip.namelist():
+            if not name.endswith("/" + META_FILENAME):
+                continue
+            run, kind, projection, _ = name.rsplit("/", 3)
+            self._add_to_index(run, kind, projection)
+
+    def __enter__(self) -> "HistogramArchive":
+        """Use the archive as a context manager."""
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Write the central directory."""
+        self.close()
+
+    def __contains__(self, run: str) -> bool:
+        """Tell if histograms of ``run`` are stored."""
+        return _run_key(run) in self.index
+
+    def __len__(self) -> int:
+        """Give the number of stored runs."""
+        return len(self.index)
+
+    def close(self) -> None:
+        """Close the file; the archive is not valid before."""
+        self._zip.close()
+
+    def runs(self) -> list[str]:
+        """Give the stored runs, in order of storage."""
+        return list(self.index)
+
+    def add(self, run: str, hist_data: Collection[Histogram]) -> None:
+        """Store the histograms of a run.
+
+        Parameters
+        ----------
+        run :
+            Name of the run, typically the path of its particle file.
+        hist_data :
+            Histograms to store. Their ``kind`` and ``columns`` identify them
+            in the run, so that distributions and acceptances of the same run
+            can be stored together.
+
+        Raises
+        ------
+        ValueError
+            If a histogram of the same kind and columns is already stored for
+            this run; zip members cannot be replaced.
+
+        """
+        run = _run_key(run)
+        for hist in hist_data:
+            projection = _projection_key(hist.columns)
+            if projection in self.index.get(run, {}).get(hist.kind, ()):
+                raise ValueError(
+                    f"{hist.kind} {hist.columns} of {run = } is already in "
+                    f"{self.filepath}."
+                )
+            prefix = f"{run}/{hist.kind}/{projection}/"
+            for array_name, array in zip(ARRAYS, hist):
+                # force_zip64 as the size is not known beforehand
+                with self._zip.open(
+                    prefix + array_name + ".npy", "w", force_zip64=True
+                ) as f:
+                    np.lib.format.write_array(
+                        f, np.asarray(array), allow_pickle=False
+                    )
+            meta = {
+                "columns": list(hist.columns),
+                "kind": hist.kind,
+                "bins": list(hist.bins),
+                "metadata": hist.metadata,
+            }
+            self._zip.writestr(
+                prefix + META_FILENAME, json.dumps(meta, default=_to_json)
+            )
+            self._add_to_index(run, hist.kind, projection)
+        print(f"Saved histograms of {run = } in {self.filepath}")
+
+    def get(
+        self,
+        run: str,
+        columns: tuple[str, str],
+        kind: str = "distribution",
+    ) -> Histogram:
+        """Read a single histogram, without decompressing the others."""
+        run = _run_key(run)
+        projection = _projection_key(columns)
+        if projection not in self.index.get(run, {}).get(kind, ()):
+            raise KeyError(
+                f"No {kind} {columns} for {run = } in {self.filepath}."
+            )
+        return self._read(f"{run}/{kind}/{projection}/")
+
+    def histograms(
+        self, run: str, kind: str = "distribution"
+    ) -> list[Histogram]:
+        """Read all the histograms of a kind of a run, in order of storage.
+
+        They can be given to :func:`.plot_all_distribution_histograms` or
+        :func:`.plot_all_acceptance_histograms`.
+
+        """
+        run = _run_key(run)
+        return [
+            self._read(f"{run}/{kind}/{projection}/")
+            for projection in self.index.get(run, {}).get(kind, [])
+        ]
+
+    def _read(self, prefix: str) -> Histogram:
+        """Read the histogram which members start with ``prefix``."""
+        meta = json.loads(self._zip.read(prefix + META_FILENAME))
+        arrays = []
+        for array_name in ARRAYS:
+            with self._zip.open(prefix + array_name + ".npy") as f:
+                arrays.append(np.lib.format.read_array(f, allow_pickle=False))
+        return Histogram(
+            *arrays,
+            columns=tuple(meta["columns"]),
+            kind=meta["kind"],
+            metadata=meta["metadata"],
+        )
+
+    def _add_to_index(self, run: str, kind: str, projection: str) -> None:
+        """Register a stored histogram."""
+        self.index.setdefault(run, {}).setdefault(kind, []).append(projection)
+
+
+def _run_key(run: str | Path) -> str:
+    """Give the name of a run in the archive.
+
+    Zip members are relative paths, hence the leading slash of absolute paths
+    is removed.
+
+    """
+    return Path(run).as_posix().lstrip("/")
+
+
+def _projection_key(columns: Collection[str]) -> str:
+    """Give the name of a projection, as in :func:`.save_all_distributions`."""
+    return "_".join(columns).replace(" ", "_").replace("/", "_")
+
+
+def _to_json(value: Any) -> Any:
+    """Convert numpy scalars and arrays found in metadata."""
+    if isinstance(value, np.generic | np.ndarray):
+        return value.tolist()
+    return str(value)
@@ -0,0 +1,126 @@
+"""Define a fast reader for the ASCII particle files exported by TraceWin.
+
+These files hold two lines of header, a line with the column names, and then
+one particle per line, with whitespace-separated values.
+
+"""
+
+import time
+from collections.abc import Collection, Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+#: Number of lines before the line holding the column names.
+N_HEADER_LINES = 2
+
+
+def read_column_names(filepath: Path) -> list[str]:
+    """Get the name of the columns in the given ASCII file."""
+    with open(filepath, "r") as f:
+        for _ in range(N_HEADER_LINES):
+            f.readline()
+        return f.readline().split()
+
+
+def estimate_n_rows(filepath: Path, n_sample: int = 1000) -> int:
+    """Estimate the number of particles from the length of the first lines."""
+    size = filepath.stat().st_size
+    with open(filepath, "rb") as f:
+        header = sum(len(f.readline()) for _ in range(N_HEADER_LINES + 1))
+        sample = [len(line) for line, _ in zip(f, range(n_sample))]
+    if not sample:
+        return 0
+    return round((size - header) * len(sample) / sum(sample))
+
+
+def read_ascii(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    dtype: np.dtype | type = np.float64,
+) -> pd.DataFrame:
+    """Read the given ASCII particle file.
+
+    Parameters
+    ----------
+    filepath :
+        Path to the file to read.
+    columns :
+        Name of the columns to parse. The other ones are tokenized but never
+        converted to floats nor stored. If not provided, all columns are read.
+    dtype :
+        Type of the output columns. Use ``np.float32`` to halve memory usage.
+
+    """
+    start = time.perf_counter()
+    data = pd.read_csv(filepath, **_read_csv_kwargs(filepath, columns, dtype))
+    _report_rate(filepath, len(data), time.perf_counter() - start)
+    return data
+
+
+def iter_ascii_chunks(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    chunksize: int = 10**6,
+    dtype: np.dtype | type = np.float64,
+) -> Iterator[pd.DataFrame]:
+    """Read the given ASCII particle file by chunks of ``chunksize`` lines.
+
+    Only one chunk is held in memory at a time. Arguments are the same as in
+    :func:`read_ascii`.
+
+    """
+    start = time.perf_counter()
+    n_rows = 0
+    with pd.read_csv(
+        filepath,
+        chunksize=chunksize,
+        **_read_csv_kwargs(filepath, columns, dtype),
+    ) as reader:
+        for chunk in reader:
+            n_rows += len(chunk)
+            yield chunk
+    _report_rate(filepath, n_rows, time.perf_counter() - start)
+
+
+def _read_csv_kwargs(
+    filepath: Path,
+    columns: Collection[str] | None,
+    dtype: np.dtype | type,
+) -> dict:
+    """Give the :func:`pd.read_csv` arguments for the fastest parsing.
+
+    The ``r"\\s+"`` separator is handled by the C engine whitespace tokenizer;
+    we set ``engine="c"`` explicitly so that pandas never silently falls back
+    to the Python engine. Giving ``dtype`` skips type inference.
+
+    """
+    if columns is None:
+        usecols = None
+    else:
+        available = read_column_names(filepath)
+        missing = [col for col in columns if col not in available]
+        if missing:
+            raise KeyError(
+                f"Columns {missing} not found in {filepath = }. Available "
+                f"columns are {available}."
+            )
+        usecols = list(dict.fromkeys(columns))
+    return {
+        "skiprows": N_HEADER_LINES,
+        "sep": r"\s+",
+        "engine": "c",
+        "usecols": usecols,
+        "dtype": dtype,
+        "index_col": False,
+    }
+
+
+def _report_rate(filepath: Path, n_rows: int, duration: float) -> None:
+    """Print the parsing speed."""
+    rate = n_rows / duration if duration > 0.0 else float("inf")
+    print(
+        f"Read {n_rows} particles in {duration:.2f}s ({rate:.3g} rows/s) "
+        f"from {filepath = }"
+    )
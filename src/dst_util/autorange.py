@@ -0,0 +1,129 @@
+"""Define the automatic range of histograms, from robust quantiles.
+
+A projection with ``range="auto"`` covers, along each axis, the values
+between the ``quantile`` and ``1 - quantile`` quantiles, widened by
+``margin`` times their spread and clipped to the extrema. A few outliers
+hence do not squeeze the beam in a handful of bins, while the halo is kept.
+
+Quantiles are estimated on a random subsample of fixed size, so that the cost
+does not depend on the number of particles. When the file is read by chunks,
+every chunk contributes a proportional part of the subsample. The subsample
+must be large: ``quantile * sample_size`` particles lie beyond every quantile,
+and fewer make the range noisy.
+
+"""
+
+from collections.abc import Collection
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from dst_util.compute import Histogram
+
+#: Fraction of particles that may be left out on each side.
+DEFAULT_QUANTILE = 1e-4
+#: Widening of the range, as a fraction of the spread between quantiles.
+DEFAULT_MARGIN = 0.1
+#: Number of particles on which quantiles are estimated.
+DEFAULT_SAMPLE_SIZE = 1_000_000
+
+
+def sample(values: np.ndarray, size: int, seed: int | None = 0) -> np.ndarray:
+    """Give ``size`` values drawn at random, or all values if fewer."""
+    values = np.asarray(values)
+    if len(values) <= size:
+        return values
+    rng = np.random.default_rng(seed)
+    return values[rng.integers(0, len(values), size)]
+
+
+def limits_from_quantiles(
+    low: float,
+    high: float,
+    minimum: float,
+    maximum: float,
+    margin: float = DEFAULT_MARGIN,
+) -> tuple[float, float]:
+    """Widen the range between two quantiles, without exceeding extrema."""
+    spread = high - low
+    return (
+        float(max(minimum, low - margin * spread)),
+        float(min(maximum, high + margin * spread)),
+    )
+
+
+def robust_range(
+    values: np.ndarray,
+    quantile: float = DEFAULT_QUANTILE,
+    margin: float = DEFAULT_MARGIN,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> tuple[float, float]:
+    """Give the automatic range of a column.
+
+    Non-finite values are ignored; if there is no finite value, the range is
+    NaN, which :func:`.uniform_edges` rejects.
+
+    """
+    values = np.asarray(values)
+    finite = sample(values, sample_size)
+    finite = finite[np.isfinite(finite)]
+    if not finite.size:
+        return np.nan, np.nan
+    low, high = np.quantile(finite, [quantile, 1.0 - quantile])
+    return limits_from_quantiles(
+        low, high, np.nanmin(values), np.nanmax(values), margin
+    )
+
+
+def robust_limits(
+    data: Any,
+    columns: Collection[str],
+    quantile: float = DEFAULT_QUANTILE,
+    margin: float = DEFAULT_MARGIN,
+    sample_size: int = DEFAULT_SAMPLE_SIZE,
+) -> dict[str, tuple[float, float]]:
+    """Give the automatic range of the given columns."""
+    return {
+        col: robust_range(data[col], quantile, margin, sample_size)
+        for col in columns
+    }
+
+
+def auto_range_kwargs(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> dict[tuple[str, str], dict[str, Any]]:
+    """Give every projection an automatic range, and drop its plot limits."""
+    return {
+        columns: {
+            key: value
+            for key, value in kwargs.items()
+            if key not in ("xlim", "ylim")
+        }
+        | {"range": "auto"}
+        for columns, kwargs in plot_single_kwargs.items()
+    }
+
+
+def fixed_range_kwargs(
+    hist_data: Collection["Histogram"],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> dict[tuple[str, str], dict[str, Any]]:
+    """Give every projection the range of already computed histograms.
+
+    Used to plot a density with the automatic range of the acceptance it is
+    drawn over.
+
+    """
+    return {
+        columns: kwargs
+        | {
+            "range": (
+                (float(hist.xedges[0]), float(hist.xedges[-1])),
+                (float(hist.yedges[0]), float(hist.yedges[-1])),
+            )
+        }
+        for (columns, kwargs), hist in zip(
+            plot_single_kwargs.items(), hist_data, strict=True
+        )
+    }
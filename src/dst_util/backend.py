@@ -0,0 +1,35 @@
+"""Define the selection of the matplotlib backend.
+
+On cluster nodes without display, letting pyplot look for an interactive
+backend is slow and useless. The backend is selected through the
+``MPLBACKEND`` environment variable, so that matplotlib does not need to be
+imported to select it.
+
+"""
+
+import os
+import sys
+
+
+def is_headless() -> bool:
+    """Tell if there is no display to show figures."""
+    if sys.platform in ("win32", "darwin"):
+        return False
+    return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def select_backend(interactive: bool = True) -> None:
+    """Use the non-interactive Agg backend when figures cannot be shown.
+
+    Parameters
+    ----------
+    interactive :
+        If False, figures are only saved, never shown, and Agg is always
+        used. A backend explicitly set by the user with ``MPLBACKEND`` is
+        always respected.
+
+    """
+    if os.environ.get("MPLBACKEND"):
+        return
+    if not interactive or is_headless():
+        os.environ["MPLBACKEND"] = "Agg"
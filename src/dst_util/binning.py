@@ -0,0 +1,332 @@
+"""Define a binning engine computing several 2D histograms in one pass.
+
+:func:`np.histogram2d` locates every value with a binary search, and is called
+once per projection; a column shared by two projections is hence searched
+twice. Here, the bin index of every needed column is computed once, with
+arithmetic on uniform edges, and every projection is filled with a single
+:func:`np.bincount`.
+
+Results are identical to :func:`np.histogram2d`: indices are corrected
+against the actual edges as :func:`np.histogram` does, values outside of the
+edges are discarded and values equal to the last edge fall in the last bin.
+
+With several ``workers``, binning runs on a thread pool; NumPy releases the
+GIL in the comparisons and arithmetic that dominate it. Large columns are
+split in contiguous slices, which partial counts are summed; smaller ones are
+binned one projection per thread. Counts are integers, so that the result
+does not depend on the number of workers.
+
+"""
+
+from collections.abc import Collection, Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from dst_util.autorange import robust_limits
+
+if TYPE_CHECKING:
+    from dst_util.progress import Progress
+
+#: Edges of a 2D histogram along x and y.
+Edges2D = tuple[np.ndarray, np.ndarray]
+#: Columns are split across threads only if every slice has this number of
+#: particles; below, thread overhead outweighs the gain.
+MIN_PARTICLES_PER_SLICE = 1 << 18
+#: Distribution bins with fewer particles are not drawn, as in
+#: :meth:`.Axes.hist2d` with ``cmin=1``.
+DEFAULT_CMIN = 1.0
+
+
+def uniform_edges(low: float, high: float, bins: int) -> np.ndarray:
+    """Compute bin edges exactly as :func:`np.histogram2d` does.
+
+    Edges have the type of ``low`` and ``high``: float64 for Python floats,
+    float32 for the extrema of single precision data.
+
+    """
+    if low > high:
+        raise ValueError("max must be larger than min in range parameter.")
+    if not (np.isfinite(low) and np.isfinite(high)):
+        raise ValueError(f"supplied range of [{low}, {high}] is not finite")
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    return np.linspace(low, high, bins + 1)
+
+
+def projection_ranges(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> list[tuple[tuple[float, float], tuple[float, float]] | str | None]:
+    """Give the histogram range of every projection.
+
+    It is None if the range spans the extrema of the data, and ``"auto"`` if
+    it is set from robust quantiles, see :mod:`.autorange`.
+
+    """
+    ranges = []
+    for kwargs in plot_single_kwargs.values():
+        range_ = kwargs.get("range")
+        if range_ == "as_plot_limits":
+            assert kwargs.get("xlim") is not None
+            assert kwargs.get("ylim") is not None
+            range_ = (kwargs["xlim"], kwargs["ylim"])
+        ranges.append(range_)
+    return ranges
+
+
+def columns_without_range(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> set[str]:
+    """Give the columns which extrema are needed to compute edges."""
+    return {
+        col
+        for cols, range_ in zip(
+            plot_single_kwargs, projection_ranges(plot_single_kwargs)
+        )
+        if range_ is None
+        for col in cols
+    }
+
+
+def columns_with_auto_range(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> set[str]:
+    """Give the columns which automatic range is needed to compute edges."""
+    return {
+        col
+        for cols, range_ in zip(
+            plot_single_kwargs, projection_ranges(plot_single_kwargs)
+        )
+        if range_ == "auto"
+        for col in cols
+    }
+
+
+def projection_edges(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    limits: Mapping[str, tuple[float, float]],
+    auto_limits: Mapping[str, tuple[float, float]] | None = None,
+) -> list[Edges2D]:
+    """Compute the edges of every projection.
+
+    Parameters
+    ----------
+    plot_single_kwargs :
+        Keys are the projections; values may hold a ``range``.
+    bins :
+        Number of bins along each axis.
+    limits :
+        Extrema of every column in :func:`columns_without_range`.
+    auto_limits :
+        Automatic range of every column in :func:`columns_with_auto_range`.
+
+    """
+    all_edges = []
+    for cols, range_ in zip(
+        plot_single_kwargs, projection_ranges(plot_single_kwargs)
+    ):
+        if range_ is None:
+            range_ = (limits[cols[0]], limits[cols[1]])
+        elif range_ == "auto":
+            assert auto_limits is not None
+            range_ = (auto_limits[cols[0]], auto_limits[cols[1]])
+        all_edges.append(
+            (
+                uniform_edges(*range_[0], bins),
+                uniform_edges(*range_[1], bins),
+            )
+        )
+    return all_edges
+
+
+def column_limits(
+    data: Any, columns: Collection[str]
+) -> dict[str, tuple[float, float]]:
+    """Compute the extrema of the given columns.
+
+    Extrema keep the type of the data, as the edges computed from them by
+    :func:`np.histogram2d` do.
+
+    """
+    limits = {}
+    for col in columns:
+        values = np.asarray(data[col])
+        limits[col] = (values.min(), values.max())
+    return limits
+
+
+def bin_indices(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Give the bin index of every value, -1 if it is out of ``edges``.
+
+    ``edges`` must be uniformly spaced, as produced by :func:`uniform_edges`.
+
+    """
+    values = np.asarray(values)
+    n_bins = len(edges) - 1
+    first, last = edges[0], edges[-1]
+
+    indices = np.full(values.shape, -1, dtype=np.intp)
+    # NaN fails both comparisons and is hence discarded
+    keep = (values >= first) & (values <= last)
+    kept = values[keep]
+
+    found = ((kept - first) * (n_bins / (last - first))).astype(np.intp)
+    found[found == n_bins] -= 1
+    # Fix rounding errors so that edges[i] <= value < edges[i + 1]
+    found[kept < edges[found]] -= 1
+    found[(kept >= edges[found + 1]) & (found != n_bins - 1)] += 1
+
+    indices[keep] = found
+    return indices
+
+
+def histogram_projections(
+    data: Any,
+    projections: Sequence[tuple[tuple[str, str], Edges2D]],
+    progress: "Progress | None" = None,
+    workers: int = 1,
+) -> list[np.ndarray]:
+    """Count the particles of every projection in a single pass.
+
+    Parameters
+    ----------
+    data :
+        Object giving an array-like for every column name.
+    projections :
+        Name of the x and y columns of every projection, with the edges along
+        x and y.
+    progress :
+        If provided, advancement is reported after every projection, or after
+        every task with several ``workers``.
+    workers :
+        Number of threads binning the particles.
+
+    Returns
+    -------
+    list[np.ndarray]
+        Counts of every projection, as float; first index is for x, second
+        for y.
+
+    """
+    if workers > 1 and projections:
+        return _threaded_histogram_projections(
+            data, projections, workers, progress
+        )
+
+    indices: dict[tuple[str, bytes], np.ndarray] = {}
+
+    def _cached_indices(column: str, edges: np.ndarray) -> np.ndarray:
+        key = (column, edges.tobytes())
+        if key not in indices:
+            indices[key] = bin_indices(data[column], edges)
+        return indices[key]
+
+    all_counts = []
+    for i, ((x_col, y_col), (xedges, yedges)) in enumerate(projections):
+        if progress is not None:
+            progress.update("Binning", i / len(projections))
+        ix = _cached_indices(x_col, xedges)
+        iy = _cached_indices(y_col, yedges)
+        n_x, n_y = len(xedges) - 1, len(yedges) - 1
+        inside = (ix >= 0) & (iy >= 0)
+        flat = ix[inside] * n_y + iy[inside]
+        counts = np.bincount(flat, minlength=n_x * n_y).reshape(n_x, n_y)
+        all_counts.append(counts.astype(np.float64))
+    if progress is not None:
+        progress.update("Binning", 1.0)
+    return all_counts
+
+
+def _threaded_histogram_projections(
+    data: Any,
+    projections: Sequence[tuple[tuple[str, str], Edges2D]],
+    workers: int,
+    progress: "Progress | None",
+) -> list[np.ndarray]:
+    """Bin slices of the columns, or single projections, in parallel."""
+    columns = list(
+        dict.fromkeys(col for cols, _ in projections for col in cols)
+    )
+    arrays = {col: np.asarray(data[col]) for col in columns}
+    n_particles = len(arrays[columns[0]])
+    n_slices = min(workers, n_particles // MIN_PARTICLES_PER_SLICE)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures: list[Future] = []
+        if n_slices > 1:
+            bounds = np.linspace(0, n_particles, n_slices + 1).astype(int)
+            for start, stop in zip(bounds[:-1], bounds[1:]):
+                chunk = {
+                    col: array[start:stop] for col, array in arrays.items()
+                }
+                futures.append(
+                    pool.submit(histogram_projections, chunk, projections)
+                )
+        else:
+            # Columns shared by two projections are binned twice
+            for projection in projections:
+                futures.append(
+                    pool.submit(histogram_projections, arrays, [projection])
+                )
+        try:
+            for i, _ in enumerate(as_completed(futures)):
+                if progress is not None:
+                    progress.update("Binning", i / len(futures))
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        results = [future.result() for future in futures]
+
+    if progress is not None:
+        progress.update("Binning", 1.0)
+    if n_slices > 1:
+        return [np.sum(partial, axis=0) for partial in zip(*results)]
+    return [counts for result in results for counts in result]
+
+
+def bin_all_projections(
+    data: Any,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    progress: "Progress | None" = None,
+    workers: int = 1,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Compute the histograms of every projection of in-memory data.
+
+    ``workers`` is the number of threads binning the particles.
+
+    Returns
+    -------
+    list[tuple[np.ndarray, np.ndarray, np.ndarray]]
+        Counts, x edges and y edges of every projection, in the order of
+        ``plot_single_kwargs``.
+
+    """
+    limits = column_limits(data, columns_without_range(plot_single_kwargs))
+    auto_limits = robust_limits(
+        data, columns_with_auto_range(plot_single_kwargs)
+    )
+    all_edges = projection_edges(plot_single_kwargs, bins, limits, auto_limits)
+    all_counts = histogram_projections(
+        data,
+        list(zip(plot_single_kwargs, all_edges)),
+        progress=progress,
+        workers=workers,
+    )
+    return [
+        (counts, xedges, yedges)
+        for counts, (xedges, yedges) in zip(all_counts, all_edges)
+    ]
+
+
+def apply_cmin_cmax(
+    h: np.ndarray, cmin: float | None = None, cmax: float | None = None
+) -> np.ndarray:
+    """Set bins out of ``[cmin, cmax]`` to NaN, as :meth:`.Axes.hist2d`."""
+    if cmin is not None:
+        h[h < cmin] = np.nan
+    if cmax is not None:
+        h[h > cmax] = np.nan
+    return h
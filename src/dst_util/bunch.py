@@ -0,0 +1,262 @@
+"""Define a compact container of particle coordinates.
+
+A :class:`ParticleBunch` holds all its columns in a single two-dimensional
+array, one row per column, so that every column is a contiguous view. Unlike a
+:class:`pd.DataFrame`, it has no index and accessing a column does not create
+any object but a view.
+
+:func:`read_bunch` fills the final array directly: reading a ``.dst`` file
+allocates nothing but the returned array, even with unit or type conversions.
+
+"""
+
+from collections.abc import Collection, Iterator, Mapping
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+from dst_util.ascii_reader import iter_ascii_chunks, read_column_names
+from dst_util.dst_helper import (
+    DST_TO_ASCII_COLUMNS,
+    PROGRESS_CHUNKSIZE,
+    estimate_n_particles,
+    is_binary,
+    memmap_dst,
+)
+
+if TYPE_CHECKING:
+    from dst_util.progress import Progress
+
+
+class ParticleBunch:
+    """Hold the coordinates of particles, one contiguous row per column."""
+
+    def __init__(
+        self,
+        array: np.ndarray,
+        columns: Collection[str],
+        filepath: Path | None = None,
+    ) -> None:
+        """Wrap an existing array, without copying it.
+
+        Parameters
+        ----------
+        array :
+            Array of shape ``(n_columns, n_particles)``.
+        columns :
+            Name of every row of ``array``.
+        filepath :
+            File the particles were read from; used to name outputs.
+
+        """
+        if array.ndim != 2 or array.shape[0] != len(columns):
+            raise ValueError(
+                f"Expected an array of shape ({len(columns)}, n_particles), "
+                f"got {array.shape}."
+            )
+        self.array = array
+        self.columns = list(columns)
+        self.filepath = filepath
+        self._rows = {col: i for i, col in enumerate(self.columns)}
+
+    @classmethod
+    def empty(
+        cls,
+        columns: Collection[str],
+        n_particles: int,
+        dtype: np.dtype | type = np.float64,
+        filepath: Path | None = None,
+    ) -> "ParticleBunch":
+        """Allocate a bunch, without initializing its values."""
+        return cls(
+            np.empty((len(columns), n_particles), dtype=dtype),
+            columns,
+            filepath,
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        data: Mapping[str, Any] | pd.DataFrame,
+        columns: Collection[str] | None = None,
+        dtype: np.dtype | type = np.float64,
+        filepath: Path | None = None,
+    ) -> "ParticleBunch":
+        """Copy the ``columns`` of a dataframe or of a dict of arrays."""
+        if columns is None:
+            columns = list(data.keys())
+        n_particles = len(data[next(iter(columns))]) if columns else 0
+        bunch = cls.empty(columns, n_particles, dtype, filepath)
+        for row, col in zip(bunch.array, columns):
+            row[...] = np.asarray(data[col])
+        return bunch
+
+    def __len__(self) -> int:
+        """Give the number of particles."""
+        return self.array.shape[1]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Give a view of a single column."""
+        try:
+            return self.array[self._rows[column]]
+        except KeyError:
+            raise KeyError(
+                f"Column {column} not found. Available columns are "
+                f"{self.columns}."
+            ) from None
+
+    def __contains__(self, column: object) -> bool:
+        """Tell if the bunch holds ``column``."""
+        return column in self._rows
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over column names, as a dataframe does."""
+        return iter(self.columns)
+
+    def __repr__(self) -> str:
+        """Give a short description of the bunch."""
+        return (
+            f"ParticleBunch({len(self)} particles, {self.columns}, "
+            f"dtype={self.dtype}, filepath={self.filepath})"
+        )
+
+    def keys(self) -> list[str]:
+        """Give the column names."""
+        return list(self.columns)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Give the type of the coordinates."""
+        return self.array.dtype
+
+    def memory_usage(self) -> int:
+        """Give the number of bytes held by the bunch.
+
+        When the array is a view, the whole underlying buffer is counted.
+
+        """
+        base = self.array
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        return max(base.nbytes, self.array.nbytes)
+
+    def astype(self, dtype: np.dtype | type) -> "ParticleBunch":
+        """Give a copy of the bunch with coordinates of type ``dtype``."""
+        return ParticleBunch(
+            self.array.astype(dtype), self.columns, self.filepath
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Give a dataframe viewing the columns, without copy."""
+        return pd.DataFrame(
+            {col: self[col] for col in self.columns}, copy=False
+        )
+
+
+def read_bunch(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    dtype: np.dtype | type = np.float64,
+    progress: "Progress | None" = None,
+) -> ParticleBunch:
+    """Read the given file in a :class:`ParticleBunch`.
+
+    Arguments are the same as :func:`.read`. ASCII files are always read by
+    chunks of :data:`.PROGRESS_CHUNKSIZE` lines, copied in place in the final
+    array.
+
+    """
+    if is_binary(filepath):
+        bunch = _read_dst_bunch(filepath, columns, dtype)
+        if progress is not None:
+            progress.update("Reading", 1.0)
+        return bunch
+    return _read_ascii_bunch(filepath, columns, dtype, progress)
+
+
+def _read_dst_bunch(
+    filepath: Path,
+    columns: Collection[str] | None,
+    dtype: np.dtype | type,
+) -> ParticleBunch:
+    """Convert the ``.dst`` records in place in the final array."""
+    _, particles = memmap_dst(filepath)
+    fields = {
+        column: (field, factor)
+        for field, (column, factor) in DST_TO_ASCII_COLUMNS.items()
+    }
+    if columns is None:
+        columns = list(fields)
+    if missing := [col for col in columns if col not in fields]:
+        raise KeyError(f"Columns {missing} not found in {filepath = }.")
+
+    bunch = ParticleBunch.empty(columns, len(particles), dtype, filepath)
+    for row, col in zip(bunch.array, columns):
+        field, factor = fields[col]
+        np.multiply(particles[field], factor, out=row, casting="same_kind")
+    return bunch
+
+
+def _read_ascii_bunch(
+    filepath: Path,
+    columns: Collection[str] | None,
+    dtype: np.dtype | type,
+    progress: "Progress | None",
+) -> ParticleBunch:
+    """Copy chunks of the ASCII file in an array of the estimated size.
+
+    The array is enlarged if the estimation was too low, and shrunk in place
+    to the particles actually read, so that no spare memory is held by the
+    columns of the bunch.
+
+    """
+    if columns is None:
+        columns = read_column_names(filepath)
+    columns = list(dict.fromkeys(columns))
+    estimated = estimate_n_particles(filepath)
+    array = np.empty(
+        (len(columns), estimated + estimated // 100 + 1024), dtype=dtype
+    )
+
+    n_read = 0
+    for chunk in iter_ascii_chunks(
+        filepath, columns, PROGRESS_CHUNKSIZE, dtype=dtype
+    ):
+        end = n_read + len(chunk)
+        if end > array.shape[1]:
+            larger = np.empty(
+                (len(columns), max(end, array.shape[1] * 3 // 2)), dtype=dtype
+            )
+            larger[:, :n_read] = array[:, :n_read]
+            array = larger
+        for i, col in enumerate(columns):
+            array[i, n_read:end] = chunk[col].to_numpy()
+        n_read = end
+        if progress is not None:
+            progress.update("Reading", n_read / max(1, estimated))
+    return ParticleBunch(_shrink(array, n_read), columns, filepath)
+
+
+def _shrink(array: np.ndarray, n_particles: int) -> np.ndarray:
+    """Keep the first ``n_particles`` of every row, releasing the others.
+
+    Rows are moved to the start of the buffer, which is then reallocated;
+    unlike a copy, this does not double the peak memory.
+
+    """
+    n_columns, capacity = array.shape
+    if n_particles == capacity:
+        return array
+    flat = array.reshape(-1)
+    for i in range(1, n_columns):
+        flat[i * n_particles : (i + 1) * n_particles] = array[i, :n_particles]
+    del flat
+    try:
+        array.resize((n_columns, n_particles))
+    except ValueError:
+        # Buffer is referenced elsewhere and cannot be reallocated
+        compact = array.reshape(-1)[: n_columns * n_particles]
+        return compact.reshape(n_columns, n_particles).copy()
+    return array
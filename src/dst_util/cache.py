@@ -0,0 +1,244 @@
+"""Define an on-disk cache of parsed particle files.
+
+Parsing a big ASCII file takes much longer than loading the equivalent binary
+arrays. Every parsed column is hence stored as a ``.npy`` file; the next reads
+of the same, unchanged file memory-map these arrays instead of parsing again.
+
+An entry is identified by the resolved path of the source file, its size, its
+modification time and, optionally, a hash of its content. The total size of
+the cache is bounded; least recently used entries are evicted first.
+
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections.abc import Collection
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from dst_util.ascii_reader import read_column_names
+from dst_util.dst_helper import DST_TO_ASCII_COLUMNS, is_binary, read
+
+if TYPE_CHECKING:
+    from dst_util.progress import Progress
+
+#: Default location of the cache; override with ``DST_UTIL_CACHE_DIR``.
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("DST_UTIL_CACHE_DIR", Path.home() / ".cache" / "dst_util")
+)
+#: Default size budget of the cache, in bytes.
+DEFAULT_MAX_BYTES = 4 * 1024**3
+#: Name of the file describing a cache entry.
+META_FILENAME = "meta.json"
+
+
+class ParticleCache:
+    """Store and retrieve parsed particle columns."""
+
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        content_hash: bool = False,
+    ) -> None:
+        """Set up the cache.
+
+        Parameters
+        ----------
+        cache_dir :
+            Where entries are stored. If not provided, we use
+            :data:`DEFAULT_CACHE_DIR`. Use :func:`source_cache_dir` to store
+            the cache next to the source files.
+        max_bytes :
+            Maximum total size of the cache.
+        content_hash :
+            If True, the content of the source file is hashed and becomes part
+            of the key. Safer when files are modified without their
+            modification time being updated, but costs a full read of the file
+            at every access.
+
+        """
+        self.cache_dir = (
+            cache_dir if cache_dir is not None else DEFAULT_CACHE_DIR
+        )
+        self.max_bytes = max_bytes
+        self.content_hash = content_hash
+
+    def read(
+        self,
+        filepath: Path,
+        columns: Collection[str] | None = None,
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+    ) -> pd.DataFrame:
+        """Read the file, using cached columns when possible.
+
+        Only the columns that are not already cached are parsed, and they are
+        added to the cache. ``progress`` is passed to :func:`.read`.
+
+        """
+        if columns is None:
+            columns = _all_columns(filepath)
+        dtype = np.dtype(dtype)
+        entry = self.entry_dir(filepath)
+        meta = self._load_meta(entry)
+
+        missing = [
+            col for col in columns if _column_key(col, dtype) not in meta
+        ]
+        if missing:
+            parsed = read(filepath, missing, dtype=dtype, progress=progress)
+            self._store(entry, filepath, parsed, dtype, meta)
+            self.evict(keep=entry)
+        else:
+            print(f"Loaded {filepath = } from cache {entry}")
+            if progress is not None:
+                progress.update("Reading", 1.0)
+
+        _touch(entry)
+        return pd.DataFrame(
+            {
+                col: np.load(
+                    entry / meta[_column_key(col, dtype)], mmap_mode="r"
+                )
+                for col in columns
+            },
+            copy=False,
+        )
+
+    def entry_dir(self, filepath: Path) -> Path:
+        """Give the directory that holds the entry of ``filepath``."""
+        stat = filepath.stat()
+        key = hashlib.sha1(
+            f"{filepath.resolve()}|{stat.st_size}|{stat.st_mtime_ns}".encode()
+        )
+        if self.content_hash:
+            key.update(_hash_content(filepath).encode())
+        return self.cache_dir / key.hexdigest()
+
+    def size(self) -> int:
+        """Compute the total size of the cache in bytes."""
+        return sum(_entry_size(entry) for entry in self._entries())
+
+    def evict(self, keep: Path | None = None) -> None:
+        """Remove least recently used entries until the budget is respected.
+
+        Parameters
+        ----------
+        keep :
+            An entry that must not be removed, typically the one that was just
+            written.
+
+        """
+        entries = sorted(self._entries(), key=lambda entry: _last_used(entry))
+        sizes = {entry: _entry_size(entry) for entry in entries}
+        total = sum(sizes.values())
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= sizes[entry]
+            print(f"Evicted {entry} from cache")
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        for entry in self._entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def _entries(self) -> list[Path]:
+        """List all the complete entries."""
+        if not self.cache_dir.is_dir():
+            return []
+        return [
+            path
+            for path in self.cache_dir.iterdir()
+            if (path / META_FILENAME).is_file()
+        ]
+
+    def _load_meta(self, entry: Path) -> dict[str, str]:
+        """Load the mapping between column keys and ``.npy`` files."""
+        meta_path = entry / META_FILENAME
+        if not meta_path.is_file():
+            return {}
+        with open(meta_path, "r") as f:
+            return json.load(f)["columns"]
+
+    def _store(
+        self,
+        entry: Path,
+        filepath: Path,
+        data: pd.DataFrame,
+        dtype: np.dtype,
+        meta: dict[str, str],
+    ) -> None:
+        """Save the given columns and update the entry description."""
+        entry.mkdir(parents=True, exist_ok=True)
+        for col in data.columns:
+            key = _column_key(col, dtype)
+            filename = hashlib.sha1(key.encode()).hexdigest()[:16] + ".npy"
+            _atomic_save(entry / filename, data[col].to_numpy(dtype=dtype))
+            meta[key] = filename
+
+        content = {"source": str(filepath.resolve()), "columns": meta}
+        with tempfile.NamedTemporaryFile(
+            "w", dir=entry, suffix=".tmp", delete=False
+        ) as f:
+            json.dump(content, f, indent=1)
+        os.replace(f.name, entry / META_FILENAME)
+        print(f"Cached {list(data.columns)} of {filepath = } in {entry}")
+
+
+def source_cache_dir(filepath: Path) -> Path:
+    """Give a cache directory located next to ``filepath``."""
+    return filepath.parent / ".dst_util_cache"
+
+
+def _all_columns(filepath: Path) -> list[str]:
+    """Give the name of all the columns stored in ``filepath``."""
+    if is_binary(filepath):
+        return [column for column, _ in DST_TO_ASCII_COLUMNS.values()]
+    return read_column_names(filepath)
+
+
+def _column_key(column: str, dtype: np.dtype) -> str:
+    """Identify a column with a given type in the entry description."""
+    return f"{column}|{dtype.str}"
+
+
+def _hash_content(filepath: Path, block_size: int = 2**24) -> str:
+    """Compute a fast hash of the content of ``filepath``."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(filepath, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _atomic_save(filepath: Path, array: np.ndarray) -> None:
+    """Save ``array``, so that a partially written file is never loaded."""
+    tmp = filepath.with_suffix(".tmp.npy")
+    np.save(tmp, array)
+    os.replace(tmp, filepath)
+
+
+def _touch(entry: Path) -> None:
+    """Mark the entry as recently used."""
+    os.utime(entry / META_FILENAME)
+
+
+def _last_used(entry: Path) -> float:
+    """Give the last time the entry was used."""
+    return (entry / META_FILENAME).stat().st_mtime
+
+
+def _entry_size(entry: Path) -> int:
+    """Compute the size of an entry in bytes."""
+    return sum(path.stat().st_size for path in entry.iterdir())
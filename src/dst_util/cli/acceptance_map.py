@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Provide a CLI to map the acceptance probability of many runs.
+
+Runs are added one at a time, so that hundreds of error-study runs can be
+processed on a node that could not hold them all. With ``--state``, the
+accumulation is saved after every run and resumed if interrupted.
+
+"""
+
+import argparse
+from pathlib import Path
+
+from dst_util.backend import select_backend
+from dst_util.cli.batch import collect_files
+from dst_util.constants import HIST_FORMATS
+
+
+def main():
+    """Define function called when script is run."""
+    parser = argparse.ArgumentParser("dst_util-acceptance-map")
+    parser.add_argument(
+        "paths",
+        help="Files, globs or directories holding the accepted particles of "
+        "every run.",
+        nargs="+",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        help="Look for files in subdirectories of the given directories.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-b",
+        "--bins",
+        help="Number of bins for the figure and files.",
+        type=int,
+        default=200,
+    )
+    parser.add_argument(
+        "--state",
+        help="Where the accumulation is saved after every run. If it exists, "
+        "accumulation is resumed and runs it holds are skipped.",
+        type=Path,
+        default=None,
+    )
+    parser.add_argument(
+        "-l",
+        "--levels",
+        help="Acceptance probabilities of the plotted and saved contours.",
+        type=float,
+        nargs="+",
+        default=[0.5, 0.9, 0.99],
+    )
+    parser.add_argument(
+        "-s",
+        "--save",
+        help="Flag to ask for saving of probability maps and contours.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="Format of the saved probability maps.",
+        choices=HIST_FORMATS,
+        default="csv",
+    )
+    parser.add_argument(
+        "--no-figure",
+        help="Do not plot nor save the figure.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--raster",
+        help="Draw every subplot as a single image instead of one vector "
+        "quad per bin; much faster for fine histograms.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--float32",
+        help="Store particle coordinates in single precision.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        help="Read every file by chunks of this number of particles.",
+        type=int,
+        default=None,
+    )
+    args = parser.parse_args()
+
+    filepaths = collect_files(args.paths, recursive=args.recursive)
+    if not filepaths:
+        parser.error(f"No file found in {args.paths}")
+
+    select_backend(interactive=False)
+    import numpy as np
+
+    from dst_util.wrappers import plot_acceptance_probability
+
+    plot_acceptance_probability(
+        filepaths,
+        bins=args.bins,
+        state_filepath=args.state,
+        save_hist_data=args.save,
+        levels=args.levels,
+        dtype=np.float32 if args.float32 else np.float64,
+        hist_format=args.format,
+        chunksize=args.chunksize,
+        figure=not args.no_figure,
+        render="raster" if args.raster else "mesh",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""Provide a CLI to process many distribution or acceptance files at once.
+
+Files are given as paths, globs or directories, and are distributed over a
+pool of processes. Every file produces the same figure and hist data as the
+``plot_distribution`` or ``plot_acceptance`` commands would. A JSON manifest
+summarizes the run. With ``--archive``, the histograms of all files are also
+gathered in a single :class:`.HistogramArchive`.
+
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import glob
+import json
+import os
+import time
+from collections.abc import Iterable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any
+
+from dst_util.backend import select_backend
+from dst_util.constants import (
+    HIST_FORMATS,
+    PARTICLE_PATTERNS,
+    PARTICLE_SUFFIXES,
+)
+
+
+def main():
+    """Define function called when script is run."""
+    parser = argparse.ArgumentParser("dst_util-batch")
+    parser.add_argument(
+        "paths",
+        help="Files, globs or directories holding ASCII or .dst files.",
+        nargs="+",
+    )
+    parser.add_argument(
+        "-m",
+        "--mode",
+        help="Plot distributions or acceptances.",
+        choices=("distribution", "acceptance"),
+        default="distribution",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        help="Look for files in subdirectories of the given directories.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-p",
+        "--pattern",
+        help="Names of the particle files picked in the given directories.",
+        nargs="+",
+        default=list(PARTICLE_PATTERNS),
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        help="Number of processes. Defaults to the number of CPUs.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "-b",
+        "--bins",
+        help="Number of bins for the figures and files.",
+        type=int,
+        default=500,
+    )
+    parser.add_argument(
+        "-s",
+        "--save",
+        help="Flag to ask for saving of hist data.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="Format of the saved hist data.",
+        choices=HIST_FORMATS,
+        default="csv",
+    )
+    parser.add_argument(
+        "--no-figure",
+        help="Do not plot nor save the figures.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--raster",
+        help="Draw every subplot as a single image instead of one vector "
+        "quad per bin; much faster for fine histograms.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--float32",
+        help="Store particle coordinates in single precision.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        help="Read every file by chunks of this number of particles.",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--archive",
+        help="Zip file in which the histograms of every file are gathered. "
+        "If it exists, files are added to it.",
+        type=Path,
+        default=None,
+    )
+    parser.add_argument(
+        "--manifest",
+        help="Where the JSON summary of the run is written.",
+        type=Path,
+        default=Path("dst_util_manifest.json"),
+    )
+    args = parser.parse_args()
+
+    filepaths = collect_files(
+        args.paths, recursive=args.recursive, patterns=args.pattern
+    )
+    if not filepaths:
+        parser.error(f"No file found in {args.paths}")
+
+    select_backend(interactive=False)
+    options = {
+        "mode": args.mode,
+        "bins": args.bins,
+        "save_hist_data": args.save,
+        "hist_format": args.format,
+        "figure": not args.no_figure,
+        "float32": args.float32,
+        "chunksize": args.chunksize,
+        "render": "raster" if args.raster else "mesh",
+    }
+    manifest = run_batch(
+        filepaths, options, workers=args.workers, archive=args.archive
+    )
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Saved manifest in {args.manifest}")
+    if manifest["failed"]:
+        raise SystemExit(1)
+
+
+def collect_files(
+    paths: Iterable[str],
+    recursive: bool = False,
+    patterns: Iterable[str] = PARTICLE_PATTERNS,
+) -> list[Path]:
+    """Expand files, globs and directories into a sorted list of files.
+
+    In directories, only files which extension is in
+    :data:`.PARTICLE_SUFFIXES` and which name matches one of ``patterns`` are
+    picked. Files and globs given explicitly are always taken.
+
+    """
+    patterns = tuple(patterns)
+    found = set()
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = "**/*" if recursive else "*"
+            candidates = Path(path).glob(pattern)
+            found.update(
+                candidate
+                for candidate in candidates
+                if candidate.suffix in PARTICLE_SUFFIXES
+                and any(
+                    fnmatch.fnmatch(candidate.name, pattern)
+                    for pattern in patterns
+                )
+                and candidate.is_file()
+            )
+            continue
+        if glob.has_magic(path):
+            found.update(
+                Path(match)
+                for match in glob.glob(path, recursive=recursive)
+                if os.path.isfile(match)
+            )
+            continue
+        found.add(Path(path))
+    return sorted(found)
+
+
+def run_batch(
+    filepaths: list[Path],
+    options: dict[str, Any],
+    workers: int | None = None,
+    archive: Path | None = None,
+) -> dict[str, Any]:
+    """Process all files and summarize the run.
+
+    Parameters
+    ----------
+    filepaths :
+        Files to process.
+    options :
+        Keyword arguments of :func:`process_file`.
+    workers :
+        Number of processes. If 1, files are processed in this process.
+    archive :
+        If given, histograms are sent back by the processes and added to this
+        :class:`.HistogramArchive`, which only this process writes.
+
+    """
+    start = time.perf_counter()
+    n_files = len(filepaths)
+    results = []
+    file_options = options | {"return_histograms": archive is not None}
+    storing = contextlib.nullcontext()
+    if archive is not None:
+        from dst_util.archive import HistogramArchive
+
+        storing = HistogramArchive(archive, "a")
+
+    with storing as store:
+
+        def _progress(result: dict[str, Any]) -> None:
+            histograms = result.pop("histograms", None)
+            if store is not None and histograms:
+                try:
+                    store.add(result["file"], histograms)
+                except ValueError as e:
+                    result["status"] = "error"
+                    result["error"] = f"{type(e).__name__}: {e}"
+            results.append(result)
+            print(
+                f"[{len(results)}/{n_files}] {result['status']} "
+                f"{result['file']} ({result['duration']:.2f}s)",
+                flush=True,
+            )
+
+        if workers == 1:
+            for filepath in filepaths:
+                _progress(process_file(filepath, **file_options))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(process_file, filepath, **file_options)
+                    for filepath in filepaths
+                ]
+                for future in as_completed(futures):
+                    _progress(future.result())
+
+    results.sort(key=lambda result: result["file"])
+    return {
+        "options": options,
+        "workers": workers or os.cpu_count(),
+        "archive": None if archive is None else str(archive),
+        "duration": time.perf_counter() - start,
+        "succeeded": sum(result["status"] == "ok" for result in results),
+        "failed": sum(result["status"] != "ok" for result in results),
+        "files": results,
+    }
+
+
+def process_file(
+    filepath: Path,
+    mode: str = "distribution",
+    bins: int = 500,
+    save_hist_data: bool = True,
+    hist_format: str = "csv",
+    figure: bool = True,
+    float32: bool = False,
+    chunksize: int | None = None,
+    render: str = "mesh",
+    return_histograms: bool = False,
+) -> dict[str, Any]:
+    """Plot and save a single file; never raise.
+
+    Returns
+    -------
+    dict[str, Any]
+        Name of the file, status (``"ok"`` or ``"error"``), duration and
+        error message if any. With ``return_histograms``, the computed
+        :class:`.Histogram` objects are under ``"histograms"``.
+
+    """
+    import numpy as np
+
+    from dst_util.wrappers import plot_acceptance, plot_distribution
+
+    start = time.perf_counter()
+    result: dict[str, Any] = {"file": str(filepath), "error": None}
+    kwargs = {
+        "save_hist_data": save_hist_data,
+        "dtype": np.float32 if float32 else np.float64,
+        "hist_format": hist_format,
+        "chunksize": chunksize,
+        "figure": figure,
+        "render": render,
+    }
+    try:
+        if mode == "acceptance":
+            hist_data = plot_acceptance(
+                filepath, bins_acceptance=bins, **kwargs
+            )
+        else:
+            hist_data = plot_distribution(filepath, bins=bins, **kwargs)
+        if return_histograms:
+            result["histograms"] = hist_data
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if figure:
+            import matplotlib.pyplot as plt
+
+            plt.close("all")
+    result["duration"] = time.perf_counter() - start
+    return result
+
+
+if __name__ == "__main__":
+    main()
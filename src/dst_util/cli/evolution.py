@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Provide a CLI to plot the evolution of the beam along the lattice.
+
+Files are given as paths, globs or directories, and are sorted in natural
+order, so that ``part_9.dst`` comes before ``part_10.dst``. Every file is
+reduced to one row of a table, in constant memory, see :mod:`.evolution`.
+
+"""
+
+import argparse
+from pathlib import Path
+
+from dst_util.backend import select_backend
+from dst_util.cli.batch import collect_files
+
+
+def main():
+    """Define function called when script is run."""
+    parser = argparse.ArgumentParser("dst_util-evolution")
+    parser.add_argument(
+        "paths",
+        help="Files, globs or directories holding the particles at every "
+        "position.",
+        nargs="+",
+    )
+    parser.add_argument(
+        "-r",
+        "--recursive",
+        help="Look for files in subdirectories of the given directories.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="Where the table is saved; the figure has the same name with a "
+        "'.png' suffix.",
+        type=Path,
+        default=Path("beam_evolution.csv"),
+    )
+    parser.add_argument(
+        "--positions",
+        help="Text file holding the position of every file along the "
+        "lattice, one per line. Defaults to the index of the file.",
+        type=Path,
+        default=None,
+    )
+    parser.add_argument(
+        "-q",
+        "--quantiles",
+        help="Quantiles of every column.",
+        type=float,
+        nargs="+",
+        default=[0.01, 0.05, 0.5, 0.95, 0.99],
+    )
+    parser.add_argument(
+        "--no-figure",
+        help="Only save the table.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--float32",
+        help="Store particle coordinates in single precision.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        help="Read every file by chunks of this number of particles.",
+        type=int,
+        default=10**6,
+    )
+    args = parser.parse_args()
+
+    filepaths = collect_files(args.paths, recursive=args.recursive)
+    if not filepaths:
+        parser.error(f"No file found in {args.paths}")
+
+    select_backend(interactive=False)
+    import numpy as np
+
+    from dst_util.dst_helper import save_figure
+    from dst_util.evolution import (
+        beam_evolution,
+        natural_key,
+        plot_evolution,
+        save_evolution,
+    )
+
+    filepaths = sorted(filepaths, key=natural_key)
+    positions = None
+    if args.positions is not None:
+        positions = np.atleast_1d(np.loadtxt(args.positions))
+        if len(positions) != len(filepaths):
+            parser.error(
+                f"{args.positions} holds {len(positions)} positions for "
+                f"{len(filepaths)} files."
+            )
+    table = beam_evolution(
+        filepaths,
+        positions=positions,
+        quantiles=args.quantiles,
+        chunksize=args.chunksize,
+        dtype=np.float32 if args.float32 else np.float64,
+    )
+    save_evolution(table, args.output)
+    if not args.no_figure:
+        save_figure(
+            plot_evolution(table, quantiles=args.quantiles), args.output
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """Provide a CLI to plot acceptance (you can add density)."""
 import argparse
+import contextlib
 from pathlib import Path
 
-from dst_util.wrappers import plot_acceptance
+from dst_util.backend import select_backend
+from dst_util.constants import DEFAULT_WORKERS, HIST_FORMATS
 
 
 def main():
@@ -12,14 +14,14 @@ def main():
     parser.add_argument(
         "-a",
         "--acceptance",
-        help="ASCII file holding acceptance. Not generated automatically by TraceWin, cf doc.",
+        help="ASCII or .dst file holding acceptance. Not generated automatically by TraceWin, cf doc.",
         type=str,
         required=True,
     )
     parser.add_argument(
         "-d",
         "--density",
-        help="ASCII file holding input distribution. Generally part_rfq.txt.",
+        help="ASCII or .dst file holding input distribution. Generally part_rfq.txt.",
         type=str,
         required=False,
         default=None,
@@ -38,13 +40,161 @@ def main():
         help="Flag to ask for saving of hist data.",
         action="store_false",
     )
-    args = parser.parse_args()
-    plot_acceptance(
-        Path(args.acceptance),
-        Path(args.density) if args.density is not None else None,
-        args.bins,
-        args.save,
+    parser.add_argument(
+        "-f",
+        "--format",
+        help="Format of the saved hist data. 'sparse' skips empty bins, "
+        "'matrix' is ready for pgfplots matrix plot*.",
+        choices=HIST_FORMATS,
+        default="csv",
+    )
+    parser.add_argument(
+        "--no-figure",
+        help="Do not plot nor save the figure; only compute and save hist "
+        "data. matplotlib is then never imported.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--raster",
+        help="Draw every subplot as a single image instead of one vector "
+        "quad per bin; much faster for fine histograms.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--float32",
+        help="Store particle coordinates in single precision to save memory.",
+        action="store_true",
     )
+    parser.add_argument(
+        "-c",
+        "--chunksize",
+        help="Read the file by chunks of this number of particles, to "
+        "process files larger than memory. Requires explicit hist ranges to "
+        "avoid an additional pass over the file.",
+        type=int,
+        required=False,
+        default=None,
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        help="Number of threads binning the particles, e.g. the number of "
+        "CPUs for large files.",
+        type=int,
+        required=False,
+        default=DEFAULT_WORKERS,
+    )
+    parser.add_argument(
+        "--cache",
+        help="Cache parsed particles to speed up the next runs. Optionally "
+        "give the cache directory; defaults to ~/.cache/dst_util.",
+        nargs="?",
+        const="",
+        default=None,
+    )
+    parser.add_argument(
+        "--smooth",
+        help="Smooth the histograms with a Gaussian kernel. Optionally give "
+        "its standard deviation along x and y, in column units; defaults to "
+        "Scott's rule for every projection.",
+        nargs="*",
+        type=float,
+        metavar=("HX", "HY"),
+        default=None,
+    )
+    parser.add_argument(
+        "--auto-range",
+        help="Estimate the range and plot limits of every projection from "
+        "robust quantiles of the particles, instead of the default limits. "
+        "Ranges of the density are the ones of the acceptance.",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        help="Keep running, and plot again every time the input files are "
+        "written. Optionally give the polling interval in seconds; defaults "
+        "to 1.",
+        nargs="?",
+        type=float,
+        const=1.0,
+        default=None,
+    )
+    parser.add_argument(
+        "--settle",
+        help="With --watch, time in seconds without modification after "
+        "which a file is considered completely written.",
+        type=float,
+        default=2.0,
+    )
+    parser.add_argument(
+        "--profile",
+        help="Save the duration and memory of every stage in a JSON trace. "
+        "Optionally give its path; defaults to the acceptance file with a "
+        "'.profile.json' suffix.",
+        nargs="?",
+        const="",
+        default=None,
+    )
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.smooth is not None and len(args.smooth) not in (0, 2):
+        parser.error("--smooth takes no value or two values: HX HY")
+    if args.watch is not None and args.chunksize is not None:
+        parser.error("--watch does not support --chunksize")
+
+    # Heavy modules are imported only once arguments are valid
+    select_backend(interactive=False)
+    import numpy as np
+
+    from dst_util.cache import ParticleCache
+    from dst_util.profiling import profile
+    from dst_util.wrappers import plot_acceptance, watch_acceptance
+
+    profiling = contextlib.nullcontext()
+    if args.profile is not None:
+        profiling = profile(
+            Path(args.profile)
+            if args.profile
+            else Path(args.acceptance).with_suffix(".profile.json")
+        )
+    kwargs = {
+        "bins_acceptance": args.bins,
+        "save_hist_data": args.save,
+        "dtype": np.float32 if args.float32 else np.float64,
+        "cache": (
+            ParticleCache(Path(args.cache) if args.cache else None)
+            if args.cache is not None
+            else None
+        ),
+        "hist_format": args.format,
+        "figure": not args.no_figure,
+        "render": "raster" if args.raster else "mesh",
+        "smooth": (
+            False
+            if args.smooth is None
+            else tuple(args.smooth) if args.smooth else True
+        ),
+        "auto_range": args.auto_range,
+        "workers": args.workers,
+    }
+    filepath_density = Path(args.density) if args.density is not None else None
+    with profiling:
+        if args.watch is not None:
+            watch_acceptance(
+                Path(args.acceptance),
+                filepath_density,
+                interval=args.watch,
+                settle=args.settle,
+                **kwargs,
+            )
+            return
+        plot_acceptance(
+            Path(args.acceptance),
+            filepath_density,
+            chunksize=args.chunksize,
+            **kwargs,
+        )
 
 
 if __name__ == "__main__":
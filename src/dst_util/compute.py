@@ -0,0 +1,339 @@
+"""Define the computation of histograms, without any rendering.
+
+Nothing in this module imports matplotlib: histograms can be computed and
+exported on machines without display, and without paying for the import and
+rendering of figures.
+
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Literal
+
+import numpy as np
+
+from dst_util.binning import (
+    DEFAULT_CMIN,
+    apply_cmin_cmax,
+    bin_all_projections,
+)
+from dst_util.bunch import read_bunch
+from dst_util.dst_helper import needed_columns
+from dst_util.profiling import span
+from dst_util.smoothing import smooth_projection
+from dst_util.statistics import BeamStatistics, phase_space_planes
+from dst_util.streaming import accumulate_counts
+
+if TYPE_CHECKING:
+    from dst_util.cache import ParticleCache
+    from dst_util.progress import Progress
+
+
+@dataclass
+class Histogram:
+    """Hold a 2D histogram and what is needed to plot or save it.
+
+    It unpacks and indexes as ``counts, xedges, yedges``, so that it can be
+    used where these tuples are expected.
+
+    """
+
+    counts: np.ndarray
+    xedges: np.ndarray
+    yedges: np.ndarray
+    columns: tuple[str, str]
+    kind: Literal["distribution", "acceptance", "probability"] = "distribution"
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        """Unpack as ``counts, xedges, yedges``."""
+        yield self.counts
+        yield self.xedges
+        yield self.yedges
+
+    def __getitem__(self, index: int | slice) -> Any:
+        """Index as ``(counts, xedges, yedges)``."""
+        return (self.counts, self.xedges, self.yedges)[index]
+
+    @property
+    def bins(self) -> tuple[int, int]:
+        """Give the number of bins along x and y."""
+        return self.counts.shape
+
+
+def compute_distributions(
+    data: Any,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    metadata: dict[str, Any] | None = None,
+    statistics: bool = True,
+    workers: int = 1,
+) -> list[Histogram]:
+    """Compute the distribution histograms of in-memory data.
+
+    Bins with less than ``cmin`` particles (default 1) or more than ``cmax``
+    are set to NaN, as :meth:`.Axes.hist2d` does. With ``statistics``, the
+    beam statistics of phase-space planes are stored in the ``"statistics"``
+    metadata of their histogram, see :mod:`.statistics`. ``workers`` threads
+    bin the particles.
+
+    """
+    raw = bin_all_projections(data, plot_single_kwargs, bins, workers=workers)
+    hist_data = _to_distributions(raw, plot_single_kwargs, metadata)
+    if statistics:
+        beam = BeamStatistics(phase_space_planes(plot_single_kwargs))
+        beam.add(data)
+        _attach_statistics(hist_data, beam)
+    return hist_data
+
+
+def compute_acceptances(
+    data: Any,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    metadata: dict[str, Any] | None = None,
+    workers: int = 1,
+) -> list[Histogram]:
+    """Compute acceptance maps of in-memory data.
+
+    Bins holding at least one particle are set to 1, the others to 0.
+    ``workers`` threads bin the particles.
+
+    """
+    raw = bin_all_projections(data, plot_single_kwargs, bins, workers=workers)
+    return _to_acceptances(raw, plot_single_kwargs, metadata)
+
+
+def compute_distributions_from_file(
+    filepath: Path,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    dtype: np.dtype | type = np.float64,
+    cache: "ParticleCache | None" = None,
+    chunksize: int | None = None,
+    progress: "Progress | None" = None,
+    statistics: bool = True,
+    workers: int = 1,
+) -> list[Histogram]:
+    """Read ``filepath`` and compute its distribution histograms.
+
+    Parameters
+    ----------
+    filepath :
+        ASCII or ``.dst`` file to read.
+    plot_single_kwargs :
+        Projections to compute, with their ``range``, ``cmin``...
+    bins :
+        Number of bins along each axis.
+    dtype :
+        Type used to store the particle coordinates.
+    cache :
+        If provided, parsed columns are taken from/stored in this cache.
+    chunksize :
+        If provided, the file is read by chunks of this number of particles,
+        and never entirely loaded in memory. ``cache`` is then not used.
+    progress :
+        If provided, reading and binning report their advancement to it, and
+        stop with :class:`.Cancelled` if it is cancelled.
+    statistics :
+        To compute the beam statistics of phase-space planes in the same
+        pass, and store them in the ``"statistics"`` metadata of their
+        histogram.
+    workers :
+        Number of threads binning the particles, see :mod:`.binning`.
+
+    """
+    beam = None
+    if statistics:
+        beam = BeamStatistics(phase_space_planes(plot_single_kwargs))
+    raw = _raw_histograms(
+        filepath,
+        plot_single_kwargs,
+        bins,
+        dtype,
+        cache,
+        chunksize,
+        progress,
+        statistics=beam,
+        workers=workers,
+    )
+    hist_data = _to_distributions(raw, plot_single_kwargs, _metadata(filepath))
+    if beam is not None:
+        _attach_statistics(hist_data, beam)
+    return hist_data
+
+
+def compute_acceptances_from_file(
+    filepath: Path,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    dtype: np.dtype | type = np.float64,
+    cache: "ParticleCache | None" = None,
+    chunksize: int | None = None,
+    progress: "Progress | None" = None,
+    workers: int = 1,
+) -> list[Histogram]:
+    """Read ``filepath`` and compute its acceptance maps.
+
+    Arguments are the same as :func:`compute_distributions_from_file`.
+
+    """
+    raw = _raw_histograms(
+        filepath,
+        plot_single_kwargs,
+        bins,
+        dtype,
+        cache,
+        chunksize,
+        progress,
+        workers=workers,
+    )
+    return _to_acceptances(raw, plot_single_kwargs, _metadata(filepath))
+
+
+def read_columns(
+    filepath: Path,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    dtype: np.dtype | type = np.float64,
+    cache: "ParticleCache | None" = None,
+    progress: "Progress | None" = None,
+) -> Any:
+    """Read the columns needed for the plots, from ``cache`` if provided.
+
+    Without cache, columns are read in a compact :class:`.ParticleBunch`.
+
+    """
+    columns = needed_columns(plot_single_kwargs)
+    if cache is None:
+        return read_bunch(filepath, columns, dtype=dtype, progress=progress)
+    return cache.read(filepath, columns, dtype=dtype, progress=progress)
+
+
+def _raw_histograms(
+    filepath: Path,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    dtype: np.dtype | type,
+    cache: "ParticleCache | None",
+    chunksize: int | None,
+    progress: "Progress | None" = None,
+    statistics: BeamStatistics | None = None,
+    workers: int = 1,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Count the particles of every projection of ``filepath``.
+
+    If provided, ``statistics`` are computed on the same particles.
+
+    """
+    if chunksize is not None:
+        with span("read and bin by chunks", chunksize=chunksize):
+            return accumulate_counts(
+                filepath,
+                plot_single_kwargs,
+                bins,
+                chunksize,
+                dtype=dtype,
+                progress=progress,
+                statistics=statistics,
+                workers=workers,
+            )
+    with span("read", cached=cache is not None) as read_span:
+        data = read_columns(
+            filepath, plot_single_kwargs, dtype, cache, progress
+        )
+        read_span.set(n_particles=len(data))
+    if statistics is not None:
+        with span("statistics", planes=len(statistics.planes)):
+            statistics.add(data)
+    with span(
+        "binning", n_projections=len(plot_single_kwargs), workers=workers
+    ):
+        return bin_all_projections(
+            data, plot_single_kwargs, bins, progress=progress, workers=workers
+        )
+
+
+def _to_distributions(
+    raw: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    metadata: dict[str, Any] | None,
+) -> list[Histogram]:
+    """Smooth particle counts if asked, then apply ``cmin`` and ``cmax``."""
+    hist_data = []
+    for (h, xedges, yedges), (columns, kwargs) in zip(
+        raw, plot_single_kwargs.items(), strict=True
+    ):
+        h, _, bandwidth = smooth_projection(
+            h, xedges, yedges, kwargs.get("smooth")
+        )
+        hist_data.append(
+            Histogram(
+                apply_cmin_cmax(
+                    h, kwargs.get("cmin", DEFAULT_CMIN), kwargs.get("cmax")
+                ),
+                xedges,
+                yedges,
+                columns,
+                kind="distribution",
+                metadata=_smoothing_metadata(metadata, bandwidth),
+            )
+        )
+    return hist_data
+
+
+def _to_acceptances(
+    raw: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    metadata: dict[str, Any] | None,
+) -> list[Histogram]:
+    """Convert particle counts to acceptance maps.
+
+    Without smoothing, bins holding at least one particle are accepted. With
+    smoothing, bins where the estimated density is at least half of the peak
+    of the kernel of a single particle are accepted.
+
+    """
+    hist_data = []
+    for (h, xedges, yedges), (columns, kwargs) in zip(
+        raw, plot_single_kwargs.items(), strict=True
+    ):
+        h, peak, bandwidth = smooth_projection(
+            h, xedges, yedges, kwargs.get("smooth")
+        )
+        hist_data.append(
+            Histogram(
+                np.where(h >= 0.5 * peak, 1, 0),
+                xedges,
+                yedges,
+                columns,
+                kind="acceptance",
+                metadata=_smoothing_metadata(metadata, bandwidth),
+            )
+        )
+    return hist_data
+
+
+def _smoothing_metadata(
+    metadata: dict[str, Any] | None, bandwidth: tuple[float, float] | None
+) -> dict[str, Any]:
+    """Copy ``metadata``, adding the smoothing bandwidth if any."""
+    out = dict(metadata or {})
+    if bandwidth is not None:
+        out["bandwidth"] = bandwidth
+    return out
+
+
+def _attach_statistics(
+    hist_data: list[Histogram], statistics: BeamStatistics
+) -> None:
+    """Store the statistics of every plane in the metadata of its histogram."""
+    summaries = statistics.summaries()
+    for hist in hist_data:
+        if hist.columns in summaries:
+            hist.metadata["statistics"] = summaries[hist.columns]
+
+
+def _metadata(filepath: Path) -> dict[str, Any]:
+    """Describe the source of the histograms."""
+    return {"source": str(filepath)}
@@ -0,0 +1,22 @@
+"""Define constants shared by several modules.
+
+This module must stay free of heavy imports, as it is loaded by the CLIs
+before arguments are parsed.
+
+"""
+
+from typing import Literal
+
+#: Output formats of the histogram data.
+HistFormat = Literal["csv", "sparse", "matrix", "npz"]
+#: Output formats understood by :func:`.dst_helper._save_single_hist`.
+HIST_FORMATS = ("csv", "sparse", "matrix", "npz")
+#: Rendering modes: one vector quad per bin, or a single image per axis.
+RenderMode = Literal["mesh", "raster"]
+#: Extensions of particle files, picked when a directory is given.
+PARTICLE_SUFFIXES = (".txt", ".dst")
+#: Names of particle files, picked when a directory is given; other TraceWin
+#: outputs share their extensions.
+PARTICLE_PATTERNS = ("part_*", "*accepted*")
+#: Number of threads binning the particles, in the GUI and in the CLIs.
+DEFAULT_WORKERS = 1
@@ -1,5 +1,6 @@
 """Define several functions to plot and format distribution files."""
 
+from collections.abc import Collection
 from typing import Any, Literal
 
 import matplotlib.pyplot as plt
@@ -8,56 +9,111 @@ import pandas as pd
 from matplotlib.axes import Axes
 from matplotlib.colors import Colormap, Normalize
 
+from dst_util.binning import DEFAULT_CMIN
+from dst_util.bunch import ParticleBunch
+from dst_util.compute import Histogram, compute_distributions
+from dst_util.constants import RenderMode
+from dst_util.render import add_raster_layer, histogram_to_rgba
+from dst_util.statistics import format_statistics
+
 
 def plot_all_distributions(
-    data: pd.DataFrame,
+    data: pd.DataFrame | ParticleBunch,
     plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
     axes: Any,
     bins: int,
-) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
-    """Plot all the desired distributions."""
-    hist_data = [
-        _plot_single_distribution(axis, data, columns, bins=bins, **kwargs)
-        for axis, columns, kwargs in zip(
-            axes.flatten(),
-            plot_single_kwargs.keys(),
-            plot_single_kwargs.values(),
-            strict=True,
-        )
-    ]
+    render: RenderMode = "mesh",
+    workers: int = 1,
+) -> list[Histogram]:
+    """Plot all the desired distributions.
+
+    All histograms are computed in a single pass over the columns by
+    :func:`.compute_distributions`, on ``workers`` threads, and are the same
+    as :meth:`.Axes.hist2d` would produce. They are then plotted in the
+    calling thread.
+
+    """
+    hist_data = compute_distributions(
+        data, plot_single_kwargs, bins, workers=workers
+    )
+    plot_all_distribution_histograms(
+        hist_data, plot_single_kwargs, axes, render=render
+    )
     return hist_data
 
 
-def _plot_single_distribution(
+def plot_all_distribution_histograms(
+    hist_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    axes: Any,
+    render: RenderMode = "mesh",
+) -> None:
+    """Plot distributions which histograms were already computed.
+
+    With ``render="raster"``, every histogram is drawn as a single image,
+    composited with what was already drawn by this module on the axis.
+
+    """
+    for axis, hist, columns, kwargs in zip(
+        axes.flatten(),
+        hist_data,
+        plot_single_kwargs.keys(),
+        plot_single_kwargs.values(),
+        strict=True,
+    ):
+        _render_single_distribution(
+            axis,
+            *hist,
+            columns,
+            render=render,
+            statistics=getattr(hist, "metadata", {}).get("statistics"),
+            **kwargs,
+        )
+
+
+def _render_single_distribution(
     axis: Axes,
-    data: pd.DataFrame,
+    h: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
     columns: tuple[str, str],
-    bins: int = 500,
     cmap: Colormap = plt.colormaps["rainbow"],
     grid: bool = True,
-    cmin: float | None = 1.0,
+    cmin: float | None = DEFAULT_CMIN,
     xlim: tuple[float, float] | None = None,
     ylim: tuple[float, float] | None = None,
     norm: Normalize | str = "log",
     range: (
         tuple[tuple[float, float], tuple[float, float]]
-        | Literal["as_plot_limits"]
+        | Literal["as_plot_limits", "auto"]
         | None
     ) = None,
+    cmax: float | None = None,
+    render: RenderMode = "mesh",
+    statistics: dict[str, float] | None = None,
+    smooth: Any = None,
     **kwargs,
-) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
-    """Plot the distribution specified by ``columns``."""
-    x = data[columns[0]]
-    y = data[columns[1]]
+) -> None:
+    """Plot a distribution histogram, as :meth:`.Axes.hist2d` would.
 
-    if range == "as_plot_limits":
-        assert xlim is not None
-        assert ylim is not None
-        range = (xlim, ylim)
-    h, xedges, yedges, image = axis.hist2d(
-        x, y, bins=bins, cmin=cmin, cmap=cmap, norm=norm, range=range, **kwargs
-    )
+    ``cmin``, ``cmax``, ``range`` and ``smooth`` are accepted so that the same
+    kwargs as in :func:`plot_all_distributions` can be given, but they must
+    already have been applied to the histogram. If provided, ``statistics`` are
+    summarized below the title.
+
+    """
+    if render == "raster":
+        rgba = histogram_to_rgba(
+            h, cmap, norm, vmin=kwargs.get("vmin"), vmax=kwargs.get("vmax")
+        )
+        add_raster_layer(axis, rgba, xedges, yedges)
+    else:
+        axis.pcolormesh(xedges, yedges, h.T, cmap=cmap, norm=norm, **kwargs)
+    axis.set_xlim(xedges[0], xedges[-1])
+    axis.set_ylim(yedges[0], yedges[-1])
     title = " - ".join(columns)
+    if statistics is not None:
+        title += "\n" + format_statistics(statistics)
     axis.set_title(title)
     if grid:
         plt.grid()
@@ -65,4 +121,3 @@ def _plot_single_distribution(
         axis.set_xlim(xlim)
     if ylim:
         axis.set_ylim(ylim)
-    return h, xedges, yedges
@@ -1,9 +1,22 @@
-from collections.abc import Collection
+from collections.abc import Collection, Iterator
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import numpy as np
 import pandas as pd
-from matplotlib.figure import Figure
+
+from dst_util.ascii_reader import (
+    estimate_n_rows,
+    iter_ascii_chunks,
+    read_ascii,
+)
+from dst_util.constants import HIST_FORMATS, HistFormat
+from dst_util.statistics import save_statistics
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+    from dst_util.progress import Progress
 
 
 def is_binary(filepath: Path) -> bool:
@@ -16,31 +29,246 @@ def is_binary(filepath: Path) -> bool:
     raise ValueError(f"{extension = } not understood in {filepath = }")
 
 
-def read(filepath: Path) -> pd.DataFrame:
-    """Read the given file."""
-    with open(filepath, "r") as f:
-        data = pd.read_csv(f, skiprows=2, sep=r"\s+")
-    return data
+#: Layout of the header of a binary TraceWin ``.dst`` file. The particles
+#: follow, then the file ends with a :data:`DST_TRAILER_DTYPE`.
+DST_HEADER_DTYPE = np.dtype(
+    [
+        ("dummy", np.uint8, (2,)),
+        ("n_part", np.int32),
+        ("i_beam", np.float64),
+        ("freq", np.float64),
+        ("dummy2", np.uint8),
+    ]
+)
+#: Characters opening the header of the ``.dst`` files written by TraceWin;
+#: they are not read.
+DST_HEADER_CHARS = (125, 100)
+#: Layout of the end of a binary TraceWin ``.dst`` file, after the particles:
+#: rest mass ``mc2`` of the particles, in MeV. It is not read.
+DST_TRAILER_DTYPE = np.dtype([("mc2", np.float64)])
+#: Layout of a single particle in a binary TraceWin ``.dst`` file.
+DST_PARTICLE_DTYPE = np.dtype(
+    [
+        ("x", np.float64),
+        ("xp", np.float64),
+        ("y", np.float64),
+        ("yp", np.float64),
+        ("phi", np.float64),
+        ("energy", np.float64),
+    ]
+)
+#: Map ``.dst`` fields to the columns of the ASCII files, with the factor
+#: converting the ``.dst`` units (cm, rad, MeV) to the ASCII ones.
+DST_TO_ASCII_COLUMNS = {
+    "x": ("x(mm)", 10.0),
+    "xp": ("x'(mrad)", 1e3),
+    "y": ("y(mm)", 10.0),
+    "yp": ("y'(mrad)", 1e3),
+    "phi": ("Phase(deg)", 180.0 / np.pi),
+    "energy": ("Energy(MeV)", 1.0),
+}
+
+
+#: Number of lines read at once when progress must be reported.
+PROGRESS_CHUNKSIZE = 2**18
+
+
+def read(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    dtype: np.dtype | type = np.float64,
+    progress: "Progress | None" = None,
+) -> pd.DataFrame:
+    """Read the given file.
+
+    Parameters
+    ----------
+    filepath :
+        ASCII or binary ``.dst`` file to read.
+    columns :
+        Columns to read. If not provided, all columns are read.
+    dtype :
+        Type of the output columns.
+    progress :
+        If provided, ASCII files are read by chunks of
+        :data:`PROGRESS_CHUNKSIZE` lines, and advancement is reported after
+        every chunk.
+
+    """
+    if is_binary(filepath):
+        data = read_dst(filepath, columns=columns, dtype=dtype)
+        if progress is not None:
+            progress.update("Reading", 1.0)
+        return data
+    if progress is None:
+        return read_ascii(filepath, columns=columns, dtype=dtype)
+
+    n_particles = max(1, estimate_n_particles(filepath))
+    progress.update("Reading", 0.0)
+    chunks = []
+    n_read = 0
+    for chunk in iter_ascii_chunks(
+        filepath, columns, PROGRESS_CHUNKSIZE, dtype=dtype
+    ):
+        chunks.append(chunk)
+        n_read += len(chunk)
+        progress.update("Reading", n_read / n_particles)
+    if not chunks:
+        return read_ascii(filepath, columns=columns, dtype=dtype)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def iter_chunks(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    chunksize: int = 10**6,
+    dtype: np.dtype | type = np.float64,
+) -> Iterator[pd.DataFrame]:
+    """Read the given file by chunks of ``chunksize`` particles."""
+    if is_binary(filepath):
+        return iter_dst_chunks(filepath, columns, chunksize, dtype=dtype)
+    return iter_ascii_chunks(filepath, columns, chunksize, dtype=dtype)
+
+
+def needed_columns(
+    plot_single_kwargs: dict[tuple[str, str], dict],
+) -> list[str]:
+    """Get the columns needed to plot all the given projections."""
+    return list(
+        dict.fromkeys(col for cols in plot_single_kwargs for col in cols)
+    )
+
+
+def estimate_n_particles(filepath: Path) -> int:
+    """Give the number of particles; it is estimated for ASCII files."""
+    if is_binary(filepath):
+        header = np.fromfile(filepath, dtype=DST_HEADER_DTYPE, count=1)
+        return int(header["n_part"][0]) if header.size else 0
+    return estimate_n_rows(filepath)
+
+
+def memmap_dst(filepath: Path) -> tuple[np.void, np.memmap]:
+    """Map a binary ``.dst`` file without loading it.
+
+    Returns
+    -------
+    header : np.void
+        Structured scalar holding number of particles, beam current (mA) and
+        frequency (MHz).
+    particles : np.memmap
+        Structured array with one record per particle, in TraceWin units
+        (cm, rad, MeV). Accessing a field gives a zero-copy view. The rest
+        mass that ends the file, see :data:`DST_TRAILER_DTYPE`, is not mapped.
+
+    """
+    header = np.fromfile(filepath, dtype=DST_HEADER_DTYPE, count=1)
+    if header.size == 0:
+        raise ValueError(f"{filepath = } is too short to be a .dst file.")
+    n_part = int(header["n_part"][0])
+    expected = DST_HEADER_DTYPE.itemsize + n_part * DST_PARTICLE_DTYPE.itemsize
+    actual = filepath.stat().st_size
+    if actual < expected:
+        raise ValueError(
+            f"{filepath = } holds {actual} bytes, but header announces "
+            f"{n_part} particles ({expected} bytes)."
+        )
+    particles = np.memmap(
+        filepath,
+        dtype=DST_PARTICLE_DTYPE,
+        mode="r",
+        offset=DST_HEADER_DTYPE.itemsize,
+        shape=(n_part,),
+    )
+    return header[0], particles
+
+
+def read_dst(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    dtype: np.dtype | type = np.float64,
+) -> pd.DataFrame:
+    """Read a binary ``.dst`` file.
+
+    Columns are named and scaled as in the ASCII files produced by PlotWin, so
+    that the output can be used in place of :func:`read`. Columns that do not
+    need any unit conversion nor type conversion are not copied.
+
+    """
+    _, particles = memmap_dst(filepath)
+    return _dst_to_dataframe(filepath, particles, columns, dtype)
+
+
+def iter_dst_chunks(
+    filepath: Path,
+    columns: Collection[str] | None = None,
+    chunksize: int = 10**6,
+    dtype: np.dtype | type = np.float64,
+) -> Iterator[pd.DataFrame]:
+    """Read a binary ``.dst`` file by chunks of ``chunksize`` particles."""
+    _, particles = memmap_dst(filepath)
+    for start in range(0, len(particles), chunksize):
+        yield _dst_to_dataframe(
+            filepath, particles[start : start + chunksize], columns, dtype
+        )
+
+
+def _dst_to_dataframe(
+    filepath: Path,
+    particles: np.ndarray,
+    columns: Collection[str] | None,
+    dtype: np.dtype | type,
+) -> pd.DataFrame:
+    """Convert ``.dst`` records to a dataframe as in ASCII files."""
+    out = {}
+    for field, (column, factor) in DST_TO_ASCII_COLUMNS.items():
+        if columns is not None and column not in columns:
+            continue
+        view = particles[field]
+        if factor != 1.0:
+            view = view * factor
+        out[column] = view.astype(dtype, copy=False)
+    if columns is not None and (missing := set(columns) - set(out)):
+        raise KeyError(f"Columns {missing} not found in {filepath = }.")
+    return pd.DataFrame(out, copy=False)
 
 
 def save_all_distributions(
     all_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
     all_columns: Collection[Collection[str]],
     original_filepath: Path,
+    fmt: HistFormat = "csv",
 ) -> None:
-    """Save distribution for pgfplots and figures."""
+    """Save distribution for pgfplots and figures.
+
+    Beam statistics stored in the metadata of the histograms, if any, are
+    saved in a single ``_statistics.csv`` file.
+
+    """
+    all_statistics = {}
     for data, columns in zip(all_data, all_columns):
         name = (
             original_filepath.stem + "_" + "_".join(columns).replace(" ", "_")
         )
         filepath = original_filepath.with_stem(name).with_suffix(".csv")
-        _save_single_hist(filepath, *data, add_log_column=True)
+        _save_single_hist(filepath, *data, add_log_column=True, fmt=fmt)
+        statistics = getattr(data, "metadata", {}).get("statistics")
+        if statistics is not None:
+            all_statistics[tuple(columns)] = statistics
+
+    if all_statistics:
+        save_statistics(
+            all_statistics,
+            original_filepath.with_stem(
+                original_filepath.stem + "_statistics"
+            ).with_suffix(".csv"),
+        )
 
 
 def save_all_acceptances(
     all_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
     all_columns: Collection[Collection[str]],
     original_filepath: Path,
+    fmt: HistFormat = "csv",
 ) -> None:
     """Save distribution for pgfplots and figures."""
     for data, columns in zip(all_data, all_columns):
@@ -50,10 +278,12 @@ def save_all_acceptances(
             + "_".join(columns).replace(" ", "_")
         )
         filepath = original_filepath.with_stem(name).with_suffix(".csv")
-        _save_single_hist(filepath, *data, add_log_column=False)
+        _save_single_hist(filepath, *data, add_log_column=False, fmt=fmt)
 
 
-def save_figure(fig: Figure, filepath: Path, acceptance: bool = False) -> None:
+def save_figure(
+    fig: "Figure", filepath: Path, acceptance: bool = False
+) -> None:
     """Save the given figure."""
     out = filepath.with_suffix(".png")
     if acceptance:
@@ -68,16 +298,99 @@ def _save_single_hist(
     xedges: np.ndarray,
     yedges: np.ndarray,
     add_log_column: bool = True,
+    fmt: HistFormat = "csv",
+    block_size: int = 2**16,
 ) -> None:
-    """Save the histogram data in a format easy to understand for pgf."""
-    data = []
-    for i in range(len(xedges) - 1):
-        for j in range(len(yedges) - 1):
-            data.append([xedges[i], yedges[j], hist[i, j]])
+    """Save the histogram data in a format easy to understand for pgf.
+
+    Parameters
+    ----------
+    filepath :
+        Where the data should be saved. For ``fmt="npz"``, the suffix is
+        replaced by ``.npz``.
+    hist :
+        Content of the bins; first index is for x, second for y.
+    xedges, yedges :
+        Edges of the bins.
+    add_log_column :
+        To add a ``zlog`` column holding ``log10(z)`` in text formats.
+    fmt :
+        ``"csv"`` writes one line per bin, with the lower left corner of the
+        bin in ``x`` and ``y``. ``"sparse"`` is the same, but skips empty
+        bins. ``"matrix"`` writes bin centers, one scanline of constant ``y``
+        per block, separated by empty lines; it is directly understood by
+        pgfplots ``matrix plot*`` without setting ``mesh/rows`` nor
+        ``mesh/cols``. ``"npz"`` saves the arrays in a compressed binary file.
+    block_size :
+        Approximate number of lines formatted at once when writing ``"csv"``
+        or ``"sparse"`` formats.
 
-    df = pd.DataFrame(data, columns=("x", "y", "z"))
-    if add_log_column:
-        df["zlog"] = np.log10(df["z"])
+    """
+    if fmt == "npz":
+        filepath = filepath.with_suffix(".npz")
+        np.savez_compressed(filepath, hist=hist, xedges=xedges, yedges=yedges)
+        print(f"Saved histogram in {filepath = }")
+        return
+    if fmt not in HIST_FORMATS:
+        raise ValueError(f"{fmt = } not understood. Allowed: {HIST_FORMATS}")
 
-    df.to_csv(filepath, index=False, na_rep="nan", sep=" ")
+    if fmt == "matrix":
+        blocks = _matrix_blocks(hist, xedges, yedges)
+    else:
+        blocks = _scanline_blocks(
+            hist, xedges, yedges, block_size, sparse=fmt == "sparse"
+        )
+
+    header = ["x", "y", "z"] + (["zlog"] if add_log_column else [])
+    with open(filepath, "w") as f:
+        f.write(" ".join(header) + "\n")
+        for x, y, z in blocks:
+            if z is None:
+                f.write("\n")
+                continue
+            columns = {"x": x, "y": y, "z": z}
+            if add_log_column:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    columns["zlog"] = np.log10(z)
+            pd.DataFrame(columns, copy=False).to_csv(
+                f, index=False, header=False, na_rep="nan", sep=" "
+            )
     print(f"Saved dataframe in {filepath = }")
+
+
+def _scanline_blocks(
+    hist: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+    block_size: int,
+    sparse: bool = False,
+) -> Iterator[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Yield x, y, z columns, y varying fastest, a few x at a time."""
+    n_x, n_y = hist.shape
+    step = max(1, block_size // n_y)
+    for start in range(0, n_x, step):
+        stop = min(start + step, n_x)
+        x = np.repeat(xedges[start:stop], n_y)
+        y = np.tile(yedges[:-1], stop - start)
+        z = hist[start:stop].ravel()
+        if sparse:
+            keep = np.isfinite(z) & (z != 0)
+            x, y, z = x[keep], y[keep], z[keep]
+        yield x, y, z
+
+
+def _matrix_blocks(
+    hist: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+) -> Iterator[tuple[np.ndarray | None, np.ndarray | None, np.ndarray | None]]:
+    """Yield bin centers and values, one scanline of constant y at a time.
+
+    A ``(None, None, None)`` block marks the end of a scanline.
+
+    """
+    x_centers = 0.5 * (xedges[:-1] + xedges[1:])
+    y_centers = 0.5 * (yedges[:-1] + yedges[1:])
+    for j, y_center in enumerate(y_centers):
+        yield x_centers, np.full_like(x_centers, y_center), hist[:, j]
+        yield None, None, None
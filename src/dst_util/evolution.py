@@ -0,0 +1,269 @@
+"""Define the evolution of the beam along the lattice.
+
+TraceWin can save the particles at every element. Every file of such an
+ordered series is reduced to one row of a table: mean, RMS size, extrema and
+approximate quantiles of every column, as well as the RMS emittance, Twiss and
+halo parameters of every phase-space plane.
+
+Files are read by chunks. Moments are merged chunk after chunk as in
+:mod:`.statistics`, and quantiles are estimated with a
+:class:`.QuantileSketch`, so that memory depends on the size of the chunks but
+not on the number or size of the files. The next chunk is read in a
+background thread while the current one is reduced.
+
+"""
+
+import re
+from collections.abc import Collection, Iterator, Sequence
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+from dst_util.dst_helper import iter_chunks
+from dst_util.profiling import span
+from dst_util.sketch import DEFAULT_CAPACITY, QuantileSketch
+from dst_util.statistics import PHASE_SPACE_PLANES, BeamStatistics
+from dst_util.streaming import DEFAULT_CHUNKSIZE, prefetch
+
+if TYPE_CHECKING:
+    from matplotlib.figure import Figure
+
+    from dst_util.progress import Progress
+
+#: Quantiles of every column in the table.
+DEFAULT_QUANTILES = (0.01, 0.05, 0.5, 0.95, 0.99)
+#: Statistics of every plane in the table, see :meth:`.PlaneMoments.summary`.
+PLANE_KEYS = ("emittance_rms", "alpha", "beta", "halo")
+
+
+class ColumnEnvelope:
+    """Accumulate the extrema and quantiles of a column."""
+
+    def __init__(
+        self,
+        quantiles: Sequence[float] = DEFAULT_QUANTILES,
+        capacity: int = DEFAULT_CAPACITY,
+    ) -> None:
+        """Create the envelope of an empty column."""
+        self.quantiles = tuple(quantiles)
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = QuantileSketch(capacity)
+
+    def add(self, values: np.ndarray) -> None:
+        """Add values; NaN are skipped."""
+        values = np.asarray(values)
+        if not len(values):
+            return
+        self.min = min(self.min, float(np.nanmin(values)))
+        self.max = max(self.max, float(np.nanmax(values)))
+        self.sketch.add(values)
+
+    def summary(self) -> dict[str, float]:
+        """Give extrema and quantiles, NaN if there was no value."""
+        if not self.sketch.n:
+            return {"min": np.nan, "max": np.nan} | {
+                _quantile_key(q): np.nan for q in self.quantiles
+            }
+        return {"min": self.min, "max": self.max} | {
+            _quantile_key(q): float(value)
+            for q, value in zip(
+                self.quantiles, self.sketch.quantiles(self.quantiles)
+            )
+        }
+
+
+def beam_evolution(
+    filepaths: Sequence[Path],
+    planes: Collection[tuple[str, str]] = PHASE_SPACE_PLANES,
+    positions: Sequence[float] | None = None,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    dtype: np.dtype | type = np.float64,
+    prefetch_depth: int = 2,
+    capacity: int = DEFAULT_CAPACITY,
+    progress: "Progress | None" = None,
+) -> pd.DataFrame:
+    """Reduce every file of a series to one row of statistics.
+
+    Parameters
+    ----------
+    filepaths :
+        ASCII or ``.dst`` files, in the order of the lattice.
+    planes :
+        Phase-space planes which columns are reduced.
+    positions :
+        Position of every file along the lattice; defaults to the index of
+        the file.
+    quantiles :
+        Quantiles of every column.
+    chunksize :
+        Number of particles read at once.
+    dtype :
+        Type used to store the particle coordinates.
+    prefetch_depth :
+        Number of chunks read in advance.
+    capacity :
+        Capacity of the quantile sketches, see :class:`.QuantileSketch`.
+    progress :
+        If provided, advancement is reported after every file.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per file: ``file``, ``position``, ``n_particles``, then for
+        every column ``<column>_mean``, ``_rms``, ``_min``, ``_max`` and
+        ``_q<quantile>``, and for every plane ``<x>_<y>_emittance_rms``,
+        ``_alpha``, ``_beta`` and ``_halo``.
+
+    """
+    if positions is not None and len(positions) != len(filepaths):
+        raise ValueError(
+            f"Got {len(positions)} positions for {len(filepaths)} files."
+        )
+    planes = [tuple(plane) for plane in planes]
+    columns = list(dict.fromkeys(col for plane in planes for col in plane))
+
+    rows = []
+    statistics = envelopes = None
+    with span("beam evolution", n_files=len(filepaths)):
+        for i, chunk in prefetch(
+            _file_chunks(filepaths, columns, chunksize, dtype),
+            prefetch_depth,
+        ):
+            if statistics is None:
+                statistics = BeamStatistics(planes)
+                envelopes = {
+                    col: ColumnEnvelope(quantiles, capacity) for col in columns
+                }
+            if chunk is not None:
+                statistics.add(chunk)
+                for col, envelope in envelopes.items():
+                    envelope.add(chunk[col])
+                continue
+
+            rows.append(
+                _row(
+                    filepaths[i],
+                    i if positions is None else positions[i],
+                    statistics,
+                    envelopes,
+                )
+            )
+            statistics = envelopes = None
+            if progress is not None:
+                progress.update("Reducing", (i + 1) / len(filepaths))
+    return pd.DataFrame(rows)
+
+
+def save_evolution(table: pd.DataFrame, filepath: Path) -> None:
+    """Save the table of :func:`beam_evolution`, one line per file."""
+    table.to_csv(filepath, sep=" ", index=False, na_rep="nan")
+    print(f"Saved beam evolution in {filepath = }")
+
+
+def plot_evolution(
+    table: pd.DataFrame,
+    planes: Collection[tuple[str, str]] = PHASE_SPACE_PLANES,
+    quantiles: Sequence[float] = DEFAULT_QUANTILES,
+) -> "Figure":
+    """Plot the envelopes of every column against the position.
+
+    Every pair of symmetric quantiles is a shaded band; the mean plus or minus
+    the RMS size is dashed, and the extrema are dotted.
+
+    """
+    import matplotlib.pyplot as plt
+
+    planes = [plane for plane in planes if f"{plane[0]}_mean" in table]
+    fig, axes = plt.subplots(
+        nrows=len(planes),
+        ncols=2,
+        sharex=True,
+        squeeze=False,
+        figsize=(10, 2.5 * len(planes)),
+    )
+    position = table["position"]
+    # Rounding makes 1 - 0.01 match 0.99
+    rounded = {round(q, 12) for q in quantiles}
+    bands = [
+        (low, round(1.0 - low, 12))
+        for low in sorted(quantiles)
+        if low < 0.5 and round(1.0 - low, 12) in rounded
+    ]
+    for row, plane in zip(axes, planes):
+        for axis, col in zip(row, plane):
+            for i, (low, high) in enumerate(bands):
+                axis.fill_between(
+                    position,
+                    table[f"{col}_{_quantile_key(low)}"],
+                    table[f"{col}_{_quantile_key(high)}"],
+                    color="tab:blue",
+                    alpha=0.2 + 0.2 * i,
+                    lw=0,
+                    label=f"{low:g} - {high:g}",
+                )
+            mean, rms = table[f"{col}_mean"], table[f"{col}_rms"]
+            axis.plot(position, mean, color="k", lw=1, label="mean")
+            axis.plot(position, mean + rms, "k--", lw=0.8, label="RMS")
+            axis.plot(position, mean - rms, "k--", lw=0.8)
+            axis.plot(position, table[f"{col}_min"], "k:", lw=0.8)
+            axis.plot(position, table[f"{col}_max"], "k:", lw=0.8)
+            axis.set_ylabel(col)
+            axis.grid(True)
+    axes[0, 0].legend(loc="upper right", fontsize="x-small")
+    for axis in axes[-1]:
+        axis.set_xlabel("Position")
+    fig.tight_layout()
+    return fig
+
+
+def natural_key(filepath: Path) -> list[Any]:
+    """Sort key placing ``part_9`` before ``part_10``."""
+    return [
+        int(part) if part.isdigit() else part
+        for part in re.split(r"(\d+)", str(filepath))
+    ]
+
+
+def _file_chunks(
+    filepaths: Sequence[Path],
+    columns: list[str],
+    chunksize: int,
+    dtype: np.dtype | type,
+) -> Iterator[tuple[int, Any]]:
+    """Give the chunks of every file, then None at the end of the file."""
+    for i, filepath in enumerate(filepaths):
+        for chunk in iter_chunks(filepath, columns, chunksize, dtype=dtype):
+            yield i, chunk
+        yield i, None
+
+
+def _row(
+    filepath: Path,
+    position: float,
+    statistics: BeamStatistics,
+    envelopes: dict[str, ColumnEnvelope],
+) -> dict[str, Any]:
+    """Gather the statistics of a file in a row of the table."""
+    summaries = statistics.summaries()
+    row: dict[str, Any] = {"file": filepath.name, "position": position}
+    row["n_particles"] = next(iter(summaries.values()))["n_particles"]
+    for plane, summary in summaries.items():
+        for col, axis in zip(plane, ("x", "y")):
+            row[f"{col}_mean"] = summary.get(f"mean_{axis}", np.nan)
+            row[f"{col}_rms"] = summary.get(f"rms_{axis}", np.nan)
+            for key, value in envelopes[col].summary().items():
+                row[f"{col}_{key}"] = value
+    for plane, summary in summaries.items():
+        name = "_".join(plane).replace(" ", "_")
+        for key in PLANE_KEYS:
+            row[f"{name}_{key}"] = summary.get(key, np.nan)
+    return row
+
+
+def _quantile_key(q: float) -> str:
+    """Name the column of a quantile."""
+    return f"q{q:g}"
@@ -0,0 +1,418 @@
+"""Define the figure embedded in the tabs of the GUI.
+
+The figure and its image artists are created once. Every replot updates the
+existing images in place; when only the content of the images changed, the
+concerned axes are repainted and blitted instead of redrawing the figure.
+
+When zooming is enabled, distributions are refined after every zoom or pan:
+the visible window is shown with as many bins as the initial plot, see
+:mod:`.pyramid`. The pyramid of an axis is only built at its first zoom, and
+only the pyramid of the last refined axis is kept.
+
+"""
+
+import tkinter as tk
+from collections.abc import Callable, Collection
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.backends.backend_tkagg import (
+    FigureCanvasTkAgg,
+    NavigationToolbar2Tk,
+)
+from matplotlib.colors import Colormap, ListedColormap, Normalize
+from matplotlib.figure import Figure
+from matplotlib.image import AxesImage
+
+from dst_util.binning import DEFAULT_CMIN, apply_cmin_cmax
+from dst_util.pyramid import HistogramPyramid
+from dst_util.render import update_histogram_image
+from dst_util.smoothing import smooth_projection
+from dst_util.statistics import format_statistics
+
+#: Starts building the pyramid of a projection, see
+#: :meth:`ReusableFigure.enable_zoom`.
+PyramidLoader = Callable[
+    [
+        tuple[str, str],
+        dict[str, Any],
+        Callable[[HistogramPyramid | None], None],
+    ],
+    bool,
+]
+
+
+@dataclass
+class ImageLayer:
+    """Describe a histogram drawn as an image on an axis."""
+
+    name: str
+    hist: tuple[np.ndarray, np.ndarray, np.ndarray]
+    cmap: Colormap | str
+    norm: Normalize | str | None = None
+    vmin: float | None = None
+    vmax: float | None = None
+
+
+class ReusableFigure:
+    """Hold a 2 by 2 figure which artists are reused between plots."""
+
+    def __init__(self, figure: Figure) -> None:
+        """Create the axes of ``figure``, which must have a canvas."""
+        self.figure = figure
+        self.axes = figure.subplots(nrows=2, ncols=2)
+        self.images: dict[tuple[int, str], AxesImage] = {}
+        self._grids: tuple[bool, ...] = ()
+        self._drawn_layout: Any = None
+        self.figure.canvas.mpl_connect("draw_event", self._on_draw)
+
+        # Columns, settings, number of bins and initial limits of every axis
+        self.zoom_sources: dict[int, tuple[tuple[str, str], Any, int]] = {}
+        self._home: dict[int, tuple[Any, ImageLayer]] = {}
+        self._layers: list[list[ImageLayer]] = []
+        self._pending: set[int] = set()
+        self._updating = False
+        # Only pyramid kept, with its axis; axes waiting for their pyramid
+        self._load_pyramid: PyramidLoader | None = None
+        self._pyramid: tuple[int, HistogramPyramid] | None = None
+        self._loading: int | None = None
+        self._waiting: set[int] = set()
+        # Pyramids requested for a previous plot are dropped
+        self._generation = 0
+        for i, axis in enumerate(self.axes.flatten()):
+            for signal in ("xlim_changed", "ylim_changed"):
+                axis.callbacks.connect(
+                    signal, lambda _, i=i: self._limits_changed(i)
+                )
+
+    def show_distributions(
+        self,
+        hist_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    ) -> None:
+        """Plot distributions which histograms were already computed."""
+        self.update(
+            [
+                [_distribution_layer(hist, kwargs)]
+                for hist, kwargs in zip(
+                    hist_data, plot_single_kwargs.values(), strict=True
+                )
+            ],
+            plot_single_kwargs,
+        )
+
+    def show_acceptances(
+        self,
+        acceptance_data: Collection[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        hist_data: (
+            Collection[tuple[np.ndarray, np.ndarray, np.ndarray]] | None
+        ),
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        invert_acceptance_colors: bool = False,
+    ) -> None:
+        """Plot acceptances, with distributions on top if provided."""
+        cmap = ListedColormap(["black", "white"])
+        if invert_acceptance_colors:
+            cmap = ListedColormap(["white", "black"])
+        all_layers = [
+            [ImageLayer("acceptance", hist, cmap, vmin=0.0, vmax=1.0)]
+            for hist in acceptance_data
+        ]
+        if hist_data is not None:
+            for layers, hist, kwargs in zip(
+                all_layers, hist_data, plot_single_kwargs.values(), strict=True
+            ):
+                layers.append(_distribution_layer(hist, kwargs))
+        self.update(all_layers, plot_single_kwargs)
+
+    def enable_zoom(
+        self,
+        load_pyramid: PyramidLoader,
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        bins: int,
+    ) -> None:
+        """Refine the distributions of the current plot when zooming.
+
+        Must be called after :meth:`show_distributions` or
+        :meth:`show_acceptances`; every new plot disables zooming again.
+
+        Parameters
+        ----------
+        load_pyramid :
+            Called as ``load_pyramid(columns, kwargs, on_loaded)`` at the
+            first zoom of an axis. It must start building the pyramid of the
+            projection, and return False if it cannot. ``on_loaded`` must then
+            be called in the GUI thread with the pyramid, or with None if it
+            could not be built.
+        plot_single_kwargs :
+            Settings of every axis.
+        bins :
+            Number of bins along each axis of the zoomed windows.
+
+        """
+        self._load_pyramid = load_pyramid
+        for i, (axis, (columns, kwargs)) in enumerate(
+            zip(self.axes.flatten(), plot_single_kwargs.items(), strict=True)
+        ):
+            if (i, "distribution") not in self.images:
+                continue
+            self.zoom_sources[i] = (columns, kwargs, bins)
+            self._home[i] = (
+                (axis.get_xlim(), axis.get_ylim()),
+                self._layers[i][-1],
+            )
+
+    def update(
+        self,
+        all_layers: list[list[ImageLayer]],
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    ) -> None:
+        """Update the images of every axis, then redraw what is needed.
+
+        Parameters
+        ----------
+        all_layers :
+            Images of every axis, from bottom to top.
+        plot_single_kwargs :
+            Settings of every axis; ``xlim``, ``ylim`` and ``grid`` are used.
+
+        """
+        self.zoom_sources.clear()
+        self._home.clear()
+        self._pending.clear()
+        self._load_pyramid = self._pyramid = self._loading = None
+        self._waiting.clear()
+        self._generation += 1
+        self._layers = all_layers
+        for i, (axis, layers) in enumerate(
+            zip(self.axes.flatten(), all_layers, strict=True)
+        ):
+            names = {layer.name for layer in layers}
+            for key in [key for key in self.images if key[0] == i]:
+                if key[1] not in names:
+                    self.images.pop(key).remove()
+            for zorder, layer in enumerate(layers):
+                image = update_histogram_image(
+                    axis,
+                    self.images.get((i, layer.name)),
+                    *layer.hist,
+                    cmap=layer.cmap,
+                    norm=layer.norm,
+                    vmin=layer.vmin,
+                    vmax=layer.vmax,
+                )
+                image.set_zorder(zorder)
+                self.images[(i, layer.name)] = image
+
+        self._updating = True
+        for axis, layers, (columns, kwargs) in zip(
+            self.axes.flatten(), all_layers, plot_single_kwargs.items()
+        ):
+            _format_axis(axis, layers, columns, **kwargs)
+        self._updating = False
+        self._grids = tuple(
+            bool(kwargs.get("grid", True))
+            for kwargs in plot_single_kwargs.values()
+        )
+        self.redraw()
+
+    def redraw(self) -> None:
+        """Blit the axes if only images changed, else redraw the figure."""
+        if self._layout() != self._drawn_layout:
+            self.figure.canvas.draw_idle()
+            return
+        canvas = self.figure.canvas
+        for i, axis in enumerate(self.axes.flatten()):
+            axis.draw_artist(axis.patch)
+            images = [
+                image for key, image in self.images.items() if key[0] == i
+            ]
+            for image in sorted(images, key=lambda image: image.zorder):
+                axis.draw_artist(image)
+            for line in axis.get_xgridlines() + axis.get_ygridlines():
+                axis.draw_artist(line)
+            for spine in axis.spines.values():
+                # Outer half of the spines was not painted over, and must not
+                # be drawn twice
+                clip_box, clip_on = spine.get_clip_box(), spine.get_clip_on()
+                spine.set_clip_box(axis.bbox)
+                spine.set_clip_on(True)
+                axis.draw_artist(spine)
+                spine.set_clip_box(clip_box)
+                spine.set_clip_on(clip_on)
+            canvas.blit(axis.bbox)
+
+    def refine(self) -> None:
+        """Show the zoomed distributions with the bins of the window."""
+        for i in sorted(self._pending & self.zoom_sources.keys()):
+            axis = self.axes.flatten()[i]
+            _, kwargs, bins = self.zoom_sources[i]
+            limits, layer = self._home[i]
+            if (axis.get_xlim(), axis.get_ylim()) != limits:
+                pyramid = self._pyramid_of(i)
+                if pyramid is None:
+                    # Refined once the pyramid is loaded
+                    continue
+                h, xedges, yedges = pyramid.view(
+                    axis.get_xlim(), axis.get_ylim(), bins
+                )
+                # Keep the bandwidth of the full plot, in column units
+                h, _, _ = smooth_projection(
+                    h,
+                    xedges,
+                    yedges,
+                    getattr(layer.hist, "metadata", {}).get(
+                        "bandwidth", kwargs.get("smooth")
+                    ),
+                )
+                apply_cmin_cmax(
+                    h, kwargs.get("cmin", DEFAULT_CMIN), kwargs.get("cmax")
+                )
+                layer = _distribution_layer((h, xedges, yedges), kwargs)
+            update_histogram_image(
+                axis,
+                self.images[(i, "distribution")],
+                *layer.hist,
+                cmap=layer.cmap,
+                norm=layer.norm,
+                vmin=layer.vmin,
+                vmax=layer.vmax,
+            )
+        self._pending.clear()
+        self.figure.canvas.draw_idle()
+
+    def schedule(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` once the current event is processed."""
+        callback()
+
+    def _limits_changed(self, i: int) -> None:
+        """Refine axis ``i`` if its limits were changed by the user."""
+        if self._updating or i not in self.zoom_sources:
+            return
+        scheduled = bool(self._pending)
+        self._pending.add(i)
+        if not scheduled:
+            self.schedule(self.refine)
+
+    def _pyramid_of(self, i: int) -> HistogramPyramid | None:
+        """Give the pyramid of axis ``i``, or start loading it."""
+        if self._pyramid is not None and self._pyramid[0] == i:
+            return self._pyramid[1]
+        self._waiting.add(i)
+        if self._loading is not None or self._load_pyramid is None:
+            return None
+        columns, kwargs, _ = self.zoom_sources[i]
+        generation = self._generation
+
+        def on_loaded(pyramid: HistogramPyramid | None) -> None:
+            if generation == self._generation:
+                self._pyramid_loaded(i, pyramid)
+
+        self._loading = i
+        if not self._load_pyramid(columns, kwargs, on_loaded):
+            # Tried again at the next zoom
+            self._loading = None
+            self._waiting.discard(i)
+        return None
+
+    def _pyramid_loaded(
+        self, i: int, pyramid: HistogramPyramid | None
+    ) -> None:
+        """Keep the pyramid of axis ``i``, then refine the waiting axes."""
+        self._loading = None
+        if pyramid is None:
+            self._waiting.clear()
+            return
+        # The pyramid of the previously refined axis is released
+        self._pyramid = (i, pyramid)
+        scheduled = bool(self._pending)
+        self._pending |= self._waiting
+        self._waiting.clear()
+        if not scheduled and self._pending:
+            self.schedule(self.refine)
+
+    def _on_draw(self, event: Any) -> None:
+        """Remember what the last full draw looked like."""
+        self._drawn_layout = self._layout()
+
+    def _layout(self) -> Any:
+        """Describe everything but the content of the images."""
+        return (
+            tuple(self.figure.get_size_inches()),
+            self._grids,
+            tuple(
+                (axis.get_title(), axis.get_xlim(), axis.get_ylim())
+                for axis in self.axes.flatten()
+            ),
+            tuple(
+                (key, tuple(image.get_extent()))
+                for key, image in sorted(self.images.items())
+            ),
+        )
+
+
+class EmbeddedFigure(ReusableFigure):
+    """Hold a reusable figure drawn in a tkinter widget, with its toolbar."""
+
+    def __init__(self, master: tk.Misc) -> None:
+        """Create the figure, its canvas and toolbar in a new frame."""
+        self.frame = tk.Frame(master)
+        # A fixed layout is much faster to draw than a constrained one
+        figure = Figure(figsize=(7, 6))
+        figure.subplots_adjust(
+            left=0.08,
+            right=0.98,
+            bottom=0.06,
+            top=0.95,
+            wspace=0.25,
+            hspace=0.3,
+        )
+        self.canvas = FigureCanvasTkAgg(figure, master=self.frame)
+        toolbar = NavigationToolbar2Tk(
+            self.canvas, self.frame, pack_toolbar=False
+        )
+        toolbar.pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(expand=True, fill="both")
+        super().__init__(figure)
+
+    def schedule(self, callback: Callable[[], None]) -> None:
+        """Call ``callback`` when Tk is idle, after both limits are set."""
+        self.canvas.get_tk_widget().after_idle(callback)
+
+
+def _distribution_layer(
+    hist: tuple[np.ndarray, np.ndarray, np.ndarray],
+    kwargs: dict[str, Any],
+) -> ImageLayer:
+    """Describe a distribution histogram, as drawn by :mod:`.distribution`."""
+    return ImageLayer(
+        "distribution",
+        hist,
+        kwargs.get("cmap", "rainbow"),
+        norm=kwargs.get("norm", "log"),
+        vmin=kwargs.get("vmin"),
+        vmax=kwargs.get("vmax"),
+    )
+
+
+def _format_axis(
+    axis: Axes,
+    layers: list[ImageLayer],
+    columns: tuple[str, str],
+    grid: bool = True,
+    xlim: tuple[float, float] | None = None,
+    ylim: tuple[float, float] | None = None,
+    **kwargs,
+) -> None:
+    """Set title, grid and limits, as :mod:`.distribution` does."""
+    _, xedges, yedges = layers[-1].hist
+    axis.set_xlim(xlim if xlim else (xedges[0], xedges[-1]))
+    axis.set_ylim(ylim if ylim else (yedges[0], yedges[-1]))
+    title = " - ".join(columns)
+    statistics = getattr(layers[-1].hist, "metadata", {}).get("statistics")
+    if statistics is not None:
+        title += "\n" + format_statistics(statistics)
+    axis.set_title(title)
+    axis.grid(grid)
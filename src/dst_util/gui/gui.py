@@ -1,11 +1,26 @@
 #!/usr/bin/env python3
+import os
 import tkinter as tk
+from collections.abc import Callable
 from pathlib import Path
 from tkinter import filedialog, messagebox, ttk
+from typing import Any
 
-import matplotlib.pyplot as plt
+from dst_util.autorange import auto_range_kwargs, fixed_range_kwargs
+from dst_util.cache import ParticleCache
+from dst_util.constants import DEFAULT_WORKERS
+from dst_util.dst_helper import (
+    save_all_acceptances,
+    save_all_distributions,
+    save_figure,
+)
+from dst_util.gui.canvas import EmbeddedFigure
+from dst_util.gui.worker import BackgroundTask
+from dst_util.progress import Progress
+from dst_util.session import SessionCache
 
-from dst_util.wrappers import plot_acceptance, plot_distribution
+#: Delay between two checks of the worker messages, in ms.
+POLL_INTERVAL = 50
 
 
 class DSTUtilApp(tk.Tk):
@@ -16,13 +31,20 @@ class DSTUtilApp(tk.Tk):
         super().__init__()
 
         self.title("DST Util GUI")
-        self.geometry("1200x800")
+        self.geometry("1600x900")
+        self.cache = ParticleCache()
+        # Particles and histograms of this session, to replot instantly
+        self.session = SessionCache(particle_cache=self.cache)
+
+        self.task: BackgroundTask | None = None
+        self.plot_buttons: list[ttk.Button] = []
 
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(expand=True, fill="both")
 
         self.create_acceptance_tab()
         self.create_distribution_tab()
+        self.create_status_bar()
 
     def create_acceptance_tab(self) -> None:
         """Define the first tab, to plot acceptances."""
@@ -111,6 +133,24 @@ class DSTUtilApp(tk.Tk):
             row=5, column=0, columnspan=2, padx=10, pady=10
         )
 
+        # Binned kernel density estimation, see dst_util.smoothing
+        self.smooth_acceptance = tk.BooleanVar(value=False)
+        smooth_checkbox_acceptance = ttk.Checkbutton(
+            acceptance_frame,
+            text="Smooth",
+            variable=self.smooth_acceptance,
+        )
+        smooth_checkbox_acceptance.grid(row=5, column=2, padx=10, pady=10)
+
+        # Ranges from robust quantiles, see dst_util.autorange
+        self.auto_range_acceptance = tk.BooleanVar(value=False)
+        auto_range_checkbox_acceptance = ttk.Checkbutton(
+            acceptance_frame,
+            text="Auto range",
+            variable=self.auto_range_acceptance,
+        )
+        auto_range_checkbox_acceptance.grid(row=4, column=2, padx=10, pady=10)
+
         # Plot kwargs (xlim and ylim for subplots)
         self.plot_kwargs_acceptance = {
             ("x(mm)", "x'(mrad)"): {
@@ -180,14 +220,23 @@ class DSTUtilApp(tk.Tk):
         plot_button = ttk.Button(
             acceptance_frame, text="Plot", command=self.plot_acceptance
         )
+        self.plot_buttons.append(plot_button)
+        n_rows = row_offset + len(self.plot_kwargs_acceptance) + 2
         plot_button.grid(
-            row=row_offset + len(self.plot_kwargs_acceptance) + 1,
+            row=n_rows - 1,
             column=0,
             columnspan=3,
             padx=10,
             pady=10,
         )
 
+        # Figure, reused between plots
+        self.figure_acceptance = EmbeddedFigure(acceptance_frame)
+        self.figure_acceptance.frame.grid(
+            row=0, column=3, rowspan=n_rows, sticky="nsew"
+        )
+        acceptance_frame.columnconfigure(3, weight=1)
+
     def create_distribution_tab(self) -> None:
         """Create the second tab."""
         distribution_frame = ttk.Frame(self.notebook)
@@ -231,6 +280,31 @@ class DSTUtilApp(tk.Tk):
             row=2, column=0, columnspan=2, padx=10, pady=10
         )
 
+        # Index particles to rebin the visible window when zooming
+        self.refine_on_zoom = tk.BooleanVar(value=True)
+        refine_checkbox = ttk.Checkbutton(
+            distribution_frame,
+            text="Refine on zoom",
+            variable=self.refine_on_zoom,
+        )
+        refine_checkbox.grid(row=2, column=2, padx=10, pady=10)
+
+        # Binned kernel density estimation, see dst_util.smoothing
+        self.smooth = tk.BooleanVar(value=False)
+        smooth_checkbox = ttk.Checkbutton(
+            distribution_frame, text="Smooth", variable=self.smooth
+        )
+        smooth_checkbox.grid(row=1, column=2, padx=10, pady=10)
+
+        # Ranges from robust quantiles, see dst_util.autorange
+        self.auto_range = tk.BooleanVar(value=False)
+        auto_range_checkbox = ttk.Checkbutton(
+            distribution_frame, text="Auto range", variable=self.auto_range
+        )
+        auto_range_checkbox.grid(
+            row=3, column=0, columnspan=2, padx=10, pady=10
+        )
+
         # Plot kwargs (xlim and ylim for subplots)
         self.plot_kwargs = {
             ("x(mm)", "x'(mrad)"): {
@@ -255,7 +329,7 @@ class DSTUtilApp(tk.Tk):
             },
         }
 
-        row_offset = 3
+        row_offset = 4
         for i, ((x_label, y_label), kwargs) in enumerate(
             self.plot_kwargs.items()
         ):
@@ -300,14 +374,63 @@ class DSTUtilApp(tk.Tk):
         plot_button = ttk.Button(
             distribution_frame, text="Plot", command=self.plot_distribution
         )
+        self.plot_buttons.append(plot_button)
+        n_rows = row_offset + len(self.plot_kwargs) + 2
         plot_button.grid(
-            row=row_offset + len(self.plot_kwargs) + 1,
+            row=n_rows - 1,
             column=0,
             columnspan=3,
             padx=10,
             pady=10,
         )
 
+        # Figure, reused between plots
+        self.figure_distribution = EmbeddedFigure(distribution_frame)
+        self.figure_distribution.frame.grid(
+            row=0, column=3, rowspan=n_rows, sticky="nsew"
+        )
+        distribution_frame.columnconfigure(3, weight=1)
+
+    def create_status_bar(self) -> None:
+        """Create the progress bar and the button cancelling computations."""
+        status_frame = ttk.Frame(self)
+        status_frame.pack(fill="x", side="bottom")
+
+        self.status = tk.StringVar(value="Ready")
+        status_label = ttk.Label(
+            status_frame, textvariable=self.status, width=50
+        )
+        status_label.pack(side="left", padx=10, pady=5)
+
+        self.progress_bar = ttk.Progressbar(
+            status_frame, mode="determinate", maximum=1.0
+        )
+        self.progress_bar.pack(
+            side="left", expand=True, fill="x", padx=10, pady=5
+        )
+
+        self.cancel_button = ttk.Button(
+            status_frame,
+            text="Cancel",
+            command=self.cancel_task,
+            state="disabled",
+        )
+        self.cancel_button.pack(side="right", padx=10, pady=5)
+
+        # Threads binning the particles, see dst_util.binning
+        n_cpus = os.cpu_count() or 1
+        self.workers = tk.IntVar(value=DEFAULT_WORKERS)
+        workers_spinbox = ttk.Spinbox(
+            status_frame,
+            from_=1,
+            to=n_cpus,
+            textvariable=self.workers,
+            width=4,
+        )
+        workers_spinbox.pack(side="right", padx=10, pady=5)
+        workers_label = ttk.Label(status_frame, text="Threads:")
+        workers_label.pack(side="right", pady=5)
+
     def browse_file(self, path_var) -> None:
         """Open the filedialog and set the ``path_var``."""
         file_path = filedialog.askopenfilename()
@@ -334,22 +457,63 @@ class DSTUtilApp(tk.Tk):
                     key, value = kwarg.split("=")
                     plot_kwargs_entry[key.strip()] = eval(value.strip())
 
+            if self.smooth.get():
+                plot_kwargs_entry.setdefault("smooth", True)
+
             plot_single_kwargs[(x_label, y_label)] = plot_kwargs_entry
 
+        if self.auto_range.get():
+            plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+
         if not filepath_density:
             messagebox.showerror("Error", "Please select a file to plot.")
             return
 
-        try:
-            plot_distribution(
-                filepath_density=Path(filepath_density),
-                bins=bins,
-                save_hist_data=save_hist_data,
-                plot_single_kwargs=plot_single_kwargs,
+        filepath_density = Path(filepath_density)
+
+        refine_on_zoom = self.refine_on_zoom.get()
+        workers = self._workers()
+        if workers is None:
+            return
+
+        def compute(progress: Progress) -> Any:
+            return self.session.distributions(
+                filepath_density,
+                plot_single_kwargs,
+                bins,
+                progress=progress,
+                workers=workers,
+            )
+
+        def load_pyramid(
+            columns: tuple[str, str],
+            kwargs: dict[str, Any],
+            on_loaded: Callable[[Any], None],
+        ) -> bool:
+            # Zooming during another computation keeps the coarse view
+            if self.task is not None and self.task.running:
+                return False
+            self.start_task(
+                lambda progress: self.session.pyramid(
+                    filepath_density, columns, kwargs, progress=progress
+                ),
+                on_loaded,
+                on_failed=lambda: on_loaded(None),
             )
-            plt.show()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            return True
+
+        def show(hist_data: Any) -> None:
+            figure = self.figure_distribution
+            figure.show_distributions(hist_data, plot_single_kwargs)
+            if refine_on_zoom:
+                figure.enable_zoom(load_pyramid, plot_single_kwargs, bins)
+            save_figure(figure.figure, filepath_density)
+            if save_hist_data:
+                save_all_distributions(
+                    hist_data, plot_single_kwargs.keys(), filepath_density
+                )
+
+        self.start_task(compute, show)
 
     def plot_acceptance(self) -> None:
         """Plot the acceptance."""
@@ -379,29 +543,162 @@ class DSTUtilApp(tk.Tk):
                     key, value = kwarg.split("=")
                     plot_kwargs_entry[key.strip()] = eval(value.strip())
 
+            if self.smooth_acceptance.get():
+                plot_kwargs_entry.setdefault("smooth", True)
+
             plot_single_kwargs[(x_label, y_label)] = plot_kwargs_entry
 
+        auto_range = self.auto_range_acceptance.get()
+        if auto_range:
+            plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+
         if not filepath_acceptance:
             messagebox.showerror(
                 "Error", "Please select a file for acceptance."
             )
             return
 
-        try:
-            # Call the appropriate plotting function from your acceptance module
-            # Replace `plot_acceptance` with the actual function name if different
-            plot_acceptance(
+        workers = self._workers()
+        if workers is None:
+            return
+
+        def compute(progress: Progress) -> Any:
+            acceptance_data = self.session.acceptances(
                 filepath_acceptance,
-                filepath_density=filepath_density,
-                bins_acceptance=bins_acceptance,
-                bins_density=bins_density,
-                plot_single_kwargs=plot_single_kwargs,
-                save_hist_data=save_hist_data,
+                plot_single_kwargs,
+                bins_acceptance,
+                progress=progress,
+                workers=workers,
+            )
+            if filepath_density is None:
+                return acceptance_data, None
+            density_kwargs = plot_single_kwargs
+            if auto_range:
+                # Density is binned over the ranges of the acceptance
+                density_kwargs = fixed_range_kwargs(
+                    acceptance_data, plot_single_kwargs
+                )
+            hist_data = self.session.distributions(
+                filepath_density,
+                density_kwargs,
+                bins_density,
+                progress=progress,
+                workers=workers,
+            )
+            return acceptance_data, hist_data
+
+        def show(result: Any) -> None:
+            acceptance_data, hist_data = result
+            figure = self.figure_acceptance
+            figure.show_acceptances(
+                acceptance_data,
+                hist_data,
+                plot_single_kwargs,
                 invert_acceptance_colors=invert_acceptance_colors,
             )
-            plt.show()
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
+            save_figure(figure.figure, filepath_acceptance)
+            if not save_hist_data:
+                return
+            save_all_acceptances(
+                acceptance_data, plot_single_kwargs.keys(), filepath_acceptance
+            )
+            if hist_data is not None:
+                save_all_distributions(
+                    hist_data, plot_single_kwargs.keys(), filepath_density
+                )
+
+        self.start_task(compute, show)
+
+    def start_task(
+        self,
+        compute: Callable[[Progress], Any],
+        on_done: Callable[[Any], None],
+        on_failed: Callable[[], None] | None = None,
+    ) -> None:
+        """Run ``compute`` in a worker thread, then ``on_done`` here.
+
+        Parameters
+        ----------
+        compute :
+            Reading and binning; must not touch tkinter nor matplotlib.
+        on_done :
+            Called in the main thread with the output of ``compute``.
+        on_failed :
+            If provided, called in the main thread when ``compute`` is
+            cancelled or fails.
+
+        """
+        if self.task is not None and self.task.running:
+            messagebox.showinfo("Busy", "A computation is already running.")
+            return
+        self.task = BackgroundTask(compute)
+        for button in self.plot_buttons:
+            button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+        self.progress_bar["value"] = 0.0
+        self.status.set("Starting...")
+        self.task.start()
+        self.after(
+            POLL_INTERVAL, self._poll_task, self.task, on_done, on_failed
+        )
+
+    def cancel_task(self) -> None:
+        """Ask the running computation to stop."""
+        if self.task is not None:
+            self.task.cancel()
+            self.status.set("Cancelling...")
+
+    def _poll_task(
+        self,
+        task: BackgroundTask,
+        on_done: Callable[[Any], None],
+        on_failed: Callable[[], None] | None = None,
+    ) -> None:
+        """Handle the messages of the worker, and reschedule until done."""
+        for kind, payload in task.poll():
+            if kind == "progress":
+                stage, fraction = payload
+                self.progress_bar["value"] = fraction
+                self.status.set(f"{stage}: {fraction:.0%}")
+                continue
+
+            self._end_task()
+            if kind != "done" and on_failed is not None:
+                on_failed()
+            if kind == "cancelled":
+                self.status.set("Cancelled")
+            elif kind == "error":
+                self.status.set("Error")
+                messagebox.showerror("Error", str(payload))
+            else:
+                self.status.set("Rendering...")
+                self.update_idletasks()
+                try:
+                    on_done(payload)
+                    self.status.set("Done")
+                except Exception as e:
+                    self.status.set("Error")
+                    messagebox.showerror("Error", str(e))
+            return
+        self.after(POLL_INTERVAL, self._poll_task, task, on_done, on_failed)
+
+    def _end_task(self) -> None:
+        """Give the controls back to the user."""
+        for button in self.plot_buttons:
+            button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+        self.progress_bar["value"] = 0.0
+
+    def _workers(self) -> int | None:
+        """Give the number of threads of the status bar, None if invalid."""
+        try:
+            workers = self.workers.get()
+        except tk.TclError:
+            messagebox.showerror(
+                "Error", "Number of threads must be an integer."
+            )
+            return None
+        return max(1, workers)
 
 
 def main() -> None:
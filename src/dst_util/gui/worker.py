@@ -0,0 +1,79 @@
+"""Define the execution of computations outside of the Tk main thread.
+
+tkinter and matplotlib must only be used from the main thread; reading and
+binning are hence run in a worker thread, which sends its progress and result
+to the main thread through a queue. numpy and pandas release the GIL in their
+heavy loops, so that the window stays responsive.
+
+"""
+
+import queue
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from dst_util.progress import Cancelled, Progress
+
+
+class BackgroundTask:
+    """Run a function in a worker thread, and collect its messages.
+
+    Messages are ``(kind, payload)`` tuples, where ``kind`` is:
+
+    - ``"progress"``: ``payload`` is the ``(stage, fraction)`` tuple.
+    - ``"done"``: ``payload`` is the output of the function.
+    - ``"cancelled"``: ``payload`` is None.
+    - ``"error"``: ``payload`` is the raised exception.
+
+    """
+
+    def __init__(self, target: Callable[[Progress], Any]) -> None:
+        """Prepare the task, without starting it.
+
+        Parameters
+        ----------
+        target :
+            Function taking a :class:`.Progress` to update regularly.
+
+        """
+        self.target = target
+        self.messages: queue.Queue[tuple[str, Any]] = queue.Queue()
+        self.progress = Progress(
+            lambda stage, fraction: self.messages.put(
+                ("progress", (stage, fraction))
+            )
+        )
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def running(self) -> bool:
+        """Tell if the worker thread is still alive."""
+        return self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Ask the function to stop at its next progress update."""
+        self.progress.cancel()
+
+    def poll(self) -> list[tuple[str, Any]]:
+        """Give all the messages sent since the last call, without waiting."""
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def _run(self) -> None:
+        """Call the function and send its outcome."""
+        try:
+            result = self.target(self.progress)
+        except Cancelled:
+            self.messages.put(("cancelled", None))
+        except Exception as e:
+            self.messages.put(("error", e))
+        else:
+            self.messages.put(("done", result))
@@ -0,0 +1,333 @@
+"""Define the accumulation of acceptance maps over many runs.
+
+In error studies, the same lattice is simulated hundreds of times with
+different machine errors. For every cell of a projection, the fraction of the
+runs accepting it gives an acceptance probability.
+
+Runs are added one at a time: only the number of accepting runs is kept for
+every cell, so that memory does not depend on the number of runs nor on their
+number of particles. Edges are fixed once and for all, and the state can be
+saved after every run and reloaded to resume an interrupted study.
+
+"""
+
+import json
+import os
+from collections.abc import Iterable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from dst_util.binning import Edges2D, projection_ranges, uniform_edges
+from dst_util.compute import Histogram, compute_acceptances_from_file
+from dst_util.constants import HistFormat
+from dst_util.dst_helper import _save_single_hist
+
+if TYPE_CHECKING:
+    from dst_util.cache import ParticleCache
+
+
+class AcceptanceAccumulator:
+    """Count, for every cell, how many runs accept it.
+
+    Parameters
+    ----------
+    plot_single_kwargs :
+        Projections to accumulate. Every projection needs fixed limits: its
+        ``range``, or its ``xlim`` and ``ylim`` if ``range`` is not given.
+    bins :
+        Number of bins along each axis.
+
+    """
+
+    def __init__(
+        self,
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        bins: int,
+    ) -> None:
+        """Fix the edges and create empty counts."""
+        self.bins = bins
+        self.ranges = _fixed_ranges(plot_single_kwargs)
+        self.edges: list[Edges2D] = [
+            (uniform_edges(*x_range, bins), uniform_edges(*y_range, bins))
+            for x_range, y_range in self.ranges.values()
+        ]
+        self.counts = [
+            np.zeros((bins, bins), dtype=np.uint32) for _ in self.ranges
+        ]
+        #: Files already accumulated, in order.
+        self.runs: list[str] = []
+
+    @property
+    def columns(self) -> list[tuple[str, str]]:
+        """Give the columns of every projection."""
+        return list(self.ranges)
+
+    @property
+    def n_runs(self) -> int:
+        """Give the number of accumulated runs."""
+        return len(self.runs)
+
+    def add_file(
+        self,
+        filepath: Path,
+        dtype: np.dtype | type = np.float64,
+        cache: "ParticleCache | None" = None,
+        chunksize: int | None = None,
+    ) -> bool:
+        """Add the acceptance of a single run.
+
+        Parameters
+        ----------
+        filepath :
+            ASCII or ``.dst`` file holding the accepted particles of the run.
+        dtype, cache, chunksize :
+            Passed to :func:`.compute_acceptances_from_file`.
+
+        Returns
+        -------
+        bool
+            False if ``filepath`` was already accumulated and was skipped.
+
+        """
+        # The same run given by another path must not be counted twice
+        run = str(Path(filepath).resolve())
+        if run in self.runs:
+            return False
+        maps = compute_acceptances_from_file(
+            filepath,
+            self._fixed_kwargs(),
+            self.bins,
+            dtype=dtype,
+            cache=cache,
+            chunksize=chunksize,
+        )
+        self.add_maps(maps, run)
+        return True
+
+    def add_maps(
+        self,
+        maps: Iterable[tuple[np.ndarray, np.ndarray, np.ndarray]],
+        run: str,
+    ) -> None:
+        """Add already computed acceptance maps, with the same edges."""
+        maps = list(maps)
+        if len(maps) != len(self.counts):
+            raise ValueError(
+                f"Expected {len(self.counts)} maps, got {len(maps)}."
+            )
+        for counts, (xedges, yedges), (h, map_xedges, map_yedges) in zip(
+            self.counts, self.edges, maps
+        ):
+            if not (
+                np.array_equal(xedges, map_xedges)
+                and np.array_equal(yedges, map_yedges)
+            ):
+                raise ValueError(f"Edges of {run = } do not match.")
+            counts += np.asarray(h) > 0
+        self.runs.append(run)
+
+    def probabilities(self) -> list[Histogram]:
+        """Give the fraction of runs accepting every cell."""
+        if not self.runs:
+            raise ValueError("No run was accumulated.")
+        return [
+            Histogram(
+                counts / self.n_runs,
+                xedges,
+                yedges,
+                columns,
+                kind="probability",
+                metadata={"n_runs": self.n_runs},
+            )
+            for counts, (xedges, yedges), columns in zip(
+                self.counts, self.edges, self.columns
+            )
+        ]
+
+    def save(self, filepath: Path) -> None:
+        """Save the state, so that accumulation can be resumed.
+
+        The file is replaced atomically: an interruption while saving leaves
+        the previous state untouched.
+
+        """
+        meta = {
+            "bins": self.bins,
+            "ranges": [
+                [list(columns), [list(x_range), list(y_range)]]
+                for columns, (x_range, y_range) in self.ranges.items()
+            ],
+            "runs": self.runs,
+        }
+        arrays = {f"counts_{i}": c for i, c in enumerate(self.counts)}
+        tmp = filepath.with_name(filepath.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(f, meta=json.dumps(meta), **arrays)
+        os.replace(tmp, filepath)
+
+    @classmethod
+    def load(cls, filepath: Path) -> "AcceptanceAccumulator":
+        """Reload a state saved by :meth:`save`."""
+        with np.load(filepath) as state:
+            meta = json.loads(str(state["meta"]))
+            plot_single_kwargs = {
+                tuple(columns): {"range": tuple(map(tuple, range_))}
+                for columns, range_ in meta["ranges"]
+            }
+            accumulator = cls(plot_single_kwargs, meta["bins"])
+            accumulator.counts = [
+                state[f"counts_{i}"] for i in range(len(plot_single_kwargs))
+            ]
+        accumulator.runs = meta["runs"]
+        return accumulator
+
+    def _fixed_kwargs(self) -> dict[tuple[str, str], dict[str, Any]]:
+        """Give projections which edges are the accumulator ones."""
+        return {
+            columns: {"range": range_}
+            for columns, range_ in self.ranges.items()
+        }
+
+
+def accumulate_runs(
+    filepaths: Iterable[Path],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int = 200,
+    state_filepath: Path | None = None,
+    dtype: np.dtype | type = np.float64,
+    chunksize: int | None = None,
+) -> AcceptanceAccumulator:
+    """Accumulate the acceptance of every run, one after the other.
+
+    Parameters
+    ----------
+    filepaths :
+        Files holding the accepted particles of every run.
+    plot_single_kwargs :
+        Projections to accumulate; ignored when resuming.
+    bins :
+        Number of bins along each axis; ignored when resuming.
+    state_filepath :
+        If provided, the state is saved there after every run. If it already
+        exists, it is loaded and the runs it holds are skipped.
+    dtype, chunksize :
+        Passed to :meth:`AcceptanceAccumulator.add_file`.
+
+    """
+    if state_filepath is not None and state_filepath.is_file():
+        accumulator = AcceptanceAccumulator.load(state_filepath)
+        print(f"Resuming {accumulator.n_runs} runs from {state_filepath = }")
+    else:
+        accumulator = AcceptanceAccumulator(plot_single_kwargs, bins)
+
+    for filepath in filepaths:
+        if not accumulator.add_file(
+            filepath, dtype=dtype, chunksize=chunksize
+        ):
+            continue
+        print(f"Accumulated run {accumulator.n_runs}: {filepath = }")
+        if state_filepath is not None:
+            accumulator.save(state_filepath)
+    return accumulator
+
+
+def probability_contours(
+    probability: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+    levels: Iterable[float] = (0.5, 0.9, 0.99),
+) -> dict[float, list[np.ndarray]]:
+    """Compute the iso-probability lines of an acceptance probability map.
+
+    Lines are computed on bin centers with contourpy, which is installed with
+    matplotlib but does not import it.
+
+    Returns
+    -------
+    dict[float, list[np.ndarray]]
+        For every level, the ``(n_points, 2)`` x-y coordinates of every line.
+
+    """
+    from contourpy import contour_generator
+
+    x_centers = 0.5 * (xedges[:-1] + xedges[1:])
+    y_centers = 0.5 * (yedges[:-1] + yedges[1:])
+    generator = contour_generator(
+        x_centers, y_centers, np.asarray(probability, dtype=np.float64).T
+    )
+    return {level: list(generator.lines(level)) for level in levels}
+
+
+def save_all_probabilities(
+    probabilities: Iterable[Histogram],
+    original_filepath: Path,
+    fmt: HistFormat = "csv",
+    levels: Iterable[float] = (0.5, 0.9, 0.99),
+) -> None:
+    """Save the probability maps and their contours for pgfplots.
+
+    Every map is saved as the other histograms are. Its contours are saved in
+    a ``_contours.csv`` file with ``x y level`` columns; lines are separated
+    by empty lines, to plot with ``empty line=jump``.
+
+    """
+    levels = tuple(levels)
+    for hist in probabilities:
+        name = (
+            original_filepath.stem
+            + "_probability_"
+            + "_".join(hist.columns).replace(" ", "_")
+        )
+        filepath = original_filepath.with_stem(name).with_suffix(".csv")
+        _save_single_hist(filepath, *hist, add_log_column=False, fmt=fmt)
+        _save_contours(
+            filepath.with_stem(name + "_contours"),
+            probability_contours(*hist, levels=levels),
+        )
+
+
+def _save_contours(
+    filepath: Path, contours: dict[float, list[np.ndarray]]
+) -> None:
+    """Save iso-probability lines, separated by empty lines."""
+    with open(filepath, "w") as f:
+        f.write("x y level\n")
+        for level, lines in contours.items():
+            for line in lines:
+                np.savetxt(
+                    f,
+                    np.column_stack((line, np.full(len(line), level))),
+                    fmt="%.10g",
+                )
+                f.write("\n")
+    print(f"Saved contours in {filepath = }")
+
+
+def _fixed_ranges(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> dict[tuple[str, str], tuple[tuple[float, float], tuple[float, float]]]:
+    """Give the range of every projection, falling back on plot limits."""
+    ranges = {}
+    for (columns, kwargs), range_ in zip(
+        plot_single_kwargs.items(), projection_ranges(plot_single_kwargs)
+    ):
+        if range_ == "auto":
+            raise ValueError(
+                f"Projection {columns} cannot have an automatic range, as "
+                "edges must be the same for all runs."
+            )
+        if range_ is None:
+            if kwargs.get("xlim") is None or kwargs.get("ylim") is None:
+                raise ValueError(
+                    f"Projection {columns} needs a range or plot limits, as "
+                    "edges must be the same for all runs."
+                )
+            range_ = (kwargs["xlim"], kwargs["ylim"])
+        x_range, y_range = range_
+        ranges[columns] = (
+            (float(x_range[0]), float(x_range[1])),
+            (float(y_range[0]), float(y_range[1])),
+        )
+    return ranges
@@ -0,0 +1,178 @@
+"""Define a lightweight profiler, to find which stage of a run is slow.
+
+Stages are wrapped in :func:`span`. When no profiler is active, which is the
+default, :func:`span` returns a shared context that does nothing, so that
+instrumented code runs at the same speed. Within :func:`profile`, every span
+records its duration, the resident memory of the process and optional
+attributes such as the number of particles. Spans opened inside another span
+are nested in it.
+
+Only the spans of the thread that started the profiler are recorded.
+
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Span:
+    """Record a stage of a run."""
+
+    def __init__(self, name: str, attributes: dict[str, Any]) -> None:
+        """Create the span; it is started by the profiler."""
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+        self.rss_start: int | None = None
+        self.rss_end: int | None = None
+        self.peak_rss: int | None = None
+        self.peak_rss_increase: int | None = None
+        self.children: list[Span] = []
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes known only once the stage started."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert the span and its children to JSON-compatible types."""
+        return {
+            "name": self.name,
+            "start": self.start,
+            "duration": self.duration,
+            "rss_start": self.rss_start,
+            "rss_end": self.rss_end,
+            "peak_rss": self.peak_rss,
+            "peak_rss_increase": self.peak_rss_increase,
+            "attributes": self.attributes,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class _DisabledSpan:
+    """Do nothing, as fast as possible."""
+
+    def __enter__(self) -> "_DisabledSpan":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+    def set(self, **attributes: Any) -> None:
+        """Ignore the attributes."""
+
+
+_DISABLED_SPAN = _DisabledSpan()
+
+
+class Profiler:
+    """Collect nested spans."""
+
+    def __init__(self) -> None:
+        """Create a profiler without any span."""
+        self.spans: list[Span] = []
+        self._stack: list[Span] = []
+        self._origin = time.perf_counter()
+        self._thread = threading.get_ident()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Record the enclosed code in a new span."""
+        span = Span(name, attributes)
+        (self._stack[-1].children if self._stack else self.spans).append(span)
+        self._stack.append(span)
+        peak_before = peak_rss()
+        span.rss_start = current_rss()
+        span.start = time.perf_counter() - self._origin
+        try:
+            yield span
+        finally:
+            span.duration = time.perf_counter() - self._origin - span.start
+            span.rss_end = current_rss()
+            span.peak_rss = peak_rss()
+            if span.peak_rss is not None and peak_before is not None:
+                span.peak_rss_increase = span.peak_rss - peak_before
+            self._stack.pop()
+
+    def to_dict(self) -> dict[str, Any]:
+        """Convert all spans to JSON-compatible types."""
+        return {
+            "python": sys.version.split()[0],
+            "peak_rss": peak_rss(),
+            "spans": [span.to_dict() for span in self.spans],
+        }
+
+    def save(self, filepath: Path) -> None:
+        """Write the trace as JSON."""
+        with open(filepath, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        print(f"Saved profile in {filepath = }")
+
+
+_active: Profiler | None = None
+
+
+def span(name: str, **attributes: Any) -> Any:
+    """Record the enclosed code if a profiler is active.
+
+    Parameters
+    ----------
+    name :
+        Name of the stage.
+    attributes :
+        JSON-compatible values describing the stage. More can be added with
+        the ``set`` method of the object given by the context manager.
+
+    """
+    if _active is None or threading.get_ident() != _active._thread:
+        return _DISABLED_SPAN
+    return _active.span(name, **attributes)
+
+
+@contextmanager
+def profile(filepath: Path | None = None) -> Iterator[Profiler]:
+    """Activate a profiler, and save its trace in ``filepath`` at the end."""
+    global _active
+    previous, _active = _active, Profiler()
+    profiler = _active
+    try:
+        yield profiler
+    finally:
+        _active = previous
+        if filepath is not None:
+            profiler.save(filepath)
+
+
+def current_rss() -> int | None:
+    """Give the resident memory of the process in bytes, if available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss() -> int | None:
+    """Give the peak resident memory of the process in bytes, if available.
+
+    This is the peak since the start of the process: a span raised it only if
+    its ``peak_rss_increase`` is positive.
+
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS bytes
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
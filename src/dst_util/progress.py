@@ -0,0 +1,50 @@
+"""Define the reporting of progress of long computations.
+
+A :class:`Progress` is given to the reading and binning functions, which
+regularly call :meth:`Progress.update`. It forwards the advancement to a
+callback, typically feeding a progress bar, and raises :class:`Cancelled` if
+the computation was cancelled in the meantime, possibly from another thread.
+
+"""
+
+import threading
+from collections.abc import Callable
+
+
+class Cancelled(Exception):
+    """Raised in a computation that was cancelled."""
+
+
+class Progress:
+    """Report advancement and hold a thread-safe cancellation flag."""
+
+    def __init__(
+        self, callback: Callable[[str, float], None] | None = None
+    ) -> None:
+        """Set the function called at every update.
+
+        Parameters
+        ----------
+        callback :
+            Called with the name of the current stage and its advancement,
+            between 0 and 1.
+
+        """
+        self.callback = callback
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Tell if :meth:`cancel` was called."""
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """Ask the computation to stop at its next update."""
+        self._cancelled.set()
+
+    def update(self, stage: str, fraction: float) -> None:
+        """Report advancement of ``stage``; raise if cancelled."""
+        if self.cancelled:
+            raise Cancelled(f"Cancelled during {stage}.")
+        if self.callback is not None:
+            self.callback(stage, min(max(fraction, 0.0), 1.0))
@@ -0,0 +1,224 @@
+"""Define multi-resolution histograms, to zoom into distributions.
+
+For every projection, particles are counted once on a fine grid of
+``max_bins`` by ``max_bins`` bins; coarser levels are obtained by summing 2 by
+2 bins, down to a single bin. Zooming picks the coarsest level that still
+shows enough bins in the visible window.
+
+When even the finest level is too coarse, the particles in the visible window
+are binned again. To find them without scanning all particles, they are sorted
+by cell of the fine grid: the particles of consecutive cells along y are
+contiguous, and the offset of every cell is given by the cumulated counts of
+the finest level.
+
+"""
+
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+from dst_util.autorange import robust_limits
+from dst_util.binning import (
+    bin_indices,
+    column_limits,
+    columns_with_auto_range,
+    columns_without_range,
+    histogram_projections,
+    projection_edges,
+    uniform_edges,
+)
+
+if TYPE_CHECKING:
+    from dst_util.progress import Progress
+
+#: Default number of bins of the finest level, along each axis.
+DEFAULT_MAX_BINS = 1024
+
+
+class HistogramPyramid:
+    """Hold the histograms of a projection at power-of-two resolutions."""
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        xedges: np.ndarray,
+        yedges: np.ndarray,
+        index: bool = True,
+    ) -> None:
+        """Count the particles at every level.
+
+        Parameters
+        ----------
+        x, y :
+            Coordinates of the particles.
+        xedges, yedges :
+            Uniform edges of the finest level; the number of bins must be the
+            same power of two along x and y.
+        index :
+            To keep the particles sorted by cell, so that windows finer than
+            the finest level can be binned.
+
+        """
+        n_bins = len(xedges) - 1
+        if len(yedges) - 1 != n_bins or n_bins & (n_bins - 1):
+            raise ValueError(
+                f"Need the same power of two bins along x and y, got "
+                f"{len(xedges) - 1} and {len(yedges) - 1}."
+            )
+        self.xedges = xedges
+        self.yedges = yedges
+
+        ix = bin_indices(x, xedges)
+        iy = bin_indices(y, yedges)
+        inside = (ix >= 0) & (iy >= 0)
+        cells = ix[inside] * n_bins + iy[inside]
+        counts = np.bincount(cells, minlength=n_bins**2)
+
+        self.levels = [counts.reshape(n_bins, n_bins)]
+        while n_bins > 1:
+            n_bins //= 2
+            coarser = self.levels[0].reshape(n_bins, 2, n_bins, 2)
+            self.levels.insert(0, coarser.sum(axis=(1, 3)))
+
+        self._x = self._y = self._offsets = None
+        if index:
+            order = np.argsort(cells, kind="stable")
+            self._x = np.asarray(x)[inside][order]
+            self._y = np.asarray(y)[inside][order]
+            self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    @property
+    def max_level(self) -> int:
+        """Give the index of the finest level."""
+        return len(self.levels) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """Give the memory held by the levels and the index."""
+        arrays = [*self.levels, self._x, self._y, self._offsets]
+        return sum(array.nbytes for array in arrays if array is not None)
+
+    def level_for(
+        self, xlim: tuple[float, float], ylim: tuple[float, float], bins: int
+    ) -> int:
+        """Give the coarsest level with ``bins`` bins in the window.
+
+        The returned level may be larger than :attr:`max_level`.
+
+        """
+        zoom = max(
+            (self.xedges[-1] - self.xedges[0]) / abs(xlim[1] - xlim[0]),
+            (self.yedges[-1] - self.yedges[0]) / abs(ylim[1] - ylim[0]),
+        )
+        return max(0, int(np.ceil(np.log2(bins * zoom))))
+
+    def view(
+        self, xlim: tuple[float, float], ylim: tuple[float, float], bins: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Give the histogram of the window, with about ``bins`` bins.
+
+        Returns
+        -------
+        tuple[np.ndarray, np.ndarray, np.ndarray]
+            Counts as floats, x edges and y edges, covering at least the
+            intersection of the window with the edges of the pyramid.
+
+        """
+        level = self.level_for(xlim, ylim, bins)
+        if level > self.max_level and self._offsets is not None:
+            return self.rebin(xlim, ylim, bins)
+        return self.crop(min(level, self.max_level), xlim, ylim)
+
+    def crop(
+        self, level: int, xlim: tuple[float, float], ylim: tuple[float, float]
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Give the bins of ``level`` that intersect the window."""
+        step = 2 ** (self.max_level - level)
+        xedges = self.xedges[::step]
+        yedges = self.yedges[::step]
+        i0, i1 = _intersecting_bins(xedges, xlim)
+        j0, j1 = _intersecting_bins(yedges, ylim)
+        return (
+            self.levels[level][i0:i1, j0:j1].astype(np.float64),
+            xedges[i0 : i1 + 1],
+            yedges[j0 : j1 + 1],
+        )
+
+    def rebin(
+        self, xlim: tuple[float, float], ylim: tuple[float, float], bins: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Bin the particles in the window on ``bins`` by ``bins`` bins."""
+        if self._offsets is None:
+            raise ValueError("Pyramid was built without index.")
+        xlim, ylim = sorted(xlim), sorted(ylim)
+        n_bins = len(self.xedges) - 1
+        i0, i1 = _intersecting_bins(self.xedges, xlim)
+        j0, j1 = _intersecting_bins(self.yedges, ylim)
+
+        # Particles of cells (i, j0) to (i, j1 - 1) are contiguous
+        rows = np.arange(i0, i1) * n_bins
+        starts = self._offsets[rows + j0]
+        stops = self._offsets[rows + j1]
+        lengths = stops - starts
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        selected = shifts + np.arange(lengths.sum())
+
+        xedges = uniform_edges(float(xlim[0]), float(xlim[1]), bins)
+        yedges = uniform_edges(float(ylim[0]), float(ylim[1]), bins)
+        (counts,) = histogram_projections(
+            {"x": self._x[selected], "y": self._y[selected]},
+            [(("x", "y"), (xedges, yedges))],
+        )
+        return counts, xedges, yedges
+
+
+def build_pyramids(
+    data: Any,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    max_bins: int = DEFAULT_MAX_BINS,
+    index: bool = True,
+    progress: "Progress | None" = None,
+) -> list[HistogramPyramid]:
+    """Build the pyramid of every projection.
+
+    Pyramids cover the same range as :func:`.bin_all_projections` would.
+
+    """
+    limits = column_limits(data, columns_without_range(plot_single_kwargs))
+    auto_limits = robust_limits(
+        data, columns_with_auto_range(plot_single_kwargs)
+    )
+    all_edges = projection_edges(
+        plot_single_kwargs, max_bins, limits, auto_limits
+    )
+    pyramids = []
+    for i, ((x_col, y_col), (xedges, yedges)) in enumerate(
+        zip(plot_single_kwargs, all_edges)
+    ):
+        if progress is not None:
+            progress.update("Indexing", i / len(all_edges))
+        pyramids.append(
+            HistogramPyramid(
+                np.asarray(data[x_col]),
+                np.asarray(data[y_col]),
+                xedges,
+                yedges,
+                index=index,
+            )
+        )
+    if progress is not None:
+        progress.update("Indexing", 1.0)
+    return pyramids
+
+
+def _intersecting_bins(
+    edges: np.ndarray, lim: tuple[float, float]
+) -> tuple[int, int]:
+    """Give the first and past-the-last bins intersecting ``lim``."""
+    n_bins = len(edges) - 1
+    low, high = sorted(lim)
+    width = (edges[-1] - edges[0]) / n_bins
+    first = int(np.clip(np.floor((low - edges[0]) / width), 0, n_bins - 1))
+    last = int(np.clip(np.ceil((high - edges[0]) / width), first + 1, n_bins))
+    return first, last
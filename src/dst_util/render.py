@@ -0,0 +1,254 @@
+"""Define a fast raster rendering of histograms.
+
+:meth:`.Axes.pcolormesh` creates one vector quadrilateral per bin, which is
+slow to draw and produces huge PDF/SVG files for fine histograms. Here, every
+histogram is converted to a single RGBA image. When several histograms are
+drawn on the same axis (typically, density on top of acceptance), they are
+composited into one raster, so that each axis holds a single image.
+
+All edges are expected to be uniformly spaced, as produced by
+:func:`.uniform_edges`.
+
+"""
+
+import numpy as np
+from matplotlib.axes import Axes
+from matplotlib.colors import Colormap, LogNorm, Normalize
+from matplotlib.image import AxesImage
+
+#: Group id identifying the images created by this module.
+RASTER_GID = "dst_util_raster"
+
+
+def histogram_to_rgba(
+    h: np.ndarray,
+    cmap: Colormap,
+    norm: Normalize | str | None = None,
+    vmin: float | None = None,
+    vmax: float | None = None,
+) -> np.ndarray:
+    """Color-map a histogram, as :meth:`.Axes.pcolormesh` would.
+
+    Parameters
+    ----------
+    h :
+        Histogram, first index along x. NaN bins are transparent.
+    cmap :
+        Colormap to use.
+    norm :
+        Normalization; ``"log"``, ``"linear"``, an instance or None.
+        Limits that are not set are taken from the data.
+    vmin, vmax :
+        Limits of the normalization.
+
+    Returns
+    -------
+    np.ndarray
+        RGBA image of shape ``(n_y, n_x, 4)``, first row at lowest y.
+
+    """
+    norm = _as_norm(norm, vmin, vmax)
+    data = np.ma.masked_invalid(np.asarray(h, dtype=np.float64).T)
+    if isinstance(norm, LogNorm):
+        data = np.ma.masked_less_equal(data, 0.0)
+    norm.autoscale_None(data)
+    return cmap(norm(data))
+
+
+def add_raster_layer(
+    axis: Axes,
+    rgba: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+) -> AxesImage:
+    """Draw ``rgba`` over what this module already drew on ``axis``.
+
+    If ``axis`` already holds a raster created by this function, the new
+    layer is alpha-composited on top of it and the existing image is updated,
+    so that the axis keeps a single image. The composite has no more bins
+    than the axis has pixels, or than the largest layer if it has more.
+
+    """
+    image = find_raster(axis)
+    if image is None:
+        image = axis.imshow(
+            rgba,
+            extent=(xedges[0], xedges[-1], yedges[0], yedges[-1]),
+            origin="lower",
+            interpolation="nearest",
+            aspect="auto",
+        )
+        image.set_gid(RASTER_GID)
+        return image
+
+    below = np.asarray(image.get_array())
+    x0, x1, y0, y1 = image.get_extent()
+    below_xedges = np.linspace(x0, x1, below.shape[1] + 1)
+    below_yedges = np.linspace(y0, y1, below.shape[0] + 1)
+    composite, xedges, yedges = composite_layers(
+        [(below, below_xedges, below_yedges), (rgba, xedges, yedges)],
+        max_bins=(
+            int(np.ceil(axis.bbox.width)),
+            int(np.ceil(axis.bbox.height)),
+        ),
+    )
+    image.set_data(composite)
+    image.set_extent((xedges[0], xedges[-1], yedges[0], yedges[-1]))
+    return image
+
+
+def update_histogram_image(
+    axis: Axes,
+    image: AxesImage | None,
+    h: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+    cmap: Colormap | str,
+    norm: Normalize | str | None = None,
+    vmin: float | None = None,
+    vmax: float | None = None,
+) -> AxesImage:
+    """Draw ``h`` as a color-mapped image, reusing ``image`` if provided.
+
+    Updating an existing image with :meth:`.AxesImage.set_data` and
+    :meth:`.AxesImage.set_clim` is much cheaper than creating a new artist.
+    Unlike :func:`add_raster_layer`, the image keeps scalar data, so that its
+    colormap and limits can be changed afterwards.
+
+    """
+    norm = _as_norm(norm, vmin, vmax)
+    # NaN bins are transparent; plain arrays are much faster than masked ones
+    data = np.asarray(h, dtype=np.float64).T
+    valid = data[np.isfinite(data)]
+    if isinstance(norm, LogNorm):
+        valid = valid[valid > 0.0]
+    if valid.size:
+        norm.autoscale_None(valid)
+    extent = (xedges[0], xedges[-1], yedges[0], yedges[-1])
+    if image is None:
+        return axis.imshow(
+            data,
+            cmap=cmap,
+            norm=norm,
+            extent=extent,
+            origin="lower",
+            interpolation="nearest",
+            # Resampling colors instead of data is much slower when the
+            # histogram has more bins than the axis has pixels
+            interpolation_stage="data",
+            aspect="auto",
+        )
+    image.set_data(data)
+    image.set_extent(extent)
+    image.set_cmap(cmap)
+    if type(image.norm) is type(norm):
+        image.set_clim(norm.vmin, norm.vmax)
+    else:
+        image.set_norm(norm)
+    return image
+
+
+def find_raster(axis: Axes) -> AxesImage | None:
+    """Give the raster created by :func:`add_raster_layer`, if any."""
+    for image in axis.images:
+        if image.get_gid() == RASTER_GID:
+            return image
+    return None
+
+
+def composite_layers(
+    layers: list[tuple[np.ndarray, np.ndarray, np.ndarray]],
+    max_bins: tuple[int, int] | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Alpha-composite RGBA layers, last one on top.
+
+    The output grid spans all the layers, with the resolution of the finest
+    one. Every layer is resampled on this grid by nearest bin.
+
+    Layers with very different ranges and resolutions would give a huge grid:
+    along x and y, the grid has at most ``max_bins`` bins, or as many bins as
+    the largest layer if it has more, and is coarser than the finest layer
+    when needed.
+
+    Returns
+    -------
+    tuple[np.ndarray, np.ndarray, np.ndarray]
+        RGBA image, x edges and y edges of the output grid.
+
+    """
+    max_x, max_y = max_bins or (0, 0)
+    xedges = _common_edges([xedges for _, xedges, _ in layers], max_x)
+    yedges = _common_edges([yedges for _, _, yedges in layers], max_y)
+    x_centers = 0.5 * (xedges[:-1] + xedges[1:])
+    y_centers = 0.5 * (yedges[:-1] + yedges[1:])
+
+    out = np.zeros((len(y_centers), len(x_centers), 4))
+    for rgba, layer_xedges, layer_yedges in layers:
+        resampled = _resample(
+            rgba, layer_xedges, layer_yedges, x_centers, y_centers
+        )
+        alpha = resampled[..., 3:]
+        out[..., :3] = resampled[..., :3] * alpha + out[..., :3] * (
+            1.0 - alpha
+        )
+        out[..., 3:] = alpha + out[..., 3:] * (1.0 - alpha)
+    return out, xedges, yedges
+
+
+def _as_norm(
+    norm: Normalize | str | None, vmin: float | None, vmax: float | None
+) -> Normalize:
+    """Convert ``norm`` to a fresh :class:`.Normalize` instance."""
+    if norm is None or norm == "linear":
+        return Normalize(vmin=vmin, vmax=vmax)
+    if norm == "log":
+        return LogNorm(vmin=vmin, vmax=vmax)
+    if isinstance(norm, Normalize):
+        if vmin is not None or vmax is not None:
+            norm.vmin, norm.vmax = vmin, vmax
+        return norm
+    raise ValueError(f"{norm = } not supported by raster rendering.")
+
+
+def _common_edges(all_edges: list[np.ndarray], max_bins: int) -> np.ndarray:
+    """Give uniform edges spanning all ``all_edges``, at finest resolution.
+
+    There are at most ``max_bins`` bins, or as many as the largest edges if
+    they have more.
+
+    """
+    low = min(edges[0] for edges in all_edges)
+    high = max(edges[-1] for edges in all_edges)
+    width = min(
+        (edges[-1] - edges[0]) / (len(edges) - 1) for edges in all_edges
+    )
+    n_bins = max(1, int(np.ceil((high - low) / width - 1e-9)))
+    n_bins = min(n_bins, max(max_bins, *(len(e) - 1 for e in all_edges)))
+    return np.linspace(low, high, n_bins + 1)
+
+
+def _resample(
+    rgba: np.ndarray,
+    xedges: np.ndarray,
+    yedges: np.ndarray,
+    x_centers: np.ndarray,
+    y_centers: np.ndarray,
+) -> np.ndarray:
+    """Sample ``rgba`` at the given centers; transparent outside of it."""
+    ix = _nearest_bin(x_centers, xedges)
+    iy = _nearest_bin(y_centers, yedges)
+    out = np.zeros((len(y_centers), len(x_centers), 4))
+    inside_x = ix >= 0
+    inside_y = iy >= 0
+    out[np.ix_(inside_y, inside_x)] = rgba[np.ix_(iy[inside_y], ix[inside_x])]
+    return out
+
+
+def _nearest_bin(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Give the index of the bin holding every value, -1 if outside."""
+    n_bins = len(edges) - 1
+    indices = np.floor(
+        (values - edges[0]) * (n_bins / (edges[-1] - edges[0]))
+    ).astype(np.intp)
+    indices[(indices < 0) | (indices >= n_bins)] = -1
+    return indices
@@ -0,0 +1,355 @@
+"""Define an in-memory memoization of particles and histograms.
+
+In an interactive session, the same file is often plotted several times with
+different settings. Loaded columns are kept in memory, keyed by file, and the
+raw particle counts of every projection are kept, keyed by file, columns,
+number of bins and range. Hence:
+
+- changing plot limits (without ``range="as_plot_limits"``) or colors does not
+  recompute anything;
+- changing the settings of a single projection only recomputes this one.
+
+Beam statistics of phase-space planes are memoized too.
+
+Everything is held in a least recently used memo with a memory budget.
+Pyramids of histograms, used to zoom into distributions, are built one
+projection at a time when asked, and held in a memo of their own.
+
+"""
+
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+from dst_util.binning import bin_all_projections, projection_ranges
+from dst_util.bunch import read_bunch
+from dst_util.compute import (
+    Histogram,
+    _attach_statistics,
+    _to_acceptances,
+    _to_distributions,
+)
+from dst_util.dst_helper import needed_columns
+from dst_util.pyramid import DEFAULT_MAX_BINS, HistogramPyramid, build_pyramids
+from dst_util.statistics import BeamStatistics, phase_space_planes
+
+if TYPE_CHECKING:
+    from dst_util.cache import ParticleCache
+    from dst_util.progress import Progress
+
+#: Default memory budget of a session, in bytes.
+DEFAULT_SESSION_BYTES = 2 * 1024**3
+#: Default memory budget of the pyramids of a session, in bytes.
+DEFAULT_PYRAMID_BYTES = 2 * 1024**3
+
+
+class LRUMemo:
+    """Hold values up to a total size; least recently used go first."""
+
+    def __init__(self, max_bytes: int = DEFAULT_SESSION_BYTES) -> None:
+        """Create an empty memo of ``max_bytes`` bytes."""
+        self.max_bytes = max_bytes
+        self._values: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Tell if ``key`` is stored, without marking it as used."""
+        with self._lock:
+            return key in self._values
+
+    def __len__(self) -> int:
+        """Give the number of stored values."""
+        return len(self._values)
+
+    @property
+    def nbytes(self) -> int:
+        """Give the total size of the stored values."""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._values.values())
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Give the value of ``key`` and mark it as recently used."""
+        with self._lock:
+            if key not in self._values:
+                return default
+            self._values.move_to_end(key)
+            return self._values[key][0]
+
+    def put(self, key: Hashable, value: Any, nbytes: int) -> None:
+        """Store ``value``, evicting old values to respect the budget.
+
+        Values larger than the budget are not stored.
+
+        """
+        with self._lock:
+            self._values.pop(key, None)
+            if nbytes > self.max_bytes:
+                return
+            self._values[key] = (value, nbytes)
+            total = sum(size for _, size in self._values.values())
+            while total > self.max_bytes:
+                _, (_, evicted) = self._values.popitem(last=False)
+                total -= evicted
+
+    def clear(self) -> None:
+        """Remove every value."""
+        with self._lock:
+            self._values.clear()
+
+
+class SessionCache:
+    """Memoize particles and histograms during an interactive session."""
+
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_SESSION_BYTES,
+        particle_cache: "ParticleCache | None" = None,
+        max_pyramid_bytes: int = DEFAULT_PYRAMID_BYTES,
+    ) -> None:
+        """Create an empty session.
+
+        Parameters
+        ----------
+        max_bytes :
+            Memory budget shared by particles and histograms.
+        particle_cache :
+            If provided, particles not in memory are read through this on-disk
+            cache.
+        max_pyramid_bytes :
+            Memory budget of pyramids, so that indexing a projection never
+            evicts particles nor histograms.
+
+        """
+        self.memo = LRUMemo(max_bytes)
+        self.pyramid_memo = LRUMemo(max_pyramid_bytes)
+        self.particle_cache = particle_cache
+
+    def data(
+        self,
+        filepath: Path,
+        columns: list[str],
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+    ) -> pd.DataFrame:
+        """Give the asked columns; only those not in memory are read.
+
+        Without ``particle_cache``, columns are read in a
+        :class:`.ParticleBunch`, filled in place, and their views are kept.
+
+        """
+        key = ("data", _file_key(filepath), np.dtype(dtype).str)
+        loaded: dict[str, np.ndarray] = self.memo.get(key, {})
+        missing = [col for col in columns if col not in loaded]
+        if missing:
+            if self.particle_cache is None:
+                parsed = read_bunch(
+                    filepath, missing, dtype=dtype, progress=progress
+                )
+            else:
+                parsed = self.particle_cache.read(
+                    filepath, missing, dtype=dtype, progress=progress
+                )
+            loaded = loaded | {col: np.asarray(parsed[col]) for col in missing}
+            self.memo.put(key, loaded, _nbytes(loaded.values()))
+        elif progress is not None:
+            progress.update("Reading", 1.0)
+        return pd.DataFrame({col: loaded[col] for col in columns}, copy=False)
+
+    def distributions(
+        self,
+        filepath: Path,
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        bins: int,
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+        workers: int = 1,
+        statistics: bool = True,
+    ) -> list[Histogram]:
+        """Compute distributions, as :func:`.compute_distributions_from_file`.
+
+        Only the projections that are not in memory are computed. With
+        ``statistics``, the beam statistics of phase-space planes are stored in
+        the ``"statistics"`` metadata of their histogram.
+
+        """
+        raw = self._raw_histograms(
+            filepath, plot_single_kwargs, bins, dtype, progress, workers
+        )
+        hist_data = _to_distributions(
+            raw, plot_single_kwargs, {"source": str(filepath)}
+        )
+        if statistics:
+            _attach_statistics(
+                hist_data,
+                self.statistics(
+                    filepath, phase_space_planes(plot_single_kwargs), dtype
+                ),
+            )
+        return hist_data
+
+    def acceptances(
+        self,
+        filepath: Path,
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        bins: int,
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+        workers: int = 1,
+    ) -> list[Histogram]:
+        """Compute acceptances, as :func:`.compute_acceptances_from_file`.
+
+        Only the projections that are not in memory are computed.
+
+        """
+        raw = self._raw_histograms(
+            filepath, plot_single_kwargs, bins, dtype, progress, workers
+        )
+        return _to_acceptances(
+            raw, plot_single_kwargs, {"source": str(filepath)}
+        )
+
+    def statistics(
+        self,
+        filepath: Path,
+        planes: list[tuple[str, str]],
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+    ) -> BeamStatistics:
+        """Give the beam statistics of ``planes``, see :mod:`.statistics`.
+
+        They do not depend on the binning; only the planes that are not in
+        memory are computed.
+
+        """
+        file_key = _file_key(filepath)
+        dtype_key = np.dtype(dtype).str
+        beam = BeamStatistics(planes)
+        keys = {
+            plane: ("statistics", file_key, dtype_key, plane)
+            for plane in beam.planes
+        }
+        found = {plane: self.memo.get(key) for plane, key in keys.items()}
+        missing = BeamStatistics(
+            plane for plane, moments in found.items() if moments is None
+        )
+        if missing.planes:
+            missing.add(self.data(filepath, missing.columns, dtype, progress))
+            for plane, moments in missing.planes.items():
+                self.memo.put(keys[plane], moments, moments.m.nbytes)
+                found[plane] = moments
+        beam.planes = found
+        return beam
+
+    def pyramid(
+        self,
+        filepath: Path,
+        columns: tuple[str, str],
+        kwargs: dict[str, Any],
+        max_bins: int = DEFAULT_MAX_BINS,
+        dtype: np.dtype | type = np.float64,
+        progress: "Progress | None" = None,
+    ) -> HistogramPyramid:
+        """Give the pyramid of a single projection, see :mod:`.pyramid`.
+
+        A pyramid holds a sorted copy of its two columns; it is hence only
+        built when asked, and kept within its own memory budget.
+
+        """
+        (range_key,) = _range_keys({columns: kwargs})
+        key = (
+            "pyramid",
+            _file_key(filepath),
+            np.dtype(dtype).str,
+            columns,
+            max_bins,
+            range_key,
+        )
+        pyramid = self.pyramid_memo.get(key)
+        if pyramid is not None:
+            if progress is not None:
+                progress.update("Indexing", 1.0)
+            return pyramid
+        data = self.data(filepath, list(columns), dtype, progress)
+        (pyramid,) = build_pyramids(
+            data, {columns: kwargs}, max_bins, progress=progress
+        )
+        self.pyramid_memo.put(key, pyramid, pyramid.nbytes)
+        return pyramid
+
+    def _raw_histograms(
+        self,
+        filepath: Path,
+        plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+        bins: int,
+        dtype: np.dtype | type,
+        progress: "Progress | None",
+        workers: int = 1,
+    ) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Give particle counts, computing only the missing projections.
+
+        Returned counts are copies, that callers may modify.
+
+        """
+        file_key = _file_key(filepath)
+        dtype_key = np.dtype(dtype).str
+        keys = {
+            columns: ("hist", file_key, dtype_key, columns, bins, range_key)
+            for columns, range_key in zip(
+                plot_single_kwargs, _range_keys(plot_single_kwargs)
+            )
+        }
+        found = {columns: self.memo.get(key) for columns, key in keys.items()}
+        missing = {
+            columns: kwargs
+            for columns, kwargs in plot_single_kwargs.items()
+            if found[columns] is None
+        }
+        if missing:
+            data = self.data(
+                filepath, needed_columns(missing), dtype, progress
+            )
+            computed = bin_all_projections(
+                data, missing, bins, progress, workers=workers
+            )
+            for columns, hist in zip(missing, computed):
+                self.memo.put(keys[columns], hist, _nbytes(hist))
+                found[columns] = hist
+        elif progress is not None:
+            progress.update("Binning", 1.0)
+
+        return [
+            (h.copy(), xedges, yedges)
+            for h, xedges, yedges in (
+                found[columns] for columns in plot_single_kwargs
+            )
+        ]
+
+
+def _file_key(filepath: Path) -> tuple[str, int, int]:
+    """Identify a file and its version."""
+    stat = filepath.stat()
+    return str(filepath.resolve()), stat.st_size, stat.st_mtime_ns
+
+
+def _range_keys(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> list[tuple[float, ...] | str | None]:
+    """Convert the range of every projection to a hashable key."""
+    return [
+        (
+            range_
+            if range_ is None or isinstance(range_, str)
+            else tuple(float(v) for r in range_ for v in r)
+        )
+        for range_ in projection_ranges(plot_single_kwargs)
+    ]
+
+
+def _nbytes(arrays: Any) -> int:
+    """Give the total size of some arrays."""
+    return sum(np.asarray(array).nbytes for array in arrays)
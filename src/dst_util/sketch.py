@@ -0,0 +1,121 @@
+"""Define a mergeable sketch of the quantiles of a stream of values.
+
+Values are kept in levels; an item of level ``h`` stands for ``2**h`` values.
+When a level holds more than ``capacity`` items, they are sorted and one item
+in every ``2**j`` is promoted to level ``h + j``, starting at a random offset.
+This is the compactor of the KLL and MRL sketches, applied to whole chunks at
+once: sorting a chunk of one million values and keeping one in 256 costs a
+single sort, and adds a rank error of at most 256 values.
+
+Memory is a few ``capacity`` items per level, and the number of levels grows
+with the logarithm of the number of values. Two sketches are merged by
+merging their levels, so that chunks, or files, can be sketched separately.
+
+"""
+
+import numpy as np
+
+#: Default maximum number of items per level.
+DEFAULT_CAPACITY = 4096
+
+
+class QuantileSketch:
+    """Approximate the quantiles of a stream of values, in bounded memory."""
+
+    def __init__(
+        self, capacity: int = DEFAULT_CAPACITY, seed: int | None = 0
+    ) -> None:
+        """Create an empty sketch.
+
+        Parameters
+        ----------
+        capacity :
+            Maximum number of items per level. The rank error is of the order
+            of ``n / capacity`` values in the worst case, and usually much
+            lower.
+        seed :
+            Seed of the offsets of compactions, for reproducible results.
+
+        """
+        self.capacity = capacity
+        self.n = 0
+        #: Items of every level; those of level ``h`` weigh ``2**h``
+        self.levels: list[np.ndarray] = []
+        #: Upper bound of the rank error, in number of values
+        self.error = 0
+        self._rng = np.random.default_rng(seed)
+
+    def add(self, values: np.ndarray) -> None:
+        """Add values; NaN and infinite values are skipped."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if not values.size:
+            return
+        self.n += values.size
+        self._insert(0, values)
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Add the values of ``other``, without going back to them."""
+        for level, items in enumerate(other.levels):
+            self._insert(level, items)
+        self.n += other.n
+        self.error += other.error
+        self._compress()
+
+    @property
+    def rank_error(self) -> float:
+        """Give the upper bound of the rank error, as a fraction of ``n``."""
+        return self.error / self.n if self.n else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Give the memory held by the items."""
+        return sum(items.nbytes for items in self.levels)
+
+    def quantiles(self, q: np.ndarray | list[float]) -> np.ndarray:
+        """Give the values below which lie the fractions ``q`` of values."""
+        q = np.asarray(q, dtype=np.float64)
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [
+                np.full(len(level_items), 2**level, dtype=np.int64)
+                for level, level_items in enumerate(self.levels)
+            ]
+        )
+        order = np.argsort(items, kind="stable")
+        ranks = np.cumsum(weights[order])
+        found = np.searchsorted(ranks, q * self.n, side="left")
+        return items[order][np.clip(found, 0, len(items) - 1)]
+
+    def _insert(self, level: int, items: np.ndarray) -> None:
+        """Append ``items`` to ``level``, creating it if needed."""
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        if len(self.levels[level]):
+            items = np.concatenate((self.levels[level], items))
+        self.levels[level] = items
+
+    def _compress(self) -> None:
+        """Promote items of every level holding more than ``capacity``."""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self.capacity:
+                # Levels above 0 are sorted runs, merged by timsort
+                items = np.sort(items, kind="stable" if level else None)
+                # Promote by as many levels as needed to fit in capacity
+                jump = max(
+                    1, int(np.ceil(np.log2(len(items) / self.capacity)))
+                )
+                stride = 2**jump
+                n_promoted = len(items) // stride * stride
+                offset = self._rng.integers(stride)
+                self._insert(
+                    level + jump, items[offset:n_promoted:stride].copy()
+                )
+                self.levels[level] = items[n_promoted:].copy()
+                self.error += stride * 2**level
+            level += 1
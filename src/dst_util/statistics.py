@@ -0,0 +1,221 @@
+"""Define beam statistics computed in the same pass as the histograms.
+
+For every phase-space plane, central moments up to the fourth order are
+computed on every chunk of particles, and merged with the moments of the
+previous chunks: moments around the mean of each chunk are shifted to the
+common mean, as in the pairwise algorithm of Chan, Golub and LeVeque
+generalized by Pébay. Unlike sums of powers, this is numerically stable, and
+the result does not depend on the chunking.
+
+Derived quantities are the centroids, RMS sizes, RMS emittance, Twiss
+parameters, the two-dimensional halo parameter of Allen and Wangler and the
+profile parameters of every axis. Both halo parameters are 0 for a KV beam and
+1 for a Gaussian beam.
+
+"""
+
+from collections.abc import Iterable
+from math import comb
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+#: Planes for which statistics are computed, when they are plotted.
+PHASE_SPACE_PLANES = (
+    ("x(mm)", "x'(mrad)"),
+    ("y(mm)", "y'(mrad)"),
+    ("Phase(deg)", "Energy(MeV)"),
+)
+#: Highest order of the moments.
+MAX_ORDER = 4
+#: Number of particles which moments are computed at once; the powers of a
+#: slice are held in memory, those of the whole bunch would not fit.
+SLICE_SIZE = 1 << 20
+#: Orders ``(p, q)`` of every stored comoment, ``p + q <= MAX_ORDER``.
+_ORDERS = [
+    (p, q) for p in range(MAX_ORDER + 1) for q in range(MAX_ORDER + 1 - p)
+]
+
+
+class PlaneMoments:
+    """Accumulate the central moments of a two-dimensional distribution."""
+
+    def __init__(self) -> None:
+        """Create moments of an empty distribution."""
+        self.n = 0
+        self.mean = np.zeros(2)
+        #: ``m[p, q]`` is the sum of ``(x - mean_x)**p * (y - mean_y)**q``
+        self.m = np.zeros((MAX_ORDER + 1, MAX_ORDER + 1))
+
+    def add(self, x: np.ndarray, y: np.ndarray) -> None:
+        """Add particles; those with a non-finite coordinate are skipped.
+
+        Particles are added by slices of :data:`SLICE_SIZE`, which moments
+        are merged, so that memory does not grow with the number of particles.
+
+        """
+        x, y = np.asarray(x), np.asarray(y)
+        for start in range(0, len(x), SLICE_SIZE):
+            self._add_slice(
+                x[start : start + SLICE_SIZE], y[start : start + SLICE_SIZE]
+            )
+
+    def _add_slice(self, x: np.ndarray, y: np.ndarray) -> None:
+        """Add particles, computing all their powers at once."""
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.all():
+            x, y = x[finite], y[finite]
+        if not len(x):
+            return
+
+        chunk = PlaneMoments()
+        chunk.n = len(x)
+        chunk.mean = np.array([x.mean(), y.mean()])
+        powers_x = _powers(x - chunk.mean[0])
+        powers_y = _powers(y - chunk.mean[1])
+        # First order central moments are zero
+        chunk.m[0, 0] = chunk.n
+        for p, q in _ORDERS:
+            if p + q < 2:
+                continue
+            if p == 0:
+                chunk.m[p, q] = powers_y[q].sum()
+            elif q == 0:
+                chunk.m[p, q] = powers_x[p].sum()
+            else:
+                chunk.m[p, q] = np.dot(powers_x[p], powers_y[q])
+        self.merge(chunk)
+
+    def merge(self, other: "PlaneMoments") -> None:
+        """Add the particles of ``other``, without going back to them."""
+        if other.n == 0:
+            return
+        if self.n == 0:
+            self.n, self.mean, self.m = other.n, other.mean, other.m.copy()
+            return
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        # Shift of the mean of every set to the common mean
+        shifts = ((self, -other.n / n * delta), (other, self.n / n * delta))
+        merged = np.zeros_like(self.m)
+        for p, q in _ORDERS:
+            for moments, (shift_x, shift_y) in shifts:
+                merged[p, q] += sum(
+                    comb(p, i)
+                    * comb(q, j)
+                    * moments.m[i, j]
+                    * shift_x ** (p - i)
+                    * shift_y ** (q - j)
+                    for i in range(p + 1)
+                    for j in range(q + 1)
+                )
+        self.mean = self.mean + other.n / n * delta
+        self.m = merged
+        self.n = n
+
+    def summary(self) -> dict[str, float]:
+        """Give centroids, RMS sizes, emittance, Twiss and halo parameters.
+
+        Emittance is in the product of the units of the two columns, e.g.
+        mm.mrad or deg.MeV; ``beta`` is in their ratio.
+
+        """
+        if self.n == 0:
+            return {"n_particles": 0}
+        c = self.m / self.n
+        x2, y2, xy = c[2, 0], c[0, 2], c[1, 1]
+        emittance2 = x2 * y2 - xy**2
+        invariant4 = (
+            c[4, 0] * c[0, 4] + 3.0 * c[2, 2] ** 2 - 4.0 * c[1, 3] * c[3, 1]
+        )
+        # Degenerate distributions, e.g. a single particle, give NaN
+        with np.errstate(divide="ignore", invalid="ignore"):
+            emittance = np.sqrt(emittance2)
+            return {
+                "n_particles": self.n,
+                "mean_x": float(self.mean[0]),
+                "mean_y": float(self.mean[1]),
+                "rms_x": float(np.sqrt(x2)),
+                "rms_y": float(np.sqrt(y2)),
+                "emittance_rms": float(emittance),
+                "alpha": float(-xy / emittance),
+                "beta": float(x2 / emittance),
+                "gamma": float(y2 / emittance),
+                "halo": float(
+                    np.sqrt(3.0) / 2.0 * np.sqrt(invariant4) / emittance2 - 2.0
+                ),
+                "profile_halo_x": float(c[4, 0] / x2**2 - 2.0),
+                "profile_halo_y": float(c[0, 4] / y2**2 - 2.0),
+            }
+
+
+class BeamStatistics:
+    """Accumulate the moments of several planes, chunk after chunk."""
+
+    def __init__(self, planes: Iterable[tuple[str, str]]) -> None:
+        """Create empty moments for every plane."""
+        self.planes = {tuple(plane): PlaneMoments() for plane in planes}
+
+    @property
+    def columns(self) -> list[str]:
+        """Give the columns needed to compute the statistics."""
+        return list(
+            dict.fromkeys(col for plane in self.planes for col in plane)
+        )
+
+    def add(self, data: Any) -> None:
+        """Add particles; ``data`` gives an array for every column name."""
+        for (x_col, y_col), moments in self.planes.items():
+            moments.add(data[x_col], data[y_col])
+
+    def summaries(self) -> dict[tuple[str, str], dict[str, float]]:
+        """Give the statistics of every plane."""
+        return {
+            plane: moments.summary() for plane, moments in self.planes.items()
+        }
+
+
+def phase_space_planes(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+) -> list[tuple[str, str]]:
+    """Give the phase-space planes among the plotted projections."""
+    return [
+        plane for plane in PHASE_SPACE_PLANES if plane in plot_single_kwargs
+    ]
+
+
+def format_statistics(statistics: dict[str, float]) -> str:
+    """Give a short description of the statistics, for plot titles."""
+    if not statistics.get("n_particles"):
+        return "no particle"
+    return (
+        rf"$\epsilon_{{rms}}$ = {statistics['emittance_rms']:.3g}, "
+        rf"$\alpha$ = {statistics['alpha']:.3g}, "
+        rf"$\beta$ = {statistics['beta']:.3g}, "
+        f"H = {statistics['halo']:.2f}"
+    )
+
+
+def save_statistics(
+    all_statistics: dict[tuple[str, str], dict[str, float]],
+    filepath: Path,
+) -> None:
+    """Save the statistics of every plane, one line per plane."""
+    rows = [
+        {"plane": "_".join(plane).replace(" ", "_")} | statistics
+        for plane, statistics in all_statistics.items()
+    ]
+    pd.DataFrame(rows).to_csv(filepath, sep=" ", index=False, na_rep="nan")
+    print(f"Saved statistics in {filepath = }")
+
+
+def _powers(values: np.ndarray) -> list[np.ndarray | None]:
+    """Give ``values`` to the powers 0 (not computed) to :data:`MAX_ORDER`."""
+    powers: list[np.ndarray | None] = [None, values]
+    for _ in range(2, MAX_ORDER + 1):
+        powers.append(powers[-1] * values)
+    return powers
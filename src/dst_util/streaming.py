@@ -0,0 +1,222 @@
+"""Define histogram accumulation for files that do not fit in memory.
+
+The particle file is read by chunks of fixed size, and every chunk is added
+to preallocated histograms. Peak memory hence depends on the size of the
+chunks and of the histograms, but not on the number of particles.
+
+The histograms are exactly the same as the ones computed on the full data:
+bin edges are computed beforehand, and counts are integers.
+
+"""
+
+import queue
+import threading
+from collections.abc import Collection, Iterable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TypeVar
+
+import numpy as np
+
+from dst_util.autorange import (
+    DEFAULT_MARGIN,
+    DEFAULT_QUANTILE,
+    DEFAULT_SAMPLE_SIZE,
+    limits_from_quantiles,
+    sample,
+)
+from dst_util.binning import (
+    columns_with_auto_range,
+    columns_without_range,
+    histogram_projections,
+    projection_edges,
+)
+from dst_util.dst_helper import (
+    estimate_n_particles,
+    iter_chunks,
+    needed_columns,
+)
+
+if TYPE_CHECKING:
+    from dst_util.progress import Progress
+    from dst_util.statistics import BeamStatistics
+
+#: Default number of particles read at once.
+DEFAULT_CHUNKSIZE = 10**6
+
+T = TypeVar("T")
+
+
+def accumulate_counts(
+    filepath: Path,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    bins: int,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    dtype: np.dtype | type = np.float64,
+    progress: "Progress | None" = None,
+    statistics: "BeamStatistics | None" = None,
+    workers: int = 1,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """Count particles of every projection, one chunk at a time.
+
+    Output is the same as :func:`.bin_all_projections` on the full data.
+    When the range of a projection is not given, or is ``"auto"``, an
+    additional pass over the file determines the extrema or the automatic
+    range of the concerned columns. Automatic ranges are estimated on other
+    particles than in memory, and may hence slightly differ. If ``progress`` is
+    provided, advancement is reported after every chunk. If ``statistics`` is
+    provided, every chunk is also added to it; its planes must be among the
+    projections. ``workers`` threads bin every chunk.
+
+    """
+    columns = needed_columns(plot_single_kwargs)
+    n_particles = max(1, estimate_n_particles(filepath))
+    limits, auto_limits = _column_limits(
+        filepath,
+        columns_without_range(plot_single_kwargs),
+        chunksize,
+        dtype,
+        progress,
+        n_particles,
+        auto_columns=columns_with_auto_range(plot_single_kwargs),
+    )
+    all_edges = projection_edges(plot_single_kwargs, bins, limits, auto_limits)
+    projections = list(zip(plot_single_kwargs, all_edges))
+
+    all_h = [np.zeros((bins, bins), dtype=np.int64) for _ in all_edges]
+    n_read = 0
+    for chunk in iter_chunks(filepath, columns, chunksize, dtype=dtype):
+        for h, chunk_h in zip(
+            all_h, histogram_projections(chunk, projections, workers=workers)
+        ):
+            h += chunk_h.astype(np.int64)
+        if statistics is not None:
+            statistics.add(chunk)
+        n_read += len(chunk)
+        if progress is not None:
+            progress.update("Binning", n_read / n_particles)
+
+    return [
+        (h.astype(np.float64), xedges, yedges)
+        for h, (xedges, yedges) in zip(all_h, all_edges)
+    ]
+
+
+def prefetch(items: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """Produce ``items`` in a background thread, ``depth`` items ahead.
+
+    Reading the next chunk hence overlaps with processing the current one,
+    while at most ``depth + 1`` chunks are held. Errors of the producer are
+    raised in the consumer; the producer stops if the consumer does.
+
+    """
+    ready: queue.Queue = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+    end = object()
+
+    def _put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce() -> None:
+        try:
+            for item in items:
+                if not _put(item):
+                    return
+        except BaseException as e:
+            _put(_Raised(e))
+            return
+        _put(end)
+
+    thread = threading.Thread(target=_produce, daemon=True)
+    thread.start()
+    try:
+        while (item := ready.get()) is not end:
+            if isinstance(item, _Raised):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class _Raised:
+    """Carry an error of the producer of :func:`prefetch`."""
+
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+def _column_limits(
+    filepath: Path,
+    columns: Collection[str],
+    chunksize: int,
+    dtype: np.dtype | type,
+    progress: "Progress | None" = None,
+    n_particles: int = 1,
+    auto_columns: Collection[str] = (),
+) -> tuple[dict[str, tuple[float, float]], dict[str, tuple[float, float]]]:
+    """Compute extrema and automatic ranges, one chunk at a time.
+
+    For the automatic range, every chunk contributes a subsample in
+    proportion to its size, so that about :data:`.DEFAULT_SAMPLE_SIZE`
+    particles are kept in total.
+
+    Returns
+    -------
+    limits : dict[str, tuple[float, float]]
+        Extrema of ``columns``.
+    auto_limits : dict[str, tuple[float, float]]
+        Automatic range of ``auto_columns``, see :mod:`.autorange`.
+
+    """
+    all_columns = list(dict.fromkeys([*columns, *auto_columns]))
+    if not all_columns:
+        return {}, {}
+    limits = {col: (np.inf, -np.inf) for col in columns}
+    # Extrema of automatic ranges ignore NaN, as quantiles do
+    finite_limits = {col: (np.inf, -np.inf) for col in auto_columns}
+    samples: dict[str, list[np.ndarray]] = {col: [] for col in auto_columns}
+    n_read = 0
+    for chunk in iter_chunks(filepath, all_columns, chunksize, dtype=dtype):
+        n_read += len(chunk)
+        if progress is not None:
+            progress.update("Computing ranges", n_read / n_particles)
+        for col in all_columns:
+            values = chunk[col].to_numpy()
+            if values.size == 0:
+                continue
+            if col in limits:
+                low, high = limits[col]
+                # np.minimum/np.maximum propagate NaN, as np.histogram2d would
+                limits[col] = (
+                    np.minimum(low, values.min()),
+                    np.maximum(high, values.max()),
+                )
+            if col in samples:
+                low, high = finite_limits[col]
+                finite_limits[col] = (
+                    np.fmin(low, np.nanmin(values)),
+                    np.fmax(high, np.nanmax(values)),
+                )
+                size = -(-DEFAULT_SAMPLE_SIZE * len(values) // n_particles)
+                values = sample(values, size, seed=n_read)
+                samples[col].append(values[np.isfinite(values)])
+
+    auto_limits = {}
+    for col, col_samples in samples.items():
+        values = np.concatenate(col_samples) if col_samples else np.empty(0)
+        if not values.size:
+            auto_limits[col] = (np.nan, np.nan)
+            continue
+        low, high = np.quantile(
+            values, [DEFAULT_QUANTILE, 1.0 - DEFAULT_QUANTILE]
+        )
+        auto_limits[col] = limits_from_quantiles(
+            low, high, *finite_limits[col], DEFAULT_MARGIN
+        )
+    return limits, auto_limits
@@ -0,0 +1,188 @@
+"""Generate synthetic particle files, to test and benchmark the library.
+
+Particles follow a Gaussian core, correlated in every phase space, with a
+Gaussian halo of larger extent. Default parameters give distributions that
+fit in the default limits of :func:`.plot_distribution`.
+
+Files are written by chunks, so that files of 1e8 particles can be created
+without holding all particles in memory. Both formats understood by
+:func:`.read` can be written: ASCII ``.txt`` and binary ``.dst`` files.
+
+"""
+
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from dst_util.dst_helper import (
+    DST_HEADER_CHARS,
+    DST_HEADER_DTYPE,
+    DST_PARTICLE_DTYPE,
+    DST_TO_ASCII_COLUMNS,
+    DST_TRAILER_DTYPE,
+    is_binary,
+)
+
+#: Mean and RMS size of the core, for every column of the ASCII files.
+CORE = {
+    "x(mm)": (0.0, 4.0),
+    "x'(mrad)": (0.0, 3.0),
+    "y(mm)": (0.0, 4.0),
+    "y'(mrad)": (0.0, 3.0),
+    "Phase(deg)": (0.0, 2.0),
+    "Energy(MeV)": (99.2, 0.15),
+}
+#: Rest mass of a proton, in MeV, written at the end of ``.dst`` files.
+PROTON_MC2 = 938.272088
+#: Correlation between position and angle, and between phase and energy.
+CORRELATIONS = {
+    ("x(mm)", "x'(mrad)"): -0.5,
+    ("y(mm)", "y'(mrad)"): 0.3,
+    ("Phase(deg)", "Energy(MeV)"): -0.6,
+}
+
+
+def iter_particle_chunks(
+    n_particles: int,
+    chunksize: int = 10**6,
+    halo_fraction: float = 0.01,
+    halo_factor: float = 4.0,
+    seed: int | None = None,
+) -> Iterator[pd.DataFrame]:
+    """Generate particles by chunks of ``chunksize``.
+
+    Parameters
+    ----------
+    n_particles :
+        Total number of particles.
+    chunksize :
+        Maximum number of particles per chunk.
+    halo_fraction :
+        Fraction of particles in the halo.
+    halo_factor :
+        Ratio between the RMS sizes of the halo and of the core.
+    seed :
+        Seed of the random generator, for reproducible files.
+
+    """
+    rng = np.random.default_rng(seed)
+    for start in range(0, n_particles, chunksize):
+        n_chunk = min(chunksize, n_particles - start)
+        scale = np.where(rng.random(n_chunk) < halo_fraction, halo_factor, 1)
+        columns = {}
+        for (x_col, y_col), rho in CORRELATIONS.items():
+            u = rng.standard_normal(n_chunk)
+            v = rho * u + np.sqrt(1.0 - rho**2) * rng.standard_normal(n_chunk)
+            for col, normal in ((x_col, u), (y_col, v)):
+                mean, rms = CORE[col]
+                columns[col] = mean + rms * scale * normal
+        yield pd.DataFrame({col: columns[col] for col in CORE}, copy=False)
+
+
+def generate_particles(
+    n_particles: int,
+    halo_fraction: float = 0.01,
+    halo_factor: float = 4.0,
+    seed: int | None = None,
+) -> pd.DataFrame:
+    """Generate particles, with the columns of the ASCII files."""
+    chunks = iter_particle_chunks(
+        n_particles,
+        max(n_particles, 1),
+        halo_fraction=halo_fraction,
+        halo_factor=halo_factor,
+        seed=seed,
+    )
+    return next(chunks, pd.DataFrame({col: np.empty(0) for col in CORE}))
+
+
+def write_particles(
+    filepath: Path,
+    n_particles: int,
+    chunksize: int = 10**6,
+    halo_fraction: float = 0.01,
+    halo_factor: float = 4.0,
+    seed: int | None = None,
+    i_beam: float = 5.0,
+    freq: float = 352.2,
+    mc2: float = PROTON_MC2,
+) -> Path:
+    """Write a synthetic ``.txt`` or ``.dst`` particle file.
+
+    Parameters
+    ----------
+    filepath :
+        Output file; its suffix sets the format.
+    n_particles :
+        Number of particles.
+    chunksize :
+        Number of particles generated and written at once.
+    halo_fraction, halo_factor, seed :
+        Passed to :func:`iter_particle_chunks`.
+    i_beam, freq :
+        Beam current in mA and frequency in MHz, written in the header.
+    mc2 :
+        Rest mass of the particles in MeV, written at the end of ``.dst``
+        files.
+
+    """
+    chunks = iter_particle_chunks(
+        n_particles,
+        chunksize,
+        halo_fraction=halo_fraction,
+        halo_factor=halo_factor,
+        seed=seed,
+    )
+    if is_binary(filepath):
+        _write_dst(filepath, chunks, n_particles, i_beam, freq, mc2)
+    else:
+        _write_ascii(filepath, chunks, n_particles, i_beam, freq)
+    print(f"Wrote {n_particles} synthetic particles in {filepath = }")
+    return filepath
+
+
+def _write_ascii(
+    filepath: Path,
+    chunks: Iterator[pd.DataFrame],
+    n_particles: int,
+    i_beam: float,
+    freq: float,
+) -> None:
+    """Write particles after two header lines and the column names."""
+    header = [
+        "Synthetic particle distribution generated by dst_util",
+        f"Np= {n_particles} Ib(mA)= {i_beam} Freq(MHz)= {freq}",
+    ]
+    with open(filepath, "w") as f:
+        f.write("\n".join(header) + "\n")
+        f.write(" ".join(CORE) + "\n")
+        # Formatting all lines at once is several times faster than to_csv
+        line = " ".join(["%.6e"] * len(CORE)) + "\n"
+        for chunk in chunks:
+            f.write(line * len(chunk) % tuple(chunk.to_numpy().ravel()))
+
+
+def _write_dst(
+    filepath: Path,
+    chunks: Iterator[pd.DataFrame],
+    n_particles: int,
+    i_beam: float,
+    freq: float,
+    mc2: float,
+) -> None:
+    """Write the binary header, particles in TraceWin units and rest mass."""
+    header = np.zeros(1, dtype=DST_HEADER_DTYPE)
+    header["dummy"] = DST_HEADER_CHARS
+    header["n_part"] = n_particles
+    header["i_beam"] = i_beam
+    header["freq"] = freq
+    with open(filepath, "wb") as f:
+        header.tofile(f)
+        for chunk in chunks:
+            records = np.empty(len(chunk), dtype=DST_PARTICLE_DTYPE)
+            for field, (column, factor) in DST_TO_ASCII_COLUMNS.items():
+                records[field] = chunk[column].to_numpy() / factor
+            records.tofile(f)
+        np.array([(mc2,)], dtype=DST_TRAILER_DTYPE).tofile(f)
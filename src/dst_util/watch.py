@@ -0,0 +1,132 @@
+"""Define the watching of files written by a running simulation.
+
+Files are polled: their size and modification time are compared with those
+of the last processed version, which costs a single ``stat`` per file and
+works on network file systems. A changed file is only processed once it was
+left untouched for ``settle`` seconds, so that files still being written by
+TraceWin are not read half-way.
+
+"""
+
+import fnmatch
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from dst_util.constants import PARTICLE_PATTERNS, PARTICLE_SUFFIXES
+
+#: Version of a file: size in bytes and modification time in ns.
+FileState = tuple[int, int]
+
+
+class Watcher:
+    """Give the watched files which changed since they were processed."""
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        settle: float = 2.0,
+        suffixes: Iterable[str] = PARTICLE_SUFFIXES,
+        patterns: Iterable[str] = PARTICLE_PATTERNS,
+    ) -> None:
+        """Set what to watch.
+
+        Parameters
+        ----------
+        paths :
+            Files, or directories which particle files are watched. Watched
+            files do not need to exist yet.
+        settle :
+            Time in seconds without modification after which a file is
+            considered complete.
+        suffixes :
+            Extensions of the files watched in directories.
+        patterns :
+            Names of the files watched in directories; other TraceWin outputs
+            share the extensions of particle files.
+
+        """
+        self.paths = [Path(path) for path in paths]
+        self.settle = settle
+        self.suffixes = tuple(suffixes)
+        self.patterns = tuple(patterns)
+        self.processed: dict[Path, FileState] = {}
+
+    def files(self) -> list[Path]:
+        """Give the watched files that currently exist."""
+        found = set()
+        for path in self.paths:
+            if path.is_dir():
+                found.update(
+                    candidate
+                    for candidate in path.iterdir()
+                    if candidate.suffix in self.suffixes
+                    and any(
+                        fnmatch.fnmatch(candidate.name, pattern)
+                        for pattern in self.patterns
+                    )
+                    and candidate.is_file()
+                )
+            elif path.is_file():
+                found.add(path)
+        return sorted(found)
+
+    def poll(self, now: float | None = None) -> list[Path]:
+        """Give the files that changed and are not written anymore.
+
+        Returned files are marked as processed: they are given again only
+        after their next modification.
+
+        """
+        if now is None:
+            now = time.time()
+        ready = []
+        for filepath in self.files():
+            try:
+                stat = filepath.stat()
+            except FileNotFoundError:
+                continue
+            state = (stat.st_size, stat.st_mtime_ns)
+            if state == self.processed.get(filepath) or not stat.st_size:
+                continue
+            if now - stat.st_mtime_ns * 1e-9 < self.settle:
+                continue
+            self.processed[filepath] = state
+            ready.append(filepath)
+        return ready
+
+    def run(
+        self,
+        callback: Callable[[list[Path]], None],
+        interval: float = 1.0,
+        max_cycles: int | None = None,
+    ) -> None:
+        """Call ``callback`` with the ready files, until interrupted.
+
+        Parameters
+        ----------
+        callback :
+            Called with the files that changed since the previous call. If it
+            raises, the error is reported and watching goes on; the files are
+            processed again after their next modification.
+        interval :
+            Time in seconds between two polls.
+        max_cycles :
+            Number of polls after which watching stops. Default is to watch
+            until ``Ctrl+C``.
+
+        """
+        print(f"Watching {[str(path) for path in self.paths]}; Ctrl+C to stop")
+        cycle = 0
+        try:
+            while max_cycles is None or cycle < max_cycles:
+                cycle += 1
+                if changed := self.poll():
+                    try:
+                        callback(changed)
+                    except Exception as e:
+                        print(f"Could not process {changed}: {e}")
+                if max_cycles is None or cycle < max_cycles:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
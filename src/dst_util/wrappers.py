@@ -1,114 +1,224 @@
-"""Define wrapper functions that call proper funcs at proper time."""
+"""Define wrapper functions that call proper funcs at proper time.
 
+matplotlib is only imported when a figure is actually asked for, so that
+histograms can be computed and saved on machines without display.
+
+"""
+
+from collections.abc import Collection, Iterable
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import matplotlib.pyplot as plt
-from matplotlib.axes import Axes
-from matplotlib.figure import Figure
+import numpy as np
 
-from dst_util.acceptance import plot_all_acceptances
-from dst_util.distribution import plot_all_distributions
+from dst_util.autorange import auto_range_kwargs, fixed_range_kwargs
+from dst_util.backend import select_backend
+from dst_util.bunch import ParticleBunch
+from dst_util.cache import ParticleCache
+from dst_util.compute import (
+    Histogram,
+    compute_acceptances,
+    compute_acceptances_from_file,
+    compute_distributions,
+    compute_distributions_from_file,
+)
+from dst_util.constants import PARTICLE_PATTERNS, HistFormat, RenderMode
 from dst_util.dst_helper import (
-    is_binary,
-    read,
     save_all_acceptances,
     save_all_distributions,
     save_figure,
 )
+from dst_util.profiling import span
+from dst_util.session import SessionCache
+from dst_util.watch import Watcher
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
+    from matplotlib.figure import Figure
 
 
 def plot_distribution(
-    filepath_density: Path,
+    filepath_density: Path | ParticleBunch,
     bins: int = 500,
     save_hist_data: bool = False,
     plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    chunksize: int | None = None,
+    figure: bool = True,
+    render: RenderMode = "mesh",
+    smooth: bool | tuple[float, float] = False,
+    auto_range: bool = False,
+    workers: int = 1,
 ) -> Any:
-    """Plot density and/or acceptance on the same figure."""
-    fig, axes = plt.subplots(nrows=2, ncols=2)
+    """Plot density and/or acceptance on the same figure.
+
+    With ``figure=False``, histograms are only computed and saved. Particles
+    already in memory can be given as a :class:`.ParticleBunch`; outputs are
+    then named after its ``filepath``. ``smooth`` is the default ``smooth``
+    setting of every projection, see :mod:`.smoothing`. With ``auto_range``,
+    the range and plot limits of every projection are estimated from the
+    particles, see :mod:`.autorange`. ``workers`` threads bin the particles.
+
+    Returns
+    -------
+    list[Histogram]
+        The computed histograms.
+
+    """
+    fig, axes = _subplots() if figure else (None, None)
 
     if plot_single_kwargs is None:
-        plot_single_kwargs = {
-            ("x(mm)", "x'(mrad)"): {
-                "xlim": (-40.0, 40.0),
-                "ylim": (-25.0, 25.0),
-            },
-            ("y(mm)", "y'(mrad)"): {
-                "xlim": (-40.0, 40.0),
-                "ylim": (-25.0, 25.0),
-            },
-            ("Phase(deg)", "Energy(MeV)"): {
-                "xlim": (-15, 15),
-                "ylim": (98, 100.5),
-                "range": "as_plot_limits",
-            },
-            ("x(mm)", "y(mm)"): {"xlim": (-40.0, 40.0), "ylim": (-40.0, 40.0)},
-        }
-    _wrapper_distrib(
+        plot_single_kwargs = _default_distribution_kwargs()
+    plot_single_kwargs = _with_smoothing(plot_single_kwargs, smooth)
+    if auto_range:
+        plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+    return _wrapper_distrib(
         filepath_density,
         plot_single_kwargs,
         fig,
         axes,
         bins=bins,
         save_hist_data=save_hist_data,
+        dtype=dtype,
+        cache=cache,
+        hist_format=hist_format,
+        chunksize=chunksize,
+        render=render,
+        workers=workers,
     )
 
 
 def _wrapper_distrib(
-    filepath: Path,
+    source: Path | ParticleBunch,
     plot_single_kwargs: dict,
-    fig: Figure,
-    axes: Axes,
+    fig: "Figure | None",
+    axes: "Axes | None",
     bins: int = 500,
     save_hist_data: bool = True,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    chunksize: int | None = None,
+    render: RenderMode = "mesh",
+    workers: int = 1,
 ) -> Any:
-    """Plot x-x', y-y', phi-W and x-y phase space distributions."""
-    if is_binary(filepath):
-        raise NotImplementedError
-    data = read(filepath)
+    """Plot x-x', y-y', phi-W and x-y phase space distributions.
 
-    hist_data = plot_all_distributions(
-        data, plot_single_kwargs, axes, bins=bins
-    )
+    If ``fig`` is None, the histograms are computed and saved, but not
+    plotted. ``source`` is a file, or particles already in memory.
 
-    save_figure(fig, filepath)
-    if save_hist_data:
-        save_all_distributions(hist_data, plot_single_kwargs.keys(), filepath)
+    """
+    filepath = _source_filepath(source)
+    with span("distributions", filepath=str(filepath), bins=bins):
+        if isinstance(source, ParticleBunch):
+            hist_data = compute_distributions(
+                source,
+                plot_single_kwargs,
+                bins,
+                {"source": str(filepath)},
+                workers=workers,
+            )
+        else:
+            hist_data = compute_distributions_from_file(
+                source,
+                plot_single_kwargs,
+                bins,
+                dtype=dtype,
+                cache=cache,
+                chunksize=chunksize,
+                workers=workers,
+            )
+        output_distributions(
+            filepath,
+            hist_data,
+            plot_single_kwargs,
+            fig,
+            axes,
+            save_hist_data=save_hist_data,
+            hist_format=hist_format,
+            render=render,
+        )
     return hist_data
 
 
+def output_distributions(
+    filepath: Path,
+    hist_data: list[Histogram],
+    plot_single_kwargs: dict,
+    fig: "Figure | None",
+    axes: "Axes | None",
+    save_hist_data: bool = True,
+    hist_format: HistFormat = "csv",
+    render: RenderMode = "mesh",
+) -> None:
+    """Plot and save distribution histograms that were already computed.
+
+    Must be called from the thread running the GUI, if any.
+
+    """
+    if fig is not None:
+        from dst_util.distribution import plot_all_distribution_histograms
+
+        with span("plot", render=render):
+            plot_all_distribution_histograms(
+                hist_data, plot_single_kwargs, axes, render=render
+            )
+        # Artists are rasterized here, not when they are created
+        with span("save_figure"):
+            save_figure(fig, filepath)
+    if save_hist_data:
+        with span("save_hist", format=hist_format):
+            save_all_distributions(
+                hist_data,
+                plot_single_kwargs.keys(),
+                filepath,
+                fmt=hist_format,
+            )
+
+
 def plot_acceptance(
-    filepath_acceptance: Path,
-    filepath_density: Path | None = None,
+    filepath_acceptance: Path | ParticleBunch,
+    filepath_density: Path | ParticleBunch | None = None,
     bins_acceptance: int = 200,
     bins_density: int = 500,
     save_hist_data: bool = False,
     plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
     invert_acceptance_colors: bool = False,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    chunksize: int | None = None,
+    figure: bool = True,
+    render: RenderMode = "mesh",
+    smooth: bool | tuple[float, float] = False,
+    auto_range: bool = False,
+    workers: int = 1,
 ) -> Any:
-    """Plot density and/or acceptance on the same figure."""
-    fig, axes = plt.subplots(nrows=2, ncols=2)
+    """Plot density and/or acceptance on the same figure.
+
+    With ``figure=False``, histograms are only computed and saved. Particles
+    already in memory can be given as :class:`.ParticleBunch` objects.
+    ``smooth`` is the default ``smooth`` setting of every projection, see
+    :mod:`.smoothing`. With ``auto_range``, the ranges are estimated on the
+    acceptance particles, and the density is binned over the same ranges.
+    ``workers`` threads bin the particles.
+
+    Returns
+    -------
+    list[Histogram]
+        The acceptance maps, followed by the density histograms if any.
+
+    """
+    fig, axes = _subplots() if figure else (None, None)
 
     if plot_single_kwargs is None:
-        plot_single_kwargs = {
-            ("x(mm)", "x'(mrad)"): {
-                "xlim": (-40.0, 40.0),
-                "ylim": (-25.0, 25.0),
-            },
-            ("y(mm)", "y'(mrad)"): {
-                "xlim": (-40.0, 40.0),
-                "ylim": (-25.0, 25.0),
-            },
-            ("Phase(deg)", "Energy(MeV)"): {
-                # "xlim": (-15, 15),
-                # "ylim": (98, 100.5),
-                "xlim": (-30, 30),
-                "ylim": (14, 19),
-                "range": "as_plot_limits",
-            },
-            ("x(mm)", "y(mm)"): {"xlim": (-40.0, 40.0), "ylim": (-40.0, 40.0)},
-        }
-    _wrapper_acceptance(
+        plot_single_kwargs = _default_acceptance_kwargs()
+    plot_single_kwargs = _with_smoothing(plot_single_kwargs, smooth)
+    if auto_range:
+        plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+    acceptance_data = _wrapper_acceptance(
         filepath_acceptance,
         plot_single_kwargs,
         fig,
@@ -116,45 +226,482 @@ def plot_acceptance(
         bins=bins_acceptance,
         save_hist_data=save_hist_data,
         invert_acceptance_colors=invert_acceptance_colors,
+        dtype=dtype,
+        cache=cache,
+        hist_format=hist_format,
+        chunksize=chunksize,
+        render=render,
+        workers=workers,
     )
     if filepath_density is None:
-        return
-    _wrapper_distrib(
+        return acceptance_data
+    if auto_range:
+        plot_single_kwargs = fixed_range_kwargs(
+            acceptance_data, plot_single_kwargs
+        )
+    hist_data = _wrapper_distrib(
         filepath_density,
         plot_single_kwargs,
         fig,
         axes,
         bins=bins_density,
         save_hist_data=save_hist_data,
+        dtype=dtype,
+        cache=cache,
+        hist_format=hist_format,
+        chunksize=chunksize,
+        render=render,
+        workers=workers,
     )
+    return acceptance_data + hist_data
 
 
 def _wrapper_acceptance(
-    filepath: Path,
+    source: Path | ParticleBunch,
     plot_single_kwargs: dict,
-    fig: Figure,
-    axes: Axes,
+    fig: "Figure | None",
+    axes: "Axes | None",
     bins: int = 500,
     save_hist_data: bool = True,
     invert_acceptance_colors: bool = False,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    chunksize: int | None = None,
+    render: RenderMode = "mesh",
+    workers: int = 1,
 ) -> Any:
-    """Plot acceptance in x-x', y-y', phi-W and x-y phase spaces."""
-    if is_binary(filepath):
-        raise NotImplementedError
+    """Plot acceptance in x-x', y-y', phi-W and x-y phase spaces.
 
-    data = read(filepath)
-    acceptance_data = plot_all_acceptances(
-        data,
+    If ``fig`` is None, the acceptance maps are computed and saved, but not
+    plotted. ``source`` is a file, or particles already in memory.
+
+    """
+    filepath = _source_filepath(source)
+    with span("acceptances", filepath=str(filepath), bins=bins):
+        if isinstance(source, ParticleBunch):
+            acceptance_data = compute_acceptances(
+                source,
+                plot_single_kwargs,
+                bins,
+                {"source": str(filepath)},
+                workers=workers,
+            )
+        else:
+            acceptance_data = compute_acceptances_from_file(
+                source,
+                plot_single_kwargs,
+                bins,
+                dtype=dtype,
+                cache=cache,
+                chunksize=chunksize,
+                workers=workers,
+            )
+        output_acceptances(
+            filepath,
+            acceptance_data,
+            plot_single_kwargs,
+            fig,
+            axes,
+            save_hist_data=save_hist_data,
+            invert_acceptance_colors=invert_acceptance_colors,
+            hist_format=hist_format,
+            render=render,
+        )
+    return acceptance_data
+
+
+def output_acceptances(
+    filepath: Path,
+    acceptance_data: list[Histogram],
+    plot_single_kwargs: dict,
+    fig: "Figure | None",
+    axes: "Axes | None",
+    save_hist_data: bool = True,
+    invert_acceptance_colors: bool = False,
+    hist_format: HistFormat = "csv",
+    render: RenderMode = "mesh",
+) -> None:
+    """Plot and save acceptance maps that were already computed.
+
+    Must be called from the thread running the GUI, if any.
+
+    """
+    if fig is not None:
+        from dst_util.acceptance import plot_all_acceptance_histograms
+
+        with span("plot", render=render):
+            plot_all_acceptance_histograms(
+                acceptance_data,
+                plot_single_kwargs,
+                axes,
+                invert_acceptance_colors=invert_acceptance_colors,
+                render=render,
+            )
+        # Artists are rasterized here, not when they are created
+        with span("save_figure"):
+            save_figure(fig, filepath)
+    if save_hist_data:
+        with span("save_hist", format=hist_format):
+            save_all_acceptances(
+                acceptance_data,
+                plot_single_kwargs.keys(),
+                filepath,
+                fmt=hist_format,
+            )
+
+
+def plot_acceptance_probability(
+    filepaths_acceptance: Iterable[Path],
+    bins: int = 200,
+    state_filepath: Path | None = None,
+    save_hist_data: bool = False,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
+    levels: Collection[float] = (0.5, 0.9, 0.99),
+    dtype: np.dtype | type = np.float64,
+    hist_format: HistFormat = "csv",
+    chunksize: int | None = None,
+    figure: bool = True,
+    render: RenderMode = "mesh",
+) -> Any:
+    """Plot the fraction of runs accepting every cell, with its contours.
+
+    Runs are accumulated one at a time by :func:`.accumulate_runs`. If
+    ``state_filepath`` is given, the state is saved after every run and an
+    interrupted accumulation is resumed. Projections without ``range`` use
+    their plot limits, so that all runs share the same edges.
+
+    """
+    from dst_util.multirun import accumulate_runs, save_all_probabilities
+
+    if plot_single_kwargs is None:
+        plot_single_kwargs = _default_acceptance_kwargs()
+    accumulator = accumulate_runs(
+        filepaths_acceptance,
         plot_single_kwargs,
-        axes,
         bins=bins,
-        invert_acceptance_colors=invert_acceptance_colors,
+        state_filepath=state_filepath,
+        dtype=dtype,
+        chunksize=chunksize,
+    )
+    probabilities = accumulator.probabilities()
+    out = state_filepath or Path(accumulator.runs[0]).with_stem(
+        "acceptance_probability"
     )
 
-    save_figure(fig, filepath)
+    if figure:
+        from dst_util.acceptance import plot_all_acceptance_probabilities
+
+        fig, axes = _subplots()
+        plot_all_acceptance_probabilities(
+            probabilities,
+            plot_single_kwargs,
+            axes,
+            levels=levels,
+            render=render,
+        )
+        fig.suptitle(f"Acceptance probability over {accumulator.n_runs} runs")
+        save_figure(fig, out)
     if save_hist_data:
-        save_all_acceptances(
-            acceptance_data, plot_single_kwargs.keys(), filepath
+        save_all_probabilities(
+            probabilities, out, fmt=hist_format, levels=levels
         )
+    return probabilities
 
-    return acceptance_data
+
+def plot_archived(
+    filepath_archive: Path,
+    run: str,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
+    invert_acceptance_colors: bool = False,
+    render: RenderMode = "mesh",
+) -> Any:
+    """Plot the histograms of a run stored in a :class:`.HistogramArchive`.
+
+    Acceptance maps are drawn first, and distributions on top of them, as in
+    :func:`plot_acceptance`. Projections missing from ``plot_single_kwargs``
+    are plotted with default settings. The figure is saved next to the
+    archive, named after the archive and the run.
+
+    Returns
+    -------
+    list[Histogram]
+        The stored histograms of the run.
+
+    """
+    from dst_util.archive import HistogramArchive
+
+    with HistogramArchive(filepath_archive) as archive:
+        if run not in archive:
+            raise KeyError(f"No {run = } in {filepath_archive}.")
+        acceptance_data = archive.histograms(run, "acceptance")
+        hist_data = archive.histograms(run, "distribution")
+
+    fig, axes = _subplots()
+    out = filepath_archive.with_stem(
+        filepath_archive.stem + "_" + Path(run).stem
+    ).with_suffix(".png")
+    if acceptance_data:
+        output_acceptances(
+            out,
+            acceptance_data,
+            _archived_kwargs(acceptance_data, plot_single_kwargs),
+            fig,
+            axes,
+            save_hist_data=False,
+            invert_acceptance_colors=invert_acceptance_colors,
+            render=render,
+        )
+    if hist_data:
+        output_distributions(
+            out,
+            hist_data,
+            _archived_kwargs(hist_data, plot_single_kwargs),
+            fig,
+            axes,
+            save_hist_data=False,
+            render=render,
+        )
+    return acceptance_data + hist_data
+
+
+def watch_distributions(
+    paths: Iterable[Path],
+    bins: int = 500,
+    save_hist_data: bool = False,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    figure: bool = True,
+    render: RenderMode = "mesh",
+    smooth: bool | tuple[float, float] = False,
+    auto_range: bool = False,
+    workers: int = 1,
+    interval: float = 1.0,
+    settle: float = 2.0,
+    max_cycles: int | None = None,
+    patterns: Iterable[str] = PARTICLE_PATTERNS,
+) -> None:
+    """Plot every watched file each time it is written, see :mod:`.watch`.
+
+    ``paths`` are files or directories. Other arguments are the same as in
+    :func:`plot_distribution`; ``interval``, ``settle``, ``max_cycles`` and
+    ``patterns`` are given to :class:`.Watcher`. Imports, particles, histograms and beam
+    statistics are kept between files, so that only the modified files are
+    read again. Outputs are the same as the ones of :func:`plot_distribution`,
+    beam statistics included.
+
+    """
+    if plot_single_kwargs is None:
+        plot_single_kwargs = _default_distribution_kwargs()
+    plot_single_kwargs = _with_smoothing(plot_single_kwargs, smooth)
+    if auto_range:
+        plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+    session = SessionCache(particle_cache=cache)
+
+    def process(changed: list[Path]) -> None:
+        for filepath in changed:
+            fig, axes = _subplots() if figure else (None, None)
+            hist_data = session.distributions(
+                filepath, plot_single_kwargs, bins, dtype, workers=workers
+            )
+            output_distributions(
+                filepath,
+                hist_data,
+                plot_single_kwargs,
+                fig,
+                axes,
+                save_hist_data=save_hist_data,
+                hist_format=hist_format,
+                render=render,
+            )
+            _close(fig)
+
+    Watcher(paths, settle=settle, patterns=patterns).run(
+        process, interval, max_cycles
+    )
+
+
+def watch_acceptance(
+    filepath_acceptance: Path,
+    filepath_density: Path | None = None,
+    bins_acceptance: int = 200,
+    bins_density: int = 500,
+    save_hist_data: bool = False,
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None = None,
+    invert_acceptance_colors: bool = False,
+    dtype: np.dtype | type = np.float64,
+    cache: ParticleCache | None = None,
+    hist_format: HistFormat = "csv",
+    figure: bool = True,
+    render: RenderMode = "mesh",
+    smooth: bool | tuple[float, float] = False,
+    auto_range: bool = False,
+    workers: int = 1,
+    interval: float = 1.0,
+    settle: float = 2.0,
+    max_cycles: int | None = None,
+) -> None:
+    """Plot acceptance and density each time one of them is written.
+
+    Arguments are the same as in :func:`plot_acceptance` and
+    :func:`watch_distributions`. The histograms of the file that did not
+    change are taken from memory.
+
+    """
+    if plot_single_kwargs is None:
+        plot_single_kwargs = _default_acceptance_kwargs()
+    plot_single_kwargs = _with_smoothing(plot_single_kwargs, smooth)
+    if auto_range:
+        plot_single_kwargs = auto_range_kwargs(plot_single_kwargs)
+    session = SessionCache(particle_cache=cache)
+    paths = [filepath_acceptance]
+    if filepath_density is not None:
+        paths.append(filepath_density)
+
+    def process(changed: list[Path]) -> None:
+        if not all(path.is_file() for path in paths):
+            return
+        fig, axes = _subplots() if figure else (None, None)
+        acceptance_data = session.acceptances(
+            filepath_acceptance,
+            plot_single_kwargs,
+            bins_acceptance,
+            dtype,
+            workers=workers,
+        )
+        output_acceptances(
+            filepath_acceptance,
+            acceptance_data,
+            plot_single_kwargs,
+            fig,
+            axes,
+            save_hist_data=save_hist_data,
+            invert_acceptance_colors=invert_acceptance_colors,
+            hist_format=hist_format,
+            render=render,
+        )
+        if filepath_density is not None:
+            density_kwargs = plot_single_kwargs
+            if auto_range:
+                density_kwargs = fixed_range_kwargs(
+                    acceptance_data, plot_single_kwargs
+                )
+            hist_data = session.distributions(
+                filepath_density,
+                density_kwargs,
+                bins_density,
+                dtype,
+                workers=workers,
+            )
+            output_distributions(
+                filepath_density,
+                hist_data,
+                density_kwargs,
+                fig,
+                axes,
+                save_hist_data=save_hist_data,
+                hist_format=hist_format,
+                render=render,
+            )
+        _close(fig)
+
+    Watcher(paths, settle=settle).run(process, interval, max_cycles)
+
+
+def _default_distribution_kwargs() -> dict[tuple[str, str], dict[str, Any]]:
+    """Give the default projections of distribution plots."""
+    return {
+        ("x(mm)", "x'(mrad)"): {
+            "xlim": (-40.0, 40.0),
+            "ylim": (-25.0, 25.0),
+        },
+        ("y(mm)", "y'(mrad)"): {
+            "xlim": (-40.0, 40.0),
+            "ylim": (-25.0, 25.0),
+        },
+        ("Phase(deg)", "Energy(MeV)"): {
+            "xlim": (-15, 15),
+            "ylim": (98, 100.5),
+            "range": "as_plot_limits",
+        },
+        ("x(mm)", "y(mm)"): {"xlim": (-40.0, 40.0), "ylim": (-40.0, 40.0)},
+    }
+
+
+def _default_acceptance_kwargs() -> dict[tuple[str, str], dict[str, Any]]:
+    """Give the default projections of acceptance plots."""
+    return {
+        ("x(mm)", "x'(mrad)"): {
+            "xlim": (-40.0, 40.0),
+            "ylim": (-25.0, 25.0),
+        },
+        ("y(mm)", "y'(mrad)"): {
+            "xlim": (-40.0, 40.0),
+            "ylim": (-25.0, 25.0),
+        },
+        ("Phase(deg)", "Energy(MeV)"): {
+            # "xlim": (-15, 15),
+            # "ylim": (98, 100.5),
+            "xlim": (-30, 30),
+            "ylim": (14, 19),
+            "range": "as_plot_limits",
+        },
+        ("x(mm)", "y(mm)"): {"xlim": (-40.0, 40.0), "ylim": (-40.0, 40.0)},
+    }
+
+
+def _with_smoothing(
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]],
+    smooth: bool | tuple[float, float],
+) -> dict[tuple[str, str], dict[str, Any]]:
+    """Smooth the projections which do not have their own setting."""
+    if smooth is False:
+        return plot_single_kwargs
+    return {
+        columns: {"smooth": smooth} | kwargs
+        for columns, kwargs in plot_single_kwargs.items()
+    }
+
+
+def _archived_kwargs(
+    hist_data: list[Histogram],
+    plot_single_kwargs: dict[tuple[str, str], dict[str, Any]] | None,
+) -> dict[tuple[str, str], dict[str, Any]]:
+    """Give the settings of every stored projection, empty if not given."""
+    plot_single_kwargs = plot_single_kwargs or {}
+    return {
+        hist.columns: plot_single_kwargs.get(hist.columns, {})
+        for hist in hist_data
+    }
+
+
+def _source_filepath(source: Path | ParticleBunch) -> Path:
+    """Give the file after which outputs are named."""
+    if not isinstance(source, ParticleBunch):
+        return source
+    if source.filepath is None:
+        raise ValueError(
+            "Set the filepath of the ParticleBunch, so that outputs can be "
+            "named after it."
+        )
+    return source.filepath
+
+
+def _close(fig: "Figure | None") -> None:
+    """Release a figure created by :func:`_subplots`."""
+    if fig is None:
+        return
+    import matplotlib.pyplot as plt
+
+    plt.close(fig)
+
+
+def _subplots() -> tuple["Figure", Any]:
+    """Create the 2 by 2 figure holding all projections."""
+    with span("create figure"):
+        select_backend()
+        import matplotlib.pyplot as plt
+
+        return plt.subplots(nrows=2, ncols=2)
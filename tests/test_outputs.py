@@ -0,0 +1,169 @@
+"""Check that optimized paths give the same outputs as the reference ones."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dst_util.binning import bin_all_projections
+from dst_util.compute import compute_distributions
+from dst_util.dst_helper import (
+    DST_HEADER_CHARS,
+    DST_TRAILER_DTYPE,
+    _save_single_hist,
+    memmap_dst,
+    read,
+)
+from dst_util.streaming import accumulate_counts
+from dst_util.synthetic import (
+    PROTON_MC2,
+    iter_particle_chunks,
+    write_particles,
+)
+
+PLANES = [("x(mm)", "x'(mrad)"), ("Phase(deg)", "Energy(MeV)")]
+RANGES = {
+    ("x(mm)", "x'(mrad)"): ((-10.0, 10.0), (-8.0, 8.0)),
+    ("Phase(deg)", "Energy(MeV)"): ((-5.0, 5.0), (98.8, 99.6)),
+}
+
+
+@pytest.fixture
+def particles() -> pd.DataFrame:
+    """Give particles, with NaN and values on the edges of :data:`RANGES`."""
+    data = next(iter_particle_chunks(20_000, seed=0))
+    data.loc[:9, "x(mm)"] = 10.0
+    data.loc[10:19, "x'(mrad)"] = -8.0
+    data.loc[20:29, "Energy(MeV)"] = 99.6
+    data.loc[30:39, "Phase(deg)"] = np.nan
+    data.loc[40:49, "x(mm)"] = np.nan
+    return data
+
+
+def _reference(data, plot_single_kwargs, bins):
+    """Bin every projection with :func:`np.histogram2d`."""
+    return [
+        np.histogram2d(
+            data[x_col], data[y_col], bins=bins, range=kwargs.get("range")
+        )
+        for (x_col, y_col), kwargs in plot_single_kwargs.items()
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_binning_with_range(particles, workers):
+    """Right edges are included, NaN are skipped, as by histogram2d."""
+    kwargs = {plane: {"range": RANGES[plane]} for plane in PLANES}
+    raw = bin_all_projections(particles, kwargs, 50, workers=workers)
+    for (h, xedges, yedges), (h_ref, xedges_ref, yedges_ref) in zip(
+        raw, _reference(particles, kwargs, 50), strict=True
+    ):
+        np.testing.assert_array_equal(h, h_ref)
+        np.testing.assert_array_equal(xedges, xedges_ref)
+        np.testing.assert_array_equal(yedges, yedges_ref)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_binning_without_range(particles, workers):
+    """Edges span the extrema of the data, as in histogram2d."""
+    data = particles.dropna()
+    kwargs = {plane: {} for plane in PLANES}
+    raw = bin_all_projections(data, kwargs, 64, workers=workers)
+    for (h, xedges, yedges), (h_ref, xedges_ref, yedges_ref) in zip(
+        raw, _reference(data, kwargs, 64), strict=True
+    ):
+        np.testing.assert_array_equal(h, h_ref)
+        np.testing.assert_array_equal(xedges, xedges_ref)
+        np.testing.assert_array_equal(yedges, yedges_ref)
+
+
+def test_cmin_as_hist2d(particles):
+    """Bins with less than ``cmin`` particles are NaN, as in hist2d."""
+    kwargs = {plane: {"range": RANGES[plane], "cmin": 3} for plane in PLANES}
+    hist_data = compute_distributions(particles, kwargs, 40, statistics=False)
+    for hist, (h_ref, _, _) in zip(
+        hist_data, _reference(particles, kwargs, 40), strict=True
+    ):
+        h_ref[h_ref < 3] = np.nan
+        np.testing.assert_array_equal(hist.counts, h_ref)
+
+
+@pytest.mark.parametrize("suffix", [".dst", ".txt"])
+@pytest.mark.parametrize("workers", [1, 3])
+@pytest.mark.parametrize("with_range", [True, False])
+def test_chunked_as_in_memory(tmp_path, suffix, workers, with_range):
+    """Counting by chunks gives the counts of the whole file."""
+    filepath = write_particles(tmp_path / f"part{suffix}", 30_000, seed=1)
+    kwargs = {
+        plane: {"range": RANGES[plane]} if with_range else {}
+        for plane in PLANES
+    }
+    raw = accumulate_counts(
+        filepath, kwargs, 50, chunksize=7_000, workers=workers
+    )
+    expected = bin_all_projections(read(filepath), kwargs, 50)
+    for (h, xedges, yedges), (h_ref, xedges_ref, yedges_ref) in zip(
+        raw, expected, strict=True
+    ):
+        np.testing.assert_array_equal(h, h_ref)
+        np.testing.assert_array_equal(xedges, xedges_ref)
+        np.testing.assert_array_equal(yedges, yedges_ref)
+
+
+def _save_reference(filepath, hist, xedges, yedges):
+    """Save a histogram one bin at a time, as the first version did."""
+    data = []
+    for i in range(len(xedges) - 1):
+        for j in range(len(yedges) - 1):
+            data.append([xedges[i], yedges[j], hist[i, j]])
+    df = pd.DataFrame(data, columns=("x", "y", "z"))
+    with np.errstate(divide="ignore"):
+        df["zlog"] = np.log10(df["z"])
+    df.to_csv(filepath, index=False, na_rep="nan", sep=" ")
+
+
+def test_csv_identical(tmp_path):
+    """Text written by blocks is the same as the reference, byte for byte."""
+    rng = np.random.default_rng(2)
+    hist = rng.poisson(3.0, size=(37, 23)).astype(np.float64)
+    hist[hist < 1] = np.nan
+    hist[5, :] = 0.0
+    xedges = np.linspace(-12.5, 7.3, 38)
+    yedges = np.linspace(-1e-3, 2e4, 24)
+
+    reference = tmp_path / "reference.csv"
+    _save_reference(reference, hist, xedges, yedges)
+    for block_size in (1, 50, 2**16):
+        filepath = tmp_path / f"hist_{block_size}.csv"
+        _save_single_hist(
+            filepath, hist, xedges, yedges, block_size=block_size
+        )
+        assert filepath.read_bytes() == reference.read_bytes()
+
+
+def test_dst_roundtrip(tmp_path):
+    """Written .dst files give back the particles, header and rest mass."""
+    filepath = write_particles(
+        tmp_path / "part.dst", 5_000, chunksize=2_000, seed=3, i_beam=62.5
+    )
+    expected = pd.concat(
+        iter_particle_chunks(5_000, chunksize=2_000, seed=3),
+        ignore_index=True,
+    )
+
+    header, particles = memmap_dst(filepath)
+    assert int(header["n_part"]) == len(particles) == 5_000
+    assert float(header["i_beam"]) == 62.5
+    assert float(header["freq"]) == 352.2
+    assert tuple(header["dummy"]) == DST_HEADER_CHARS
+    trailer = np.fromfile(
+        filepath,
+        dtype=DST_TRAILER_DTYPE,
+        offset=filepath.stat().st_size - DST_TRAILER_DTYPE.itemsize,
+    )
+    assert float(trailer["mc2"][0]) == PROTON_MC2
+
+    data = read(filepath)
+    assert list(data.columns) == list(expected.columns)
+    np.testing.assert_allclose(
+        data.to_numpy(), expected.to_numpy(), rtol=1e-14, atol=1e-14
+    )